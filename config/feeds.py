@@ -0,0 +1,8 @@
+# config/feeds.py
+
+import yaml
+from pathlib import Path
+
+FEEDS = yaml.safe_load(
+    Path(__file__).with_suffix(".yaml").read_text(encoding="utf-8")
+)
@@ -0,0 +1,8 @@
+# config/report_schemas.py
+
+import yaml
+from pathlib import Path
+
+REPORT_SCHEMAS = yaml.safe_load(
+    Path(__file__).with_suffix(".yaml").read_text(encoding="utf-8")
+)
@@ -0,0 +1,464 @@
+"""
+Carga masiva de DataFrames hacia las tablas staging de SQL Server
+"""
+import csv
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable
+
+import pandas as pd
+from sqlalchemy import bindparam, event, inspect, text
+from sqlalchemy import types as sqltypes
+from sqlalchemy.engine import Engine
+
+# Parámetros enviados por lote con fast_executemany (filas = parámetros / columnas)
+BULK_PARAMS_PER_BATCH = int(os.getenv('BULK_PARAMS_PER_BATCH', 250000))
+BULK_MIN_CHUNK = 1000
+BULK_MAX_CHUNK = 50000
+
+# SQL Server admite como máximo 2100 parámetros por sentencia
+MSSQL_MAX_PARAMS = 2100
+
+# BULK INSERT desde archivo: la carpeta debe ser visible por el servidor (ruta UNC)
+BULK_INSERT_ENABLED = os.getenv('BULK_INSERT_ENABLED', 'false').lower() == 'true'
+BULK_INSERT_DIR = os.getenv('BULK_INSERT_DIR', '')
+
+# Modo de reemplazo de tablas staging: swap (tabla sombra + SWITCH) o truncate
+STAGING_LOAD_MODE = os.getenv('STAGING_LOAD_MODE', 'swap').lower()
+SHADOW_SUFFIX = '_Swap'
+SWAP_LOCK_TIMEOUT_MS = int(os.getenv('SWAP_LOCK_TIMEOUT_MS', 30000))
+
+
+@dataclass
+class LoadStats:
+    """Resultado de una carga masiva sobre una tabla."""
+    table: str
+    rows: int
+    duration_seconds: float
+    method: str
+
+    @property
+    def rows_per_second(self) -> float:
+        """Filas insertadas por segundo."""
+        if self.duration_seconds <= 0:
+            return float(self.rows)
+        return self.rows / self.duration_seconds
+
+
+def _log_default(msg: str):
+    print(msg)
+
+
+def _is_mssql_pyodbc(engine: Engine) -> bool:
+    return engine.dialect.name == 'mssql' and engine.dialect.driver == 'pyodbc'
+
+
+def _is_mssql(engine: Engine) -> bool:
+    return engine.dialect.name == 'mssql'
+
+
+def resolve_load_mode(engine: Engine, mode: Optional[str] = None) -> str:
+    """Modo de reemplazo efectivo: el swap (SWITCH) solo existe en SQL Server."""
+    mode = (mode or STAGING_LOAD_MODE).lower()
+    return mode if _is_mssql(engine) else 'truncate'
+
+
+def truncate_table(connection, table: str, schema: str = 'dbo') -> None:
+    """Vacía la tabla: TRUNCATE en SQL Server, DELETE en el respaldo local (si la tabla ya existe)."""
+    if _is_mssql(connection.engine):
+        connection.execute(text(f"TRUNCATE TABLE [{schema}].[{table}]"))
+    elif inspect(connection).has_table(table, schema=schema):
+        connection.execute(text(f"DELETE FROM [{schema}].[{table}]"))
+
+
+def enable_fast_executemany(engine: Engine) -> Engine:
+    """Activa fast_executemany de pyodbc en un engine ya creado (idempotente)."""
+    if not _is_mssql_pyodbc(engine) or getattr(engine, '_fast_executemany_enabled', False):
+        return engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _set_fast_executemany(conn, cursor, statement, parameters, context, executemany):
+        if executemany:
+            cursor.fast_executemany = True
+
+    engine._fast_executemany_enabled = True
+    return engine
+
+
+def infer_sql_types(df: pd.DataFrame) -> Dict[str, Any]:
+    """Asigna un tipo SQL explícito a cada columna según su dtype de pandas."""
+    sql_types = {}
+    for col in df.columns:
+        serie = df[col]
+        dtype = serie.dtype
+        if pd.api.types.is_bool_dtype(dtype):
+            sql_types[col] = sqltypes.Boolean()
+        elif pd.api.types.is_integer_dtype(dtype):
+            sql_types[col] = sqltypes.BigInteger()
+        elif pd.api.types.is_float_dtype(dtype):
+            sql_types[col] = sqltypes.Float(precision=53)
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            sql_types[col] = sqltypes.DateTime()
+        else:
+            # Texto: longitud fija redondeada para no depender del primer lote
+            max_len = serie.dropna().astype(str).str.len().max() if len(serie) else 0
+            max_len = int(max_len) if pd.notna(max_len) else 0
+            if max_len > 4000:
+                sql_types[col] = sqltypes.UnicodeText()
+            else:
+                sql_types[col] = sqltypes.Unicode(length=max(50, -(-max_len // 50) * 50))
+    return sql_types
+
+
+def optimal_chunksize(engine: Engine, n_columns: int) -> int:
+    """Calcula el tamaño de lote según el número de columnas y el driver."""
+    n_columns = max(n_columns, 1)
+    if _is_mssql_pyodbc(engine):
+        chunk = BULK_PARAMS_PER_BATCH // n_columns
+        return max(BULK_MIN_CHUNK, min(BULK_MAX_CHUNK, chunk))
+    if not _is_mssql(engine):
+        # Respaldo local: executemany del driver, sin límite de parámetros por sentencia
+        return BULK_MAX_CHUNK
+    # INSERT multi-fila: respetar el límite de parámetros por sentencia
+    return max(1, (MSSQL_MAX_PARAMS - 1) // n_columns)
+
+
+def _bulk_insert_file(df: pd.DataFrame, table: str, connection, schema: str) -> None:
+    """Carga vía BULK INSERT usando un CSV temporal en la carpeta compartida."""
+    columnas_tabla = [
+        row[0] for row in connection.execute(
+            text("SELECT name FROM sys.columns WHERE object_id = OBJECT_ID(:t) ORDER BY column_id"),
+            {'t': f"{schema}.{table}"}
+        )
+    ]
+    # BULK INSERT mapea por posición: alinear con el orden de la tabla
+    df_ordenado = df.reindex(columns=columnas_tabla)
+    ruta = Path(BULK_INSERT_DIR) / f"{table}_{uuid.uuid4().hex}.csv"
+    try:
+        df_ordenado.to_csv(ruta, index=False, encoding='utf-8', date_format='%Y-%m-%d %H:%M:%S',
+                           quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+        connection.execute(text(
+            f"BULK INSERT [{schema}].[{table}] FROM '{ruta}' "
+            "WITH (FORMAT = 'CSV', FIRSTROW = 2, FIELDTERMINATOR = ',', "
+            "ROWTERMINATOR = '0x0a', CODEPAGE = '65001', TABLOCK)"
+        ))
+    finally:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+
+def load_dataframe(
+    df: pd.DataFrame,
+    table: str,
+    con,
+    schema: str = 'dbo',
+    chunksize: Optional[int] = None,
+    dtype: Optional[Dict[str, Any]] = None,
+    use_bulk_insert: Optional[bool] = None,
+    log_fn: Optional[Callable[[str], None]] = None
+) -> LoadStats:
+    """
+    Inserta un DataFrame en una tabla existente por la vía más rápida disponible.
+
+    `con` puede ser un Engine (se abre y confirma una transacción propia) o una
+    Connection (la transacción la controla quien llama). Con SQL Server + pyodbc
+    usa fast_executemany con lotes ajustados al ancho de la tabla; si
+    BULK_INSERT_ENABLED está activo intenta primero BULK INSERT desde archivo.
+    """
+    log = log_fn or _log_default
+    engine = con if isinstance(con, Engine) else con.engine
+    enable_fast_executemany(engine)
+
+    dtype = dtype or infer_sql_types(df)
+    chunksize = chunksize or optimal_chunksize(engine, len(df.columns))
+    use_bulk_insert = BULK_INSERT_ENABLED if use_bulk_insert is None else use_bulk_insert
+    use_bulk_insert = use_bulk_insert and bool(BULK_INSERT_DIR) and engine.dialect.name == 'mssql'
+    fast = _is_mssql_pyodbc(engine)
+    multi = _is_mssql(engine) and not fast
+
+    def _insert(connection) -> str:
+        if use_bulk_insert and len(df):
+            try:
+                with connection.begin_nested():
+                    _bulk_insert_file(df, table, connection, schema)
+                return 'bulk_insert'
+            except Exception as e:
+                log(f"[WARNING] BULK INSERT no disponible para {table}, usando executemany: {e}")
+        df.to_sql(
+            table, con=connection, schema=schema, if_exists='append', index=False,
+            chunksize=chunksize, dtype=dtype, method='multi' if multi else None
+        )
+        return 'fast_executemany' if fast else 'executemany'
+
+    inicio = time.perf_counter()
+    if isinstance(con, Engine):
+        with con.begin() as connection:
+            method = _insert(connection)
+    else:
+        method = _insert(con)
+    stats = LoadStats(table=table, rows=len(df), duration_seconds=time.perf_counter() - inicio, method=method)
+
+    log(f"[BULK] {table}: {stats.rows} registros en {stats.duration_seconds:.2f}s "
+        f"({stats.rows_per_second:,.0f} filas/s, {stats.method})")
+    return stats
+
+
+def _ensure_shadow_table(connection, table: str, shadow: str, schema: str) -> None:
+    """Crea la tabla sombra con la misma estructura que la tabla destino si no existe."""
+    connection.execute(text(
+        f"IF OBJECT_ID('{schema}.{shadow}', 'U') IS NULL "
+        f"SELECT TOP 0 * INTO [{schema}].[{shadow}] FROM [{schema}].[{table}]"
+    ))
+
+
+def _truncate_and_load(df: pd.DataFrame, table: str, engine: Engine, schema: str,
+                       log_fn: Optional[Callable[[str], None]]) -> LoadStats:
+    """TRUNCATE + carga en una sola transacción: nunca se confirma la tabla vacía."""
+    with engine.begin() as connection:
+        truncate_table(connection, table, schema)
+        return load_dataframe(df, table, connection, schema=schema, log_fn=log_fn)
+
+
+def prepare_shadow_table(engine: Engine, table: str, schema: str = 'dbo') -> str:
+    """Crea/vacía la tabla sombra de `table` y devuelve su nombre."""
+    shadow = f"{table}{SHADOW_SUFFIX}"
+    with engine.begin() as connection:
+        _ensure_shadow_table(connection, table, shadow, schema)
+        connection.execute(text(f"TRUNCATE TABLE [{schema}].[{shadow}]"))
+    return shadow
+
+
+def swap_shadow_table(engine: Engine, table: str, schema: str = 'dbo',
+                      log_fn: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Intercambia la tabla sombra ya cargada con la tabla destino.
+
+    Usa TRUNCATE + ALTER TABLE ... SWITCH en una transacción corta (solo
+    metadatos); si el SWITCH no es posible copia la sombra con INSERT ...
+    SELECT en la misma transacción. Devuelve el método usado.
+    """
+    log = log_fn or _log_default
+    shadow = f"{table}{SHADOW_SUFFIX}"
+    inicio = time.perf_counter()
+    try:
+        with engine.begin() as connection:
+            connection.execute(text(f"SET LOCK_TIMEOUT {SWAP_LOCK_TIMEOUT_MS}"))
+            connection.execute(text(f"TRUNCATE TABLE [{schema}].[{table}]"))
+            connection.execute(text(f"ALTER TABLE [{schema}].[{shadow}] SWITCH TO [{schema}].[{table}]"))
+        swap_method = 'switch'
+    except Exception as e:
+        log(f"[WARNING] SWITCH no disponible para {table}, copiando desde {shadow}: {e}")
+        with engine.begin() as connection:
+            connection.execute(text(f"TRUNCATE TABLE [{schema}].[{table}]"))
+            connection.execute(text(
+                f"INSERT INTO [{schema}].[{table}] WITH (TABLOCK) SELECT * FROM [{schema}].[{shadow}]"
+            ))
+        with engine.begin() as connection:
+            connection.execute(text(f"TRUNCATE TABLE [{schema}].[{shadow}]"))
+        swap_method = 'truncate_insert'
+
+    log(f"[SWAP] {table}: tabla reemplazada vía {swap_method} en {time.perf_counter() - inicio:.2f}s")
+    return swap_method
+
+
+def replace_table(
+    df: pd.DataFrame,
+    table: str,
+    engine: Engine,
+    schema: str = 'dbo',
+    mode: Optional[str] = None,
+    log_fn: Optional[Callable[[str], None]] = None
+) -> LoadStats:
+    """
+    Reemplaza el contenido completo de una tabla staging.
+
+    En modo 'swap' carga primero una tabla sombra ({tabla}_Swap) y luego la
+    intercambia con la destino (ver `swap_shadow_table`), de modo que los SP
+    nunca ven la tabla vacía. En modo 'truncate' vacía y carga la tabla
+    destino dentro de una única transacción (único modo fuera de SQL Server).
+    """
+    if resolve_load_mode(engine, mode) != 'swap':
+        return _truncate_and_load(df, table, engine, schema, log_fn)
+
+    shadow = prepare_shadow_table(engine, table, schema)
+    stats = load_dataframe(df, shadow, engine, schema=schema, log_fn=log_fn)
+
+    inicio = time.perf_counter()
+    swap_method = swap_shadow_table(engine, table, schema, log_fn)
+    stats.table = table
+    stats.duration_seconds += time.perf_counter() - inicio
+    stats.method = f"{stats.method}+{swap_method}"
+    return stats
+
+
+@dataclass
+class UpsertStats:
+    """Resultado de un MERGE incremental sobre una tabla."""
+    table: str
+    rows: int
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    duration_seconds: float = 0.0
+
+    @property
+    def unchanged(self) -> int:
+        """Filas enviadas que ya existían con los mismos valores."""
+        return max(self.rows - self.inserted - self.updated, 0)
+
+
+def _records(df: pd.DataFrame):
+    """Filas como diccionarios con NaN/NA convertidos a None (para executemany)."""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def _stage_dataframe(df: pd.DataFrame, table: str, stage: str, connection, schema: str) -> None:
+    """Crea una tabla temporal con las columnas del DataFrame y la carga por lotes."""
+    columnas = ', '.join(f"[{c}]" for c in df.columns)
+    connection.execute(text(f"SELECT TOP 0 {columnas} INTO [{stage}] FROM [{schema}].[{table}]"))
+    if df.empty:
+        return
+    enable_fast_executemany(connection.engine)
+    sentencia = text(
+        f"INSERT INTO [{stage}] ({columnas}) VALUES ({', '.join(f':p{i}' for i in range(len(df.columns)))})"
+    )
+    claves = {c: f"p{i}" for i, c in enumerate(df.columns)}
+    chunk = optimal_chunksize(connection.engine, len(df.columns))
+    registros = [{claves[c]: v for c, v in fila.items()} for fila in _records(df)]
+    for inicio in range(0, len(registros), chunk):
+        connection.execute(sentencia, registros[inicio:inicio + chunk])
+
+
+class DuplicateKeyError(ValueError):
+    """El DataFrame trae filas repetidas para las claves del MERGE."""
+
+
+def delete_scope(connection, table: str, scope: Dict[str, list], schema: str = 'dbo') -> int:
+    """DELETE de las filas del ámbito (columna -> valores, combinadas con AND); devuelve las filas borradas."""
+    if not inspect(connection).has_table(table, schema=schema):
+        return 0
+    params, filtros = {}, []
+    for col, valores_scope in scope.items():
+        nombres = []
+        for i, valor in enumerate(valores_scope):
+            params[f"scope_{col}_{i}"] = valor
+            nombres.append(f":scope_{col}_{i}")
+        filtros.append(f"[{col}] IN ({', '.join(nombres)})")
+    resultado = connection.execute(text(f"DELETE FROM [{schema}].[{table}] WHERE {' AND '.join(filtros)}"), params)
+    return max(resultado.rowcount, 0)
+
+
+def _replace_rows(df: pd.DataFrame, table: str, keys: List[str], connection, scope: Optional[Dict[str, list]],
+                  schema: str, log: Callable[[str], None], inicio: float) -> UpsertStats:
+    """
+    Equivalente sin MERGE para el respaldo local: borra el ámbito (o las claves
+    recibidas) y vuelve a insertar. El estado final es el mismo que con MERGE,
+    pero todas las filas cuentan como insertadas.
+    """
+    destino = f"[{schema}].[{table}]"
+    eliminadas = 0
+    if scope:
+        eliminadas = delete_scope(connection, table, scope, schema)
+    elif inspect(connection).has_table(table, schema=schema):
+        if len(df):
+            condicion = ' AND '.join(f"[{k}] IS :k{i}" for i, k in enumerate(keys))
+            # Claves de fecha con el mismo tipo con que se insertaron (mismo formato almacenado)
+            tipos = [bindparam(f"k{i}", type_=sqltypes.DateTime()) for i, k in enumerate(keys)
+                     if pd.api.types.is_datetime64_any_dtype(df[k])]
+            claves = [{f"k{i}": fila[k] for i, k in enumerate(keys)} for fila in _records(df[keys])]
+            connection.execute(text(f"DELETE FROM {destino} WHERE {condicion}").bindparams(*tipos), claves)
+    load_dataframe(df, table, connection, schema=schema, log_fn=lambda msg: None)
+
+    stats = UpsertStats(table=table, rows=len(df), inserted=len(df), deleted=eliminadas,
+                        duration_seconds=time.perf_counter() - inicio)
+    log(f"[MERGE] {table}: {stats.inserted} insertadas, {stats.deleted} eliminadas "
+        f"(borrado + inserción, sin MERGE en {connection.engine.dialect.name}) ({stats.duration_seconds:.2f}s)")
+    return stats
+
+
+def upsert_dataframe(
+    df: pd.DataFrame,
+    table: str,
+    keys: List[str],
+    connection,
+    scope: Optional[Dict[str, list]] = None,
+    schema: str = 'dbo',
+    log_fn: Optional[Callable[[str], None]] = None
+) -> UpsertStats:
+    """
+    Sincroniza una tabla con un DataFrame vía tabla temporal + MERGE.
+
+    Solo se actualizan las filas cuyas columnas no clave cambiaron, se insertan
+    las nuevas y, si se indica `scope` (p. ej. {'fecha': [fecha]}), se eliminan
+    las filas de ese ámbito que ya no vienen en el DataFrame. Debe ejecutarse
+    dentro de una transacción (`connection_manager.transaction`).
+
+    Las claves deben ser únicas en `df`: si se repiten se lanza DuplicateKeyError
+    (el MERGE no puede representarlas y descartar filas cambiaría los datos).
+    """
+    log = log_fn or _log_default
+    inicio = time.perf_counter()
+
+    duplicados = df.duplicated(subset=keys, keep=False)
+    if duplicados.any():
+        ejemplo = df.loc[duplicados, keys].head(3).to_dict('records')
+        raise DuplicateKeyError(f"{table}: {int(duplicados.sum())} filas con clave {keys} repetida (p. ej. {ejemplo})")
+
+    if not _is_mssql(connection.engine):
+        return _replace_rows(df, table, keys, connection, scope, schema, log, inicio)
+
+    sufijo = uuid.uuid4().hex[:8]
+    stage, cambios = f"#stage_{sufijo}", f"#cambios_{sufijo}"
+    _stage_dataframe(df, table, stage, connection, schema)
+    connection.execute(text(f"CREATE TABLE [{cambios}] (accion NVARCHAR(10))"))
+
+    no_clave = [c for c in df.columns if c not in keys]
+    on = ' AND '.join(f"(t.[{k}] = s.[{k}] OR (t.[{k}] IS NULL AND s.[{k}] IS NULL))" for k in keys)
+    columnas = ', '.join(f"[{c}]" for c in df.columns)
+    valores = ', '.join(f"s.[{c}]" for c in df.columns)
+
+    params = {}
+    destino = f"[{schema}].[{table}]"
+    if scope:
+        filtros = []
+        for col, valores_scope in scope.items():
+            nombres = []
+            for i, valor in enumerate(valores_scope):
+                params[f"scope_{col}_{i}"] = valor
+                nombres.append(f":scope_{col}_{i}")
+            filtros.append(f"[{col}] IN ({', '.join(nombres)})")
+        # CTE como destino: el DELETE por ausencia queda acotado al ámbito
+        prefijo = f"WITH t AS (SELECT * FROM {destino} WHERE {' AND '.join(filtros)}) MERGE t"
+    else:
+        prefijo = f"MERGE {destino} WITH (HOLDLOCK) AS t"
+
+    clausulas = []
+    if no_clave:
+        cambio = f"EXISTS (SELECT {', '.join(f's.[{c}]' for c in no_clave)} EXCEPT SELECT {', '.join(f't.[{c}]' for c in no_clave)})"
+        asignaciones = ', '.join(f"t.[{c}] = s.[{c}]" for c in no_clave)
+        clausulas.append(f"WHEN MATCHED AND {cambio} THEN UPDATE SET {asignaciones}")
+    clausulas.append(f"WHEN NOT MATCHED BY TARGET THEN INSERT ({columnas}) VALUES ({valores})")
+    if scope:
+        clausulas.append("WHEN NOT MATCHED BY SOURCE THEN DELETE")
+
+    connection.execute(text(
+        f"{prefijo} USING [{stage}] AS s ON {on} "
+        f"{' '.join(clausulas)} OUTPUT $action INTO [{cambios}];"
+    ), params)
+
+    conteo = dict(connection.execute(text(f"SELECT accion, COUNT(*) FROM [{cambios}] GROUP BY accion")).fetchall())
+    connection.execute(text(f"DROP TABLE [{stage}]; DROP TABLE [{cambios}]"))
+
+    stats = UpsertStats(
+        table=table, rows=len(df),
+        inserted=conteo.get('INSERT', 0), updated=conteo.get('UPDATE', 0), deleted=conteo.get('DELETE', 0),
+        duration_seconds=time.perf_counter() - inicio
+    )
+    log(f"[MERGE] {table}: {stats.inserted} insertadas, {stats.updated} actualizadas, "
+        f"{stats.deleted} eliminadas, {stats.unchanged} sin cambios ({stats.duration_seconds:.2f}s)")
+    return stats
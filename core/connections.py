@@ -0,0 +1,259 @@
+"""
+Gestor centralizado de conexiones SQL: un engine con pool por base de datos destino
+"""
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import time as dt_time
+from pathlib import Path
+from typing import Dict, Optional, Callable, Any
+from urllib.parse import quote_plus
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+
+# Parámetros del pool (comunes a todos los destinos)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 5))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # segundos
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))    # segundos
+DB_ODBC_DRIVER = os.getenv('DB_ODBC_DRIVER', 'ODBC Driver 17 for SQL Server')
+
+# Dialecto usado cuando la fábrica heredada devuelve una conexión DBAPI (p. ej. conectar_bdStores)
+LEGACY_DBAPI_DIALECT = 'mssql+pymssql://'
+
+# Respaldo local: DB_BACKEND=local redirige todos los destinos a un archivo sqlite
+DB_BACKEND = os.getenv('DB_BACKEND', 'sqlserver').lower()
+LOCAL_DB_PATH = os.getenv('LOCAL_DB_PATH', 'logs/local_sql/local.db')
+# Respaldo local (sqlite): espera máxima por el bloqueo de escritura entre hilos
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 60))  # segundos
+
+
+@dataclass
+class PoolStats:
+    """Uso del pool de un destino durante la ejecución del módulo."""
+    target: str
+    connects: int = 0
+    checkouts: int = 0
+    checkins: int = 0
+    waits_measured: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+    @property
+    def avg_wait_seconds(self) -> float:
+        """Espera media para obtener una conexión del pool."""
+        if self.waits_measured == 0:
+            return 0.0
+        return self.total_wait_seconds / self.waits_measured
+
+
+def url_from_env(target: str) -> Optional[str]:
+    """
+    Construye la URL de un destino desde variables de entorno.
+
+    Acepta DB_{TARGET}_URL completa o DB_{TARGET}_SERVER / _DATABASE / _USER /
+    _PASSWORD para SQL Server vía pyodbc. Con DB_BACKEND=local todos los
+    destinos apuntan al archivo sqlite LOCAL_DB_PATH.
+    """
+    if DB_BACKEND == 'local':
+        Path(LOCAL_DB_PATH).parent.mkdir(parents=True, exist_ok=True)
+        return f"sqlite:///{LOCAL_DB_PATH}"
+    prefijo = f"DB_{target.upper()}"
+    url = os.getenv(f"{prefijo}_URL")
+    if url:
+        return url
+
+    servidor = os.getenv(f"{prefijo}_SERVER")
+    base_datos = os.getenv(f"{prefijo}_DATABASE")
+    if not servidor or not base_datos:
+        return None
+    usuario = quote_plus(os.getenv(f"{prefijo}_USER", ''))
+    contraseña = quote_plus(os.getenv(f"{prefijo}_PASSWORD", ''))
+    driver = quote_plus(DB_ODBC_DRIVER)
+    return f"mssql+pyodbc://{usuario}:{contraseña}@{servidor}/{base_datos}?driver={driver}"
+
+
+class ConnectionManager:
+    """Mantiene un engine por destino y mide el uso de sus pools."""
+
+    def __init__(self):
+        self._engines: Dict[str, Engine] = {}
+        self._stats: Dict[str, PoolStats] = {}
+        self._lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+        self._report_registered = False
+
+    def _engine_kwargs(self, url: str) -> Dict[str, Any]:
+        kwargs = {
+            'pool_pre_ping': True,
+            'pool_recycle': DB_POOL_RECYCLE,
+        }
+        if not url.startswith('sqlite'):
+            kwargs.update({
+                'pool_size': DB_POOL_SIZE,
+                'max_overflow': DB_MAX_OVERFLOW,
+                'pool_timeout': DB_POOL_TIMEOUT,
+                'pool_use_lifo': True,
+            })
+        if url.startswith('mssql+pyodbc'):
+            kwargs['fast_executemany'] = True
+        if url.startswith('sqlite'):
+            kwargs['connect_args'] = {'timeout': SQLITE_BUSY_TIMEOUT}
+        return kwargs
+
+    @staticmethod
+    def _attach_dbo_schema(engine: Engine):
+        """
+        En sqlite adjunta un archivo como esquema 'dbo' para que las sentencias
+        [dbo].[Tabla] de los loaders funcionen igual que en SQL Server.
+        """
+        base_datos = engine.url.database
+        if not base_datos or base_datos == ':memory:':
+            raise ValueError("El respaldo sqlite requiere un archivo (sqlite:///ruta/archivo.db), no :memory:")
+        ruta = Path(base_datos)
+        ruta_dbo = str(ruta.with_name(f"{ruta.stem}.dbo{ruta.suffix or '.db'}"))
+        # Columnas TIME de SQL Server (rango_15min de Ocupación): sqlite las guarda como texto HH:MM:SS
+        sqlite3.register_adapter(dt_time, dt_time.isoformat)
+
+        @event.listens_for(engine, 'connect')
+        def _on_connect(dbapi_connection, connection_record):
+            dbapi_connection.execute(f"ATTACH DATABASE '{ruta_dbo}' AS dbo")
+
+    def _instrument(self, target: str, engine: Engine):
+        """Engancha contadores de conexiones y checkouts al pool del engine."""
+        stats = self._stats.setdefault(target, PoolStats(target=target))
+
+        @event.listens_for(engine, 'connect')
+        def _on_connect(dbapi_connection, connection_record):
+            with self._stats_lock:
+                stats.connects += 1
+
+        @event.listens_for(engine, 'checkout')
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+            with self._stats_lock:
+                stats.checkouts += 1
+
+        @event.listens_for(engine, 'checkin')
+        def _on_checkin(dbapi_connection, connection_record):
+            with self._stats_lock:
+                stats.checkins += 1
+
+    def register(self, target: str, url: str, **engine_kwargs) -> Engine:
+        """Registra (o reemplaza) el engine de un destino a partir de su URL."""
+        with self._lock:
+            if target in self._engines:
+                self._engines[target].dispose()
+            kwargs = self._engine_kwargs(url)
+            kwargs.update(engine_kwargs)
+            engine = create_engine(url, **kwargs)
+            if make_url(url).get_backend_name() == 'sqlite':
+                self._attach_dbo_schema(engine)
+            self._instrument(target, engine)
+            self._engines[target] = engine
+            if not self._report_registered:
+                atexit.register(self.report)
+                self._report_registered = True
+            return engine
+
+    def get_engine(self, target: str, legacy_factory: Optional[Callable[[], Any]] = None) -> Engine:
+        """
+        Devuelve el engine compartido de un destino.
+
+        La URL sale de las variables de entorno. Si no está configurada se usa
+        `legacy_factory`: si devuelve un Engine (conectar_bdCargaExcel) se
+        recrea con su URL y el pool ajustado; si devuelve una conexión DBAPI
+        (conectar_bdStores) se usa como `creator` del pool.
+        """
+        engine = self._engines.get(target)
+        if engine is not None:
+            return engine
+
+        with self._lock:
+            # Otro hilo pudo crearlo mientras esperábamos el lock
+            if target in self._engines:
+                return self._engines[target]
+
+            url = url_from_env(target)
+            if url is not None:
+                return self.register(target, url)
+            if legacy_factory is None:
+                raise ValueError(f"No hay conexión configurada para '{target}' (definir DB_{target.upper()}_URL en .env)")
+
+            legacy = legacy_factory()
+            if isinstance(legacy, Engine):
+                url = legacy.url.render_as_string(hide_password=False)
+                legacy.dispose()
+                return self.register(target, url)
+            legacy.close()
+            return self.register(target, LEGACY_DBAPI_DIALECT, creator=legacy_factory)
+
+    def raw_connection(self, target: str, legacy_factory: Optional[Callable[[], Any]] = None):
+        """Conexión DBAPI del pool (cursor/callproc); close() la devuelve al pool."""
+        engine = self.get_engine(target, legacy_factory)
+        inicio = time.perf_counter()
+        conexion = engine.raw_connection()
+        self._record_wait(target, time.perf_counter() - inicio)
+        return conexion
+
+    @contextmanager
+    def connection(self, target: str, legacy_factory: Optional[Callable[[], Any]] = None):
+        """Conexión del pool para ejecutar varias sentencias relacionadas (sin transacción explícita)."""
+        engine = self.get_engine(target, legacy_factory)
+        inicio = time.perf_counter()
+        with engine.connect() as connection:
+            self._record_wait(target, time.perf_counter() - inicio)
+            yield connection
+
+    @contextmanager
+    def transaction(self, target: str, legacy_factory: Optional[Callable[[], Any]] = None):
+        """Conexión + transacción única: commit al salir, rollback ante error."""
+        engine = self.get_engine(target, legacy_factory)
+        inicio = time.perf_counter()
+        with engine.begin() as connection:
+            self._record_wait(target, time.perf_counter() - inicio)
+            yield connection
+
+    def _record_wait(self, target: str, segundos: float):
+        stats = self._stats.setdefault(target, PoolStats(target=target))
+        with self._stats_lock:
+            stats.waits_measured += 1
+            stats.total_wait_seconds += segundos
+            stats.max_wait_seconds = max(stats.max_wait_seconds, segundos)
+
+    def get_stats(self) -> Dict[str, PoolStats]:
+        """Estadísticas de uso por destino."""
+        return dict(self._stats)
+
+    def report(self, log_fn: Optional[Callable[[str], None]] = None):
+        """Imprime el uso de cada pool (se ejecuta también al terminar el proceso)."""
+        log = log_fn or print
+        for target, stats in self._stats.items():
+            if stats.checkouts == 0:
+                continue
+            log(f"[POOL] {target}: {stats.checkouts} checkouts, {stats.connects} conexiones físicas, "
+                f"espera media {stats.avg_wait_seconds * 1000:.1f} ms, máx {stats.max_wait_seconds * 1000:.1f} ms")
+
+    def dispose_all(self):
+        """Cierra todos los pools."""
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+
+
+# Instancia global
+connection_manager = ConnectionManager()
+
+
+def get_engine(target: str, legacy_factory: Optional[Callable[[], Any]] = None) -> Engine:
+    """Engine compartido del destino indicado."""
+    return connection_manager.get_engine(target, legacy_factory)
+
+def get_raw_connection(target: str, legacy_factory: Optional[Callable[[], Any]] = None):
+    """Conexión DBAPI del pool del destino indicado."""
+    return connection_manager.raw_connection(target, legacy_factory)
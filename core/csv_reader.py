@@ -0,0 +1,180 @@
+"""
+Lectura de CSV con motor intercambiable: pandas (parser C) o Arrow (multihilo, con memory-map)
+"""
+import os
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:  # pyarrow es opcional: sin él se usa siempre el motor pandas
+    pa = None
+    pc = None
+    pa_csv = None
+
+# pandas: pd.read_csv; arrow: pyarrow.csv multihilo (requiere pyarrow)
+CSV_READER_ENGINE = os.getenv('CSV_READER_ENGINE', 'pandas').lower()
+# numpy: columnas con tipos numpy/pandas; pyarrow: columnas respaldadas por Arrow (pd.ArrowDtype)
+CSV_DTYPE_BACKEND = os.getenv('CSV_DTYPE_BACKEND', 'numpy').lower()
+# Mapear el archivo en memoria en vez de leerlo por bloques (archivos locales)
+CSV_MEMORY_MAP = os.getenv('CSV_MEMORY_MAP', 'true').lower() == 'true'
+# Hilos del motor arrow (0 = todos los núcleos)
+CSV_READER_THREADS = int(os.getenv('CSV_READER_THREADS', 0))
+
+# Opciones de pd.read_csv que el motor arrow sabe traducir; con cualquier otra se usa pandas
+_OPCIONES_ARROW = {'sep', 'encoding', 'usecols', 'dtype', 'on_bad_lines'}
+
+_TIPOS_ARROW = {
+    'string': 'string', 'category': 'string',
+    'Int8': 'int8', 'Int16': 'int16', 'Int32': 'int32', 'Int64': 'int64',
+    'float32': 'float32', 'float64': 'float64',
+}
+
+
+# Valores que pd.read_csv reconoce como booleanos
+_VERDADEROS = ['True', 'TRUE', 'true']
+_BOOLEANOS = set(_VERDADEROS) | {'False', 'FALSE', 'false'}
+
+
+class ShortRowsError(Exception):
+    """El archivo tiene filas con menos columnas (pandas las completa con nulos; arrow no puede)."""
+
+
+def _log_default(msg: str):
+    print(msg)
+
+
+def resolve_engine(engine: Optional[str] = None, opciones: Optional[Dict[str, Any]] = None) -> str:
+    """Motor efectivo: arrow solo si está instalado y todas las opciones tienen equivalente."""
+    motor = (engine or CSV_READER_ENGINE).lower()
+    if motor != 'arrow':
+        return 'pandas'
+    if pa_csv is None:
+        return 'pandas'
+    if any(k not in _OPCIONES_ARROW for k, v in (opciones or {}).items() if v is not None):
+        return 'pandas'
+    return 'arrow'
+
+
+def _arrow_kwargs(opciones: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in opciones.items() if k in _OPCIONES_ARROW and v is not None}
+
+
+def _inferir_como_pandas(columna):
+    """
+    Tipo que pd.read_csv infiere para una columna no declarada, leída como texto: entero,
+    decimal (también si está vacía), booleano o texto. Arrow inferiría además fechas y horas
+    ('2025-10-15 08:00:00', '08:00:00') que pandas deja como texto.
+    """
+    for tipo in (pa.int64(), pa.float64()):
+        try:
+            return columna.cast(tipo)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+    if columna.null_count == 0 and set(pc.unique(columna).to_pylist()) <= _BOOLEANOS:
+        return pc.is_in(columna, value_set=pa.array(_VERDADEROS))
+    return columna
+
+
+def _arrow_table(ruta: str, sep: str = ',', encoding: Optional[str] = None, usecols=None,
+                 dtype: Optional[Dict[str, Any]] = None, on_bad_lines: str = 'error',
+                 memory_map: bool = CSV_MEMORY_MAP, log: Callable[[str], None] = _log_default):
+    """Lee el archivo completo a una tabla Arrow con el parser multihilo."""
+    if CSV_READER_THREADS > 0:
+        pa.set_cpu_count(CSV_READER_THREADS)
+
+    cortas = []
+
+    def fila_invalida(fila):
+        # Filas con menos columnas: pandas las completa, se marca para releer con pandas
+        if fila.actual_columns < fila.expected_columns:
+            cortas.append(fila.text)
+            return 'skip'
+        if on_bad_lines == 'error':
+            return 'error'
+        if on_bad_lines == 'warn':
+            # Con el parser multihilo arrow no informa el número de línea: se muestra el texto
+            log(f"[CSV] {ruta}: fila con {fila.actual_columns} campos (se esperaban {fila.expected_columns}), omitida: {fila.text[:80]!r}")
+        return 'skip'
+
+    # Columnas no declaradas: se leen como texto y se tipan como lo haría pandas (sin fechas)
+    encabezado = list(pd.read_csv(ruta, nrows=0, sep=sep, encoding=encoding).columns)
+    no_declaradas = [col for col in (usecols or encabezado) if col not in (dtype or {})]
+    tipos = {col: pa.string() for col in no_declaradas}
+    tipos.update({col: getattr(pa, _TIPOS_ARROW[str(t)])() for col, t in (dtype or {}).items() if str(t) in _TIPOS_ARROW})
+    opciones_lectura = pa_csv.ReadOptions(use_threads=True, encoding=encoding or 'utf8')
+    opciones_parseo = pa_csv.ParseOptions(delimiter=sep, invalid_row_handler=fila_invalida)
+    opciones_conversion = pa_csv.ConvertOptions(column_types=tipos, include_columns=list(usecols or []),
+                                                strings_can_be_null=True)
+
+    origen = ruta
+    if memory_map:
+        try:
+            origen = pa.memory_map(str(ruta), 'r')
+        except OSError:
+            origen = ruta
+    tabla = pa_csv.read_csv(origen, read_options=opciones_lectura, parse_options=opciones_parseo,
+                            convert_options=opciones_conversion)
+    if cortas:
+        raise ShortRowsError(f"{len(cortas)} filas con menos columnas (primera: {cortas[0][:80]!r})")
+    for col in no_declaradas:
+        indice = tabla.schema.get_field_index(col)
+        tabla = tabla.set_column(indice, col, _inferir_como_pandas(tabla.column(col)))
+    return tabla
+
+
+def _to_pandas(tabla, dtype: Optional[Dict[str, Any]], dtype_backend: str) -> pd.DataFrame:
+    """Tabla Arrow -> DataFrame con los tipos declarados (category siempre como categoría de pandas)."""
+    if dtype_backend == 'pyarrow':
+        df = tabla.to_pandas(types_mapper=pd.ArrowDtype)
+        declarados = {col: t for col, t in (dtype or {}).items() if str(t) == 'category'}
+    else:
+        df = tabla.to_pandas()
+        declarados = dtype or {}
+    return df.astype(declarados) if declarados else df
+
+
+def read_csv(ruta: str, engine: Optional[str] = None, dtype_backend: Optional[str] = None,
+             log_fn: Optional[Callable[[str], None]] = None, **opciones) -> pd.DataFrame:
+    """
+    pd.read_csv con el motor configurado. Con arrow el archivo se parsea en paralelo; si
+    tiene filas cortas se relee con pandas para conservarlas igual que antes.
+    """
+    log = log_fn or _log_default
+    if resolve_engine(engine, opciones) == 'pandas':
+        return pd.read_csv(ruta, **opciones)
+    try:
+        tabla = _arrow_table(ruta, log=log, **_arrow_kwargs(opciones))
+    except ShortRowsError as e:
+        log(f"[CSV] {ruta}: {e}, se lee con pandas")
+        return pd.read_csv(ruta, **opciones)
+    return _to_pandas(tabla, opciones.get('dtype'), (dtype_backend or CSV_DTYPE_BACKEND).lower())
+
+
+def iter_csv(ruta: str, chunksize: int, engine: Optional[str] = None, dtype_backend: Optional[str] = None,
+             log_fn: Optional[Callable[[str], None]] = None, **opciones) -> Iterator[pd.DataFrame]:
+    """
+    Bloques de `chunksize` filas. Con arrow se parsea el archivo una sola vez (tipos inferidos
+    sobre todo el archivo, no por bloque) y se convierte a pandas un bloque a la vez.
+    """
+    log = log_fn or _log_default
+    tabla = None
+    if resolve_engine(engine, opciones) == 'arrow':
+        try:
+            tabla = _arrow_table(ruta, log=log, **_arrow_kwargs(opciones))
+        except ShortRowsError as e:
+            log(f"[CSV] {ruta}: {e}, se lee con pandas")
+
+    if tabla is None:
+        with pd.read_csv(ruta, chunksize=chunksize, **opciones) as lector:
+            yield from lector
+        return
+
+    backend = (dtype_backend or CSV_DTYPE_BACKEND).lower()
+    for inicio in range(0, tabla.num_rows, chunksize):
+        bloque = _to_pandas(tabla.slice(inicio, chunksize), opciones.get('dtype'), backend)
+        bloque.index = pd.RangeIndex(inicio, inicio + len(bloque))
+        yield bloque
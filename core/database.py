@@ -90,6 +90,48 @@ class ProcessDatabase:
                 )
             """)
             
+            # Resultado de cada campaña de nómina (carga independiente por campaña)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS campaign_executions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    module_name TEXT NOT NULL,
+                    campaign TEXT NOT NULL,
+                    load_date TEXT NOT NULL,
+                    started_at TIMESTAMP NOT NULL,
+                    finished_at TIMESTAMP NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER DEFAULT 1,
+                    duration_seconds REAL,
+                    error_message TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Resultado de cada feed de una ejecución programada (los reintentos saltan los ya cargados)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS feed_executions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_key TEXT NOT NULL,
+                    feed TEXT NOT NULL,
+                    corte TEXT,
+                    started_at TIMESTAMP NOT NULL,
+                    finished_at TIMESTAMP NOT NULL,
+                    status TEXT NOT NULL,
+                    duration_seconds REAL,
+                    error_message TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Marcas de agua de los procesos incrementales (último corte procesado)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS watermarks (
+                    name TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    updated_at TIMESTAMP NOT NULL
+                )
+            """)
+            
             conn.commit()
             conn.close()
     
@@ -220,6 +262,101 @@ class ProcessDatabase:
             conn.commit()
             conn.close()
     
+    def record_campaign(self, module_name: str, campaign: str, load_date: str, started_at: datetime,
+                        status: str, attempts: int = 1, duration: float = None, error_message: str = None):
+        """Registra el resultado de la carga de una campaña."""
+        with self._lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO campaign_executions 
+                (module_name, campaign, load_date, started_at, finished_at, status, attempts, 
+                 duration_seconds, error_message)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (module_name, campaign, load_date, started_at, datetime.now(), status, attempts,
+                  duration, error_message))
+            
+            conn.commit()
+            conn.close()
+    
+    def get_campaign_results(self, module_name: str, load_date: str) -> List[Dict[str, Any]]:
+        """Último resultado de cada campaña de un módulo para una fecha de carga."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT * FROM campaign_executions 
+            WHERE id IN (SELECT MAX(id) FROM campaign_executions 
+                         WHERE module_name = ? AND load_date = ? 
+                         GROUP BY campaign)
+            ORDER BY campaign
+        """, (module_name, load_date))
+        
+        results = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        
+        return results
+    
+    def record_feed(self, run_key: str, feed: str, corte: Optional[str], started_at: datetime,
+                    status: str, duration: float = None, error_message: str = None):
+        """Registra el resultado de un feed (carga + SP) dentro de una ejecución programada."""
+        with self._lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO feed_executions 
+                (run_key, feed, corte, started_at, finished_at, status, duration_seconds, error_message)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (run_key, feed, corte, started_at, datetime.now(), status, duration, error_message))
+            
+            conn.commit()
+            conn.close()
+    
+    def get_feed_results(self, run_key: str) -> List[Dict[str, Any]]:
+        """Último resultado de cada feed de una ejecución programada."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT * FROM feed_executions 
+            WHERE id IN (SELECT MAX(id) FROM feed_executions WHERE run_key = ? GROUP BY feed)
+            ORDER BY feed
+        """, (run_key,))
+        
+        results = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        
+        return results
+    
+    def get_watermark(self, name: str) -> Optional[str]:
+        """Obtiene la marca de agua de un proceso incremental (None si nunca se registró)."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT value FROM watermarks WHERE name = ?", (name,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        return row[0] if row else None
+    
+    def set_watermark(self, name: str, value: str):
+        """Registra (o reemplaza) la marca de agua de un proceso incremental."""
+        with self._lock:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO watermarks (name, value, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+            """, (name, value, datetime.now()))
+            
+            conn.commit()
+            conn.close()
+    
     def get_recent_sessions(self, limit: int = 20) -> List[Dict[str, Any]]:
         """Obtiene las sesiones más recientes."""
         conn = sqlite3.connect(self.db_path)
@@ -331,6 +468,16 @@ class ProcessDatabase:
                 WHERE created_at < ?
             """, (cutoff_date,))
             
+            cursor.execute("""
+                DELETE FROM campaign_executions 
+                WHERE created_at < ?
+            """, (cutoff_date,))
+            
+            cursor.execute("""
+                DELETE FROM feed_executions 
+                WHERE created_at < ?
+            """, (cutoff_date,))
+            
             cursor.execute("""
                 DELETE FROM module_executions 
                 WHERE created_at < ?
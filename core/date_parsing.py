@@ -0,0 +1,128 @@
+"""
+Parseo vectorizado de columnas fecha/hora de los reportes SaleSys
+"""
+from typing import Callable, Iterable, List, Optional, Any
+
+import pandas as pd
+
+# Formatos observados en los CSV de SaleSys (el primero que calce con la muestra gana)
+DEFAULT_DATETIME_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M',
+    '%Y/%m/%d %H:%M:%S',
+    '%d-%m-%Y %H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%d',
+    '%d/%m/%Y',
+]
+
+SAMPLE_SIZE = 500
+
+# Formatos día-primero que se reescriben a ISO: el parser ISO de pandas es ~10x más rápido
+_ISO_REWRITES = {
+    '%d/%m/%Y %H:%M:%S': (r'^(\d{2})/(\d{2})/(\d{4})', '%Y-%m-%d %H:%M:%S'),
+    '%d/%m/%Y %H:%M': (r'^(\d{2})/(\d{2})/(\d{4})', '%Y-%m-%d %H:%M'),
+    '%d-%m-%Y %H:%M:%S': (r'^(\d{2})-(\d{2})-(\d{4})', '%Y-%m-%d %H:%M:%S'),
+    '%d/%m/%Y': (r'^(\d{2})/(\d{2})/(\d{4})', '%Y-%m-%d'),
+}
+
+
+def _clean(serie: pd.Series) -> pd.Series:
+    """Normaliza a texto sin espacios y marca vacíos como nulos."""
+    texto = serie.astype('string').str.strip()
+    return texto.mask(texto == '')
+
+
+def _to_datetime(texto: pd.Series, fmt: str) -> pd.Series:
+    """pd.to_datetime con formato fijo, pasando por ISO cuando el formato lo permite."""
+    if fmt in _ISO_REWRITES:
+        patron, fmt_iso = _ISO_REWRITES[fmt]
+        texto = texto.str.replace(patron, r'\3-\2-\1', regex=True)
+        fmt = fmt_iso
+    return pd.to_datetime(texto, format=fmt, errors='coerce', cache=True)
+
+
+def infer_datetime_format(
+    serie: pd.Series,
+    formats: Iterable[str] = DEFAULT_DATETIME_FORMATS,
+    sample_size: int = SAMPLE_SIZE
+) -> Optional[str]:
+    """Devuelve el formato que parsea la mayor parte de una muestra de la columna."""
+    muestra = _clean(serie).dropna()
+    if muestra.empty:
+        return None
+    muestra = muestra.head(sample_size)
+
+    mejor_formato, mejor_ratio = None, 0.0
+    for fmt in formats:
+        parseado = _to_datetime(muestra, fmt)
+        ratio = parseado.notna().mean()
+        if ratio > mejor_ratio:
+            mejor_formato, mejor_ratio = fmt, ratio
+        if ratio == 1.0:
+            break
+    return mejor_formato
+
+
+def parse_datetime_column(
+    serie: pd.Series,
+    fmt: Optional[str] = None,
+    fallback: Optional[Callable[[Any], Any]] = None,
+    formats: Iterable[str] = DEFAULT_DATETIME_FORMATS
+) -> pd.Series:
+    """
+    Convierte una columna completa a datetime64 en una sola pasada.
+
+    Si no se indica `fmt` se infiere de una muestra. Las celdas que no calzan
+    se reintentan por bloques con los demás formatos conocidos y solo las que
+    siguen sin resolver pasan por `fallback` (una función por celda, p. ej.
+    `parse_fecha`); sin fallback se usa el parser flexible de pandas.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+
+    texto = _clean(serie)
+    fmt = fmt or infer_datetime_format(texto, formats)
+    if fmt is None:
+        return pd.to_datetime(texto, errors='coerce')
+
+    resultado = _to_datetime(texto, fmt)
+
+    pendientes = resultado.isna() & texto.notna()
+    if not pendientes.any():
+        return resultado
+
+    # Filas con otro formato conocido: se resuelven por bloques, sin bucle por celda
+    resultado = resultado.copy()
+    for otro in formats:
+        if otro == fmt or not pendientes.any():
+            continue
+        parcial = _to_datetime(texto[pendientes], otro)
+        resultado.loc[parcial.index] = resultado.loc[parcial.index].fillna(parcial)
+        pendientes = resultado.isna() & texto.notna()
+
+    if pendientes.any():
+        originales = serie[pendientes]
+        convertir = fallback or (lambda v: pd.to_datetime(v, errors='coerce'))
+        rescatados = pd.to_datetime(originales.map(convertir), errors='coerce')
+        resultado.loc[pendientes] = rescatados
+    return resultado
+
+
+def parse_datetime_columns(
+    df: pd.DataFrame,
+    columns: List[str],
+    fallback: Optional[Callable[[Any], Any]] = None,
+    formats: Iterable[str] = DEFAULT_DATETIME_FORMATS
+) -> pd.DataFrame:
+    """Parsea varias columnas probando primero el formato inferido en la anterior."""
+    formats = list(formats)
+    fmt = None
+    for col in columns:
+        if col not in df.columns:
+            continue
+        candidatos = [fmt] + [f for f in formats if f != fmt] if fmt else formats
+        fmt = infer_datetime_format(df[col], candidatos) or fmt
+        df[col] = parse_datetime_column(df[col], fmt=fmt, fallback=fallback, formats=formats)
+    return df
@@ -0,0 +1,365 @@
+"""
+Motor de feeds declarativos: archivo descargado -> tabla staging -> procedimiento almacenado
+"""
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional
+
+import pandas as pd
+
+from config.feeds import FEEDS
+from config.settings import BASE_DOWNLOAD_PATH, MESES_ES
+from core.bulk_loader import LoadStats, replace_table, upsert_dataframe
+from core.connections import get_engine
+from core.database import process_db
+from core.procedures import ProcedureResult, submit_procedure
+from core.report_reader import iter_report_chunks, normalize_column_name, read_report
+from core.streaming import STREAM_CHUNK_ROWS, stream_chunks_to_table
+
+# Máximo de fuentes de un mismo feed cargadas en paralelo (1 = secuencial)
+FEED_MAX_WORKERS = int(os.getenv('FEED_MAX_WORKERS', 5))
+# staging: tabla *Excel + SP; tvp: las fuentes van directo al SP configurado en procedure.tvp
+FEED_LOAD_MODE = os.getenv('FEED_LOAD_MODE', 'staging').lower()
+SHARED_TIMESTAMP_FILE = Path(os.getenv('SHARED_TIMESTAMP_FILE', 'shared_timestamp.txt'))
+
+
+@dataclass
+class FeedContext:
+    """Fecha del corte y valores derivados usados en rutas y parámetros del SP."""
+    fecha: pd.Timestamp
+
+    @property
+    def year(self) -> int:
+        return self.fecha.year
+
+    @property
+    def month(self) -> str:
+        """Nombre del mes como se usa en las carpetas de descarga (p. ej. 'Octubre')."""
+        return MESES_ES[self.fecha.month].capitalize()
+
+    @property
+    def mes(self) -> str:
+        return self.fecha.strftime('%m')
+
+    @property
+    def day(self) -> str:
+        return self.fecha.strftime('%d')
+
+
+@dataclass
+class FeedResult:
+    """Resultado de la ejecución de un feed."""
+    feed: str
+    loads: Dict[str, LoadStats] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    procedure: Optional[ProcedureResult] = None
+    load_seconds: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        return not self.errors
+
+
+def _legacy_factories() -> Dict[str, Callable[[], Any]]:
+    """Conexiones de funciones.conexion como respaldo cuando no hay DB_*_URL en .env."""
+    try:
+        from funciones.conexion import conectar_bdCargaExcel, conectar_bdStores
+    except ImportError:
+        return {}
+    return {'carga_excel': conectar_bdCargaExcel, 'stores': conectar_bdStores}
+
+
+class FeedRunner:
+    """Ejecuta los feeds definidos en config/feeds.yaml."""
+
+    def __init__(self, feeds: Optional[Dict[str, Any]] = None, base_path: Optional[Path] = None):
+        self.feeds = feeds if feeds is not None else FEEDS
+        self.base_path = Path(base_path) if base_path is not None else BASE_DOWNLOAD_PATH
+
+    def get_config(self, feed: str) -> Dict[str, Any]:
+        """Configuración de un feed."""
+        try:
+            return self.feeds[feed]
+        except KeyError:
+            raise ValueError(f"Feed '{feed}' no definido en config/feeds.yaml")
+
+    def build_context(self, config: Dict[str, Any], fecha: Optional[Any] = None) -> FeedContext:
+        """Fecha del corte: la indicada, el timestamp compartido o el momento actual."""
+        if fecha is None:
+            if config.get('timestamp', 'now') == 'shared':
+                fecha = SHARED_TIMESTAMP_FILE.read_text().strip()
+            else:
+                fecha = pd.Timestamp.now()
+        fecha = pd.Timestamp(fecha) + pd.Timedelta(seconds=config.get('timestamp_offset_seconds', 0))
+        return FeedContext(fecha=fecha)
+
+    def source_path(self, source: Dict[str, Any], contexto: FeedContext) -> Path:
+        """Ruta del archivo de una fuente para la fecha del corte."""
+        relativa = source['path'].format(year=contexto.year, month=contexto.month, day=contexto.day)
+        return self.base_path / relativa
+
+    @staticmethod
+    def _resolve(source: Dict[str, Any], clave: str, functions: Dict[str, Callable], nombre: str) -> Optional[Callable]:
+        """Función nombrada en la configuración de la fuente, entregada por el módulo del feed."""
+        if not source.get(clave):
+            return None
+        if source[clave] not in functions:
+            raise ValueError(f"Función '{source[clave]}' ({clave}) no entregada para la fuente {nombre}")
+        return functions[source[clave]]
+
+    def _read_source(self, nombre: str, source: Dict[str, Any], contexto: FeedContext,
+                     functions: Dict[str, Callable], normalizer: Callable[[str], str],
+                     log: Callable[[str], None]) -> pd.DataFrame:
+        """Lee y transforma una fuente completa en memoria."""
+        ruta = self.source_path(source, contexto)
+        transform = self._resolve(source, 'transform', functions, nombre)
+        fallback = self._resolve(source, 'datetime_fallback', functions, nombre)
+
+        if source.get('reader', 'csv') == 'excel':
+            df = pd.read_excel(ruta)
+        else:
+            df = read_report(source['report'], str(ruta), chunksize=STREAM_CHUNK_ROWS,
+                             datetime_fallback=fallback,
+                             normalizer=normalizer, log_fn=log)
+        if transform is not None:
+            df = transform(df, contexto)
+        return df
+
+    def _load_source(self, nombre: str, source: Dict[str, Any], contexto: FeedContext, engine,
+                     functions: Dict[str, Callable], normalizer: Callable[[str], str],
+                     log: Callable[[str], None], tvps: Optional[Dict[str, pd.DataFrame]] = None) -> LoadStats:
+        """
+        Lee, transforma y carga una fuente; el DataFrame se libera al terminar.
+        Con `tvps` no se escribe la tabla staging: el DataFrame queda para el SP.
+        Si la transformación devuelve solo un delta (df.attrs['upsert_keys']), se
+        sincroniza con MERGE por esas claves en lugar de reemplazar la tabla.
+        """
+        if tvps is not None:
+            inicio = time.perf_counter()
+            df = self._read_source(nombre, source, contexto, functions, normalizer, log)
+            if df.attrs.get('upsert_keys'):
+                raise ValueError(f"La fuente {nombre} entregó un delta incremental, no compatible con el modo tvp")
+            tvps[nombre] = df
+            return LoadStats(table=source['table'], rows=len(df),
+                             duration_seconds=time.perf_counter() - inicio, method='tvp')
+
+        if source.get('stream'):
+            transform = self._resolve(source, 'transform', functions, nombre)
+            bloques = iter_report_chunks(source['report'], str(self.source_path(source, contexto)),
+                                         STREAM_CHUNK_ROWS, normalizer=normalizer, log_fn=log)
+            if transform is not None:
+                bloques = (transform(bloque, contexto) for bloque in bloques)
+            return stream_chunks_to_table(bloques, source['table'], engine, log_fn=log)
+
+        df = self._read_source(nombre, source, contexto, functions, normalizer, log)
+        claves = df.attrs.get('upsert_keys')
+        if claves:
+            with engine.begin() as connection:
+                stats = upsert_dataframe(df, source['table'], claves, connection, log_fn=log)
+            return LoadStats(table=source['table'], rows=stats.rows,
+                             duration_seconds=stats.duration_seconds, method='merge')
+        return replace_table(df, source['table'], engine, log_fn=log)
+
+    @staticmethod
+    def load_mode(config: Dict[str, Any]) -> str:
+        """'tvp' solo si el feed tiene SP con TVP configurado y el modo lo pide; si no 'staging'."""
+        modo = config.get('load_mode', FEED_LOAD_MODE).lower()
+        if modo == 'tvp' and config.get('procedure', {}).get('tvp'):
+            return 'tvp'
+        return 'staging'
+
+    def _submit_procedure(self, config: Dict[str, Any], contexto: FeedContext, log: Callable[[str], None],
+                          tvps: Optional[Dict[str, pd.DataFrame]] = None) -> Optional[Future]:
+        """
+        Lanza el SP del feed con (fecha, mes, año) en segundo plano, con su propia conexión.
+        En modo TVP se llama al SP configurado en procedure.tvp con las fuentes como parámetros.
+        """
+        procedure = config.get('procedure')
+        if not procedure:
+            return None
+        params = (str(contexto.fecha), contexto.mes, contexto.year)
+        if tvps is not None:
+            tvp = procedure['tvp']
+            target = tvp.get('target', 'carga_excel')
+            ordenadas = {nombre: tvps[nombre] for nombre in tvp['types']}
+            return submit_procedure(tvp['name'], params, target=target,
+                                    legacy_factory=_legacy_factories().get(target), log_fn=log,
+                                    tvps=ordenadas, type_names=tvp['types'])
+        target = procedure.get('target', 'stores')
+        return submit_procedure(procedure['name'], params,
+                                target=target, legacy_factory=_legacy_factories().get(target), log_fn=log)
+
+    def _load_feed(self, feed: str, fecha: Optional[Any], functions: Optional[Dict[str, Callable]],
+                   normalizer: Callable[[str], str], log: Callable[[str], None]):
+        """Carga todas las fuentes del feed en paralelo; falla si alguna no quedó cargada."""
+        config = self.get_config(feed)
+        functions = functions or {}
+        contexto = self.build_context(config, fecha)
+        resultado = FeedResult(feed=feed)
+        inicio = time.perf_counter()
+        log(f"[FEED] {feed}: corte {contexto.fecha}")
+
+        tvps = {} if self.load_mode(config) == 'tvp' else None
+        target = config.get('target', 'carga_excel')
+        engine = get_engine(target, legacy_factory=_legacy_factories().get(target))
+        fuentes = config['sources']
+        max_workers = max(1, min(config.get('max_workers', FEED_MAX_WORKERS), FEED_MAX_WORKERS, len(fuentes)))
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"feed-{feed}") as pool:
+            futuros = {
+                pool.submit(self._load_source, nombre, source, contexto, engine, functions, normalizer, log, tvps): nombre
+                for nombre, source in fuentes.items()
+            }
+            for futuro in as_completed(futuros):
+                nombre = futuros[futuro]
+                try:
+                    resultado.loads[nombre] = futuro.result()
+                except Exception as e:
+                    resultado.errors[nombre] = str(e)
+                    log(f"[FEED] Error cargando {feed}/{nombre}: {e}")
+
+        # El SP solo corre cuando todas las fuentes quedaron cargadas
+        if not resultado.success:
+            raise RuntimeError(f"Falló la carga de {feed} para: {', '.join(resultado.errors)}")
+
+        resultado.load_seconds = time.perf_counter() - inicio
+        filas = sum(stats.rows for stats in resultado.loads.values())
+        log(f"[FEED] {feed}: {len(resultado.loads)} fuentes, {filas} registros, {resultado.load_seconds:.2f}s")
+        return resultado, contexto, config, tvps
+
+    def run(
+        self,
+        feed: str,
+        fecha: Optional[Any] = None,
+        functions: Optional[Dict[str, Callable]] = None,
+        normalizer: Callable[[str], str] = normalize_column_name,
+        log_fn: Optional[Callable[[str], None]] = None,
+        on_success: Optional[Callable[[FeedResult], None]] = None
+    ) -> FeedResult:
+        """
+        Carga todas las fuentes del feed en paralelo y, si todas terminaron bien,
+        ejecuta su procedimiento almacenado. `functions` entrega las funciones
+        nombradas en la configuración (transform recibe (df, contexto)).
+        `on_success` se llama con el resultado solo si la carga y el SP terminaron bien.
+        """
+        log = log_fn or print
+        resultado, contexto, config, tvps = self._load_feed(feed, fecha, functions, normalizer, log)
+        futuro = self._submit_procedure(config, contexto, log, tvps)
+        if futuro is not None:
+            resultado.procedure = futuro.result()
+            if not resultado.procedure.success:
+                raise RuntimeError(f"Falló {resultado.procedure.name}: {resultado.procedure.error}")
+        if on_success is not None:
+            on_success(resultado)
+        return resultado
+
+    @staticmethod
+    def execution_key() -> Optional[str]:
+        """
+        Ejecución programada a la que pertenece la corrida: el timestamp compartido que main.py
+        escribe una vez y que comparten los reintentos del módulo (None si no existe).
+        """
+        try:
+            return SHARED_TIMESTAMP_FILE.read_text().strip() or None
+        except OSError:
+            return None
+
+    def run_many(
+        self,
+        feeds: Dict[str, Dict[str, Any]],
+        fecha: Optional[Any] = None,
+        log_fn: Optional[Callable[[str], None]] = None
+    ) -> List[FeedResult]:
+        """
+        Ejecuta feeds independientes uno tras otro sin esperar sus SP: mientras el
+        servidor procesa el SP de un feed ya se está cargando el siguiente.
+        `feeds` mapea cada feed a sus argumentos de run (functions, normalizer, on_success).
+
+        El resultado de cada feed queda en ProcessDatabase bajo la ejecución programada
+        (execution_key): un reintento del módulo salta los feeds que ya terminaron bien
+        (carga + SP) y solo repite los fallidos.
+        """
+        log = log_fn or print
+        inicio = time.perf_counter()
+        pendientes = []
+        fallidos: Dict[str, str] = {}
+        ejecucion = self.execution_key()
+        completados = set()
+        if ejecucion is not None:
+            completados = {r['feed'] for r in process_db.get_feed_results(ejecucion) if r['status'] == 'success'}
+        inicios: Dict[str, datetime] = {}
+        cortes: Dict[str, str] = {}
+
+        for feed, opciones in feeds.items():
+            if feed in completados:
+                log(f"[SKIP] {feed}: ya cargado en la ejecución {ejecucion}")
+                continue
+            inicios[feed] = datetime.now()
+            try:
+                resultado, contexto, config, tvps = self._load_feed(
+                    feed, fecha, opciones.get('functions'),
+                    opciones.get('normalizer', normalize_column_name), log
+                )
+            except Exception as e:
+                fallidos[feed] = str(e)
+                log(f"[FEED] {feed} no se cargó, se continúa con el siguiente: {e}")
+                continue
+            cortes[feed] = str(contexto.fecha)
+            pendientes.append((resultado, self._submit_procedure(config, contexto, log, tvps)))
+
+        resultados = []
+        for resultado, futuro in pendientes:
+            if futuro is not None:
+                resultado.procedure = futuro.result()
+                if not resultado.procedure.success:
+                    fallidos[resultado.feed] = resultado.procedure.error
+            on_success = feeds[resultado.feed].get('on_success')
+            if on_success is not None and resultado.feed not in fallidos:
+                try:
+                    on_success(resultado)
+                except Exception as e:
+                    fallidos[resultado.feed] = str(e)
+                    log(f"[FEED] {resultado.feed}: error al confirmar la carga: {e}")
+            resultados.append(resultado)
+
+        for resultado in resultados:
+            sp = resultado.procedure
+            detalle = f", {sp.name} {sp.duration_seconds:.2f}s -> {sp.result if sp.success else sp.error}" if sp else ""
+            log(f"[FEED] {resultado.feed}: carga {resultado.load_seconds:.2f}s{detalle}")
+        log(f"[FEED] {len(resultados)} feeds en {time.perf_counter() - inicio:.2f}s")
+
+        if ejecucion is not None:
+            for feed, iniciado in inicios.items():
+                process_db.record_feed(ejecucion, feed, cortes.get(feed), iniciado,
+                                       'failed' if feed in fallidos else 'success',
+                                       (datetime.now() - iniciado).total_seconds(), fallidos.get(feed))
+
+        if fallidos:
+            raise RuntimeError(f"Feeds con errores: {fallidos}")
+        return resultados
+
+
+# Instancia global
+feed_runner = FeedRunner()
+
+
+def run_feed(
+    feed: str,
+    fecha: Optional[Any] = None,
+    functions: Optional[Dict[str, Callable]] = None,
+    normalizer: Callable[[str], str] = normalize_column_name,
+    log_fn: Optional[Callable[[str], None]] = None,
+    on_success: Optional[Callable[[FeedResult], None]] = None
+) -> FeedResult:
+    """Ejecuta un feed con el runner global."""
+    return feed_runner.run(feed, fecha=fecha, functions=functions, normalizer=normalizer, log_fn=log_fn,
+                           on_success=on_success)
+
+def run_feeds(feeds: Dict[str, Dict[str, Any]], fecha: Optional[Any] = None,
+              log_fn: Optional[Callable[[str], None]] = None) -> List[FeedResult]:
+    """Ejecuta varios feeds solapando cada SP con la carga del feed siguiente."""
+    return feed_runner.run_many(feeds, fecha=fecha, log_fn=log_fn)
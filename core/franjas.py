@@ -0,0 +1,172 @@
+"""
+Calendario de franjas horarias y reparto vectorizado de intervalos de tiempo en franjas
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.report_reader import get_report_schema, read_report
+from core.report_sidecar import schema_fingerprint
+
+# Caché binaria del calendario (se regenera cuando cambia el CSV de origen o su esquema)
+FRANJAS_CACHE_DIR = os.getenv('FRANJAS_CACHE_DIR', 'logs/cache')
+
+_NS_POR_SEGUNDO = 1_000_000_000
+_NS_POR_DIA = 86_400 * _NS_POR_SEGUNDO
+
+
+def _to_ns(valores) -> Tuple[np.ndarray, np.ndarray]:
+    """Fechas -> (enteros en ns, máscara de válidos); los NaT quedan marcados como inválidos."""
+    serie = pd.Series(pd.to_datetime(valores)).astype('datetime64[ns]')
+    validos = serie.notna().to_numpy()
+    return serie.to_numpy().view('int64'), validos
+
+
+def split_intervals(
+    inicio,
+    fin,
+    franja_inicio,
+    franja_fin,
+    same_day: bool = False
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Cruza cada intervalo [inicio, fin) con las franjas [franja_inicio, franja_fin)
+    que toca y devuelve tres arrays alineados: posición del intervalo, posición de
+    la franja y segundos de intersección (solo pares con intersección > 0).
+
+    Las franjas deben estar ordenadas y no solaparse (una grilla fija de 15 minutos):
+    los extremos de cada intervalo se ubican con searchsorted y los pares se generan
+    sin iterar filas. Con `same_day` solo cuentan las franjas que inician el mismo
+    día que el intervalo. Intervalos con NaT no generan pares.
+    """
+    ini, ini_validos = _to_ns(inicio)
+    fin_, fin_validos = _to_ns(fin)
+    f_ini, _ = _to_ns(franja_inicio)
+    f_fin, _ = _to_ns(franja_fin)
+
+    if len(f_ini) > 1 and (np.any(np.diff(f_ini) < 0) or np.any(f_ini[1:] < f_fin[:-1])):
+        raise ValueError("Las franjas deben estar ordenadas por inicio y no solaparse")
+
+    # Primera franja que termina después del inicio; franjas que empiezan antes del fin
+    desde = np.searchsorted(f_fin, ini, side='right')
+    hasta = np.searchsorted(f_ini, fin_, side='left')
+    if same_day:
+        dia = ini - ini % _NS_POR_DIA
+        desde = np.maximum(desde, np.searchsorted(f_ini, dia, side='left'))
+        hasta = np.minimum(hasta, np.searchsorted(f_ini, dia + _NS_POR_DIA, side='left'))
+
+    cantidades = np.where(ini_validos & fin_validos, np.maximum(hasta - desde, 0), 0)
+    total = int(cantidades.sum())
+    intervalo = np.repeat(np.arange(len(ini)), cantidades)
+    desplazamiento = np.arange(total) - np.repeat(np.cumsum(cantidades) - cantidades, cantidades)
+    franja = desde[intervalo] + desplazamiento
+
+    segundos = (np.minimum(fin_[intervalo], f_fin[franja]) - np.maximum(ini[intervalo], f_ini[franja])) / _NS_POR_SEGUNDO
+    con_interseccion = segundos > 0
+    return intervalo[con_interseccion], franja[con_interseccion], segundos[con_interseccion]
+
+
+class FranjaCalendar:
+    """
+    Grilla de franjas (franjas_horarias.csv) leída una sola vez: tipada, ordenada por
+    inicio e indexada por día. Se persiste en una caché pickle junto con la fecha de
+    modificación del CSV y la huella del esquema del reporte, así las ejecuciones
+    siguientes no vuelven a parsearlo mientras no cambie ninguno de los dos.
+    """
+
+    def __init__(self, ruta: str, cache_path: Optional[str] = None, report: str = 'franjas_horarias'):
+        self.ruta = str(ruta)
+        self.cache_path = Path(cache_path) if cache_path else Path(FRANJAS_CACHE_DIR) / f"{Path(self.ruta).stem}.pkl"
+        self.report = report
+        self._frame: Optional[pd.DataFrame] = None
+        self._inicios: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def _source_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.ruta)
+        except OSError:
+            return None
+
+    def _read_cache(self) -> Optional[Dict[str, Any]]:
+        try:
+            return pd.read_pickle(self.cache_path)
+        except Exception:
+            return None
+
+    def _build(self, log: Callable[[str], None]) -> pd.DataFrame:
+        """Lee el CSV con el esquema registrado y agrega las columnas derivadas por día."""
+        franjas = read_report(self.report, self.ruta, log_fn=log)
+        franjas = franjas.sort_values('fecha_hora_inicio', ignore_index=True)
+        franjas['fecha_hora_inicio'] = franjas['fecha_hora_inicio'].astype('datetime64[ns]')
+        franjas['fecha_hora_fin'] = franjas['fecha_hora_fin'].astype('datetime64[ns]')
+        franjas['fecha'] = franjas['fecha_hora_inicio'].dt.normalize()
+        franjas['hora_inicio'] = franjas['fecha_hora_inicio'].dt.time
+        return franjas
+
+    def load(self, log_fn: Optional[Callable[[str], None]] = None) -> pd.DataFrame:
+        """
+        Calendario completo; usa la caché si se escribió con el esquema actual y corresponde
+        al CSV actual (o si el CSV no está accesible).
+        """
+        with self._lock:
+            if self._frame is not None:
+                return self._frame
+            log = log_fn or print
+            mtime = self._source_mtime()
+            huella = schema_fingerprint(get_report_schema(self.report))
+            cache = self._read_cache()
+            if cache is not None and cache.get('schema') != huella:
+                log(f"[FRANJAS] Cambió el esquema de {self.report}, se descarta la caché {self.cache_path}")
+                cache = None
+
+            if cache is not None and (mtime is None or cache.get('source_mtime') == mtime):
+                if mtime is None:
+                    log(f"[FRANJAS] {self.ruta} no accesible, usando caché {self.cache_path}")
+                franjas = cache['frame']
+            else:
+                franjas = self._build(log)
+                try:
+                    self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+                    pd.to_pickle({'source_mtime': mtime, 'schema': huella, 'frame': franjas}, self.cache_path)
+                except OSError as e:
+                    log(f"[WARNING] No se pudo escribir la caché de franjas {self.cache_path}: {e}")
+
+            self._frame = franjas
+            self._inicios = franjas['fecha_hora_inicio'].to_numpy()
+            return franjas
+
+    def between(self, desde: Any, hasta: Any) -> pd.DataFrame:
+        """Franjas que inician en [desde, hasta), ubicadas por búsqueda binaria (copia)."""
+        franjas = self.load()
+        i = np.searchsorted(self._inicios, np.datetime64(pd.Timestamp(desde), 'ns'), side='left')
+        j = np.searchsorted(self._inicios, np.datetime64(pd.Timestamp(hasta), 'ns'), side='left')
+        return franjas.iloc[i:j].reset_index(drop=True)
+
+    def for_date(self, fecha: Any, days: int = 1) -> pd.DataFrame:
+        """Franjas de `days` días a partir de `fecha`."""
+        inicio = pd.Timestamp(fecha).normalize()
+        return self.between(inicio, inicio + pd.Timedelta(days=days))
+
+    def invalidate(self):
+        """Descarta la copia en memoria (la próxima consulta revalida contra el CSV)."""
+        with self._lock:
+            self._frame = None
+            self._inicios = None
+
+
+# Calendarios por ruta de CSV (uno por proceso)
+_calendars: Dict[str, FranjaCalendar] = {}
+_calendars_lock = threading.Lock()
+
+
+def get_franja_calendar(ruta: str) -> FranjaCalendar:
+    """Calendario compartido para el CSV de franjas `ruta`."""
+    with _calendars_lock:
+        if ruta not in _calendars:
+            _calendars[ruta] = FranjaCalendar(ruta)
+        return _calendars[ruta]
@@ -0,0 +1,66 @@
+"""
+Respaldo SQL local (sqlite) con procedimientos simulados, para ejecutar y medir los loaders sin SQL Server
+"""
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from config.feeds import FEEDS
+from core.connections import LOCAL_DB_PATH, connection_manager
+
+# Destinos que se redirigen al archivo local
+LOCAL_TARGETS = ['carga_excel', 'stores', 'amg']
+
+# Nombre del SP -> función (connection, params) que simula su resultado
+STUB_PROCEDURES: Dict[str, Callable[[Any, Tuple[Any, ...]], Any]] = {}
+
+
+def register_stub_procedure(name: str, fn: Callable[[Any, Tuple[Any, ...]], Any]):
+    """Registra la simulación de un procedimiento almacenado."""
+    STUB_PROCEDURES[name] = fn
+
+
+def _count_rows_stub(tables: List[str], schema: str = 'dbo') -> Callable[[Any, Tuple[Any, ...]], Any]:
+    """SP simulado que devuelve {'Total': filas} de las tablas staging del feed (como el cursor as_dict)."""
+    def _stub(connection, params):
+        total = 0
+        for table in tables:
+            if inspect(connection).has_table(table, schema=schema):
+                total += connection.execute(text(f"SELECT COUNT(*) FROM [{schema}].[{table}]")).scalar()
+        return {'Total': total}
+    return _stub
+
+
+def call_stub_procedure(engine: Engine, name: str, params: Tuple[Any, ...]) -> Any:
+    """Ejecuta la simulación registrada para `name` dentro de una transacción."""
+    if name not in STUB_PROCEDURES:
+        raise ValueError(f"Procedimiento '{name}' sin simulación en el respaldo local (register_stub_procedure)")
+    with engine.begin() as connection:
+        return STUB_PROCEDURES[name](connection, params)
+
+
+def use_local_backend(path: Optional[str] = None, targets: Optional[List[str]] = None) -> Dict[str, Engine]:
+    """
+    Redirige los destinos al archivo sqlite `path` (por defecto LOCAL_DB_PATH).
+    Las tablas staging se crean en la primera carga; los SP de config/feeds.yaml
+    quedan simulados contando las filas cargadas.
+    """
+    ruta = Path(path or LOCAL_DB_PATH)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    engines = {
+        target: connection_manager.register(target, f"sqlite:///{ruta}")
+        for target in (targets or LOCAL_TARGETS)
+    }
+    return engines
+
+
+# SP de los feeds: simulados por defecto
+for _config in FEEDS.values():
+    _procedure = _config.get('procedure')
+    if _procedure:
+        _tablas = [source['table'] for source in _config['sources'].values()]
+        register_stub_procedure(_procedure['name'], _count_rows_stub(_tablas))
+        if _procedure.get('tvp'):
+            register_stub_procedure(_procedure['tvp']['name'], _count_rows_stub(_tablas))
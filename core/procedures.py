@@ -0,0 +1,141 @@
+"""
+Ejecución asíncrona de procedimientos almacenados, cada uno con su propia conexión del pool
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.connections import get_engine, get_raw_connection
+from core.local_backend import call_stub_procedure
+from core.tvp import execute_procedure_tvp
+
+# SP ejecutándose a la vez (cada uno ocupa una conexión del pool de su destino)
+SP_MAX_CONCURRENT = int(os.getenv('SP_MAX_CONCURRENT', 3))
+
+
+@dataclass
+class ProcedureResult:
+    """Resultado de la ejecución de un procedimiento almacenado."""
+    name: str
+    target: str
+    params: Tuple[Any, ...]
+    started_at: Optional[datetime] = None
+    duration_seconds: float = 0.0
+    result: Any = None
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+def call_procedure(name: str, params: Tuple[Any, ...], target: str = 'stores',
+                   legacy_factory: Optional[Callable[[], Any]] = None) -> Any:
+    """Ejecuta el SP con callproc, confirma la transacción y devuelve la primera fila del resultado."""
+    engine = get_engine(target, legacy_factory=legacy_factory)
+    if engine.dialect.name == 'sqlite':
+        # Respaldo local: sqlite no tiene procedimientos, se usa su simulación
+        return call_stub_procedure(engine, name, params)
+
+    conexion = get_raw_connection(target, legacy_factory=legacy_factory)
+    cursor = None
+    try:
+        cursor = conexion.cursor()
+        cursor.callproc(name, params)
+        result = cursor.fetchone()
+        conexion.commit()
+        return result
+    finally:
+        if cursor:
+            cursor.close()
+        conexion.close()
+
+
+class ProcedureExecutor:
+    """Lanza SP en segundo plano y registra duración y resultado de cada uno."""
+
+    def __init__(self, max_workers: int = SP_MAX_CONCURRENT):
+        self.max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # Solo los SP en curso: cada Future se quita al terminar (los lanzados sin esperar no se acumulan)
+        self._futures: Dict[Future, None] = {}
+        self._lock = threading.Lock()
+
+    def _run(self, resultado: ProcedureResult, legacy_factory, log: Callable[[str], None],
+             tvps: Optional[Dict[str, Any]], type_names: Optional[Dict[str, str]]) -> ProcedureResult:
+        resultado.started_at = datetime.now()
+        inicio = time.perf_counter()
+        try:
+            if tvps:
+                resultado.result = execute_procedure_tvp(resultado.name, resultado.params, tvps, type_names,
+                                                         resultado.target, legacy_factory)
+            else:
+                resultado.result = call_procedure(resultado.name, resultado.params, resultado.target, legacy_factory)
+            log(f"[SP] {resultado.name}: {time.perf_counter() - inicio:.2f}s, resultado {resultado.result}")
+        except Exception as e:
+            resultado.error = str(e)
+            log(f"[SP] Error en {resultado.name} tras {time.perf_counter() - inicio:.2f}s: {e}")
+        resultado.duration_seconds = time.perf_counter() - inicio
+        return resultado
+
+    def submit(
+        self,
+        name: str,
+        params: Tuple[Any, ...],
+        target: str = 'stores',
+        legacy_factory: Optional[Callable[[], Any]] = None,
+        log_fn: Optional[Callable[[str], None]] = None,
+        tvps: Optional[Dict[str, Any]] = None,
+        type_names: Optional[Dict[str, str]] = None
+    ) -> Future:
+        """
+        Encola el SP y devuelve un Future con su ProcedureResult (los errores quedan en .error).
+        Con `tvps` los DataFrames se envían como table-valued parameters tras `params`.
+        """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sp')
+            resultado = ProcedureResult(name=name, target=target, params=tuple(params))
+            futuro = self._pool.submit(self._run, resultado, legacy_factory, log_fn or print, tvps, type_names)
+            self._futures[futuro] = None
+        # Fuera del lock: si el SP ya terminó, el callback corre en este mismo hilo
+        futuro.add_done_callback(self._discard)
+        return futuro
+
+    def _discard(self, futuro: Future):
+        with self._lock:
+            self._futures.pop(futuro, None)
+
+    def wait_all(self) -> List[ProcedureResult]:
+        """Espera los SP aún en curso y devuelve sus resultados en orden de envío."""
+        with self._lock:
+            futuros = list(self._futures)
+        return [futuro.result() for futuro in futuros]
+
+    def shutdown(self):
+        """Espera los SP pendientes y libera los hilos."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+# Instancia global
+procedure_executor = ProcedureExecutor()
+
+
+def submit_procedure(name: str, params: Tuple[Any, ...], target: str = 'stores',
+                     legacy_factory: Optional[Callable[[], Any]] = None,
+                     log_fn: Optional[Callable[[str], None]] = None,
+                     tvps: Optional[Dict[str, Any]] = None,
+                     type_names: Optional[Dict[str, str]] = None) -> Future:
+    """Lanza un SP en segundo plano con el executor global."""
+    return procedure_executor.submit(name, params, target, legacy_factory, log_fn, tvps, type_names)
+
+def wait_procedures() -> List[ProcedureResult]:
+    """Espera los SP lanzados con el executor global."""
+    return procedure_executor.wait_all()
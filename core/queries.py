@@ -0,0 +1,230 @@
+"""
+Consultas con nombre filtradas por rango de fechas: parámetros enlazados, predicados sargables y medición
+"""
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import text
+
+# Registrar el plan de ejecución antes de cada consulta (diagnóstico de index seeks)
+QUERY_EXPLAIN = os.getenv('QUERY_EXPLAIN', 'false').lower() == 'true'
+# Consultas más lentas que este umbral se registran con [WARNING]
+QUERY_SLOW_SECONDS = float(os.getenv('QUERY_SLOW_SECONDS', 10))
+
+
+@dataclass
+class DateRangeQuery:
+    """
+    Lectura de `table` filtrada por `date_column` en el rango semiabierto [:desde, :hasta).
+    La columna se compara sin funciones (nada de CONVERT/CAST) para que el índice sea utilizable.
+    """
+    name: str
+    table: str
+    columns: str
+    date_column: str
+    where: str = ''
+    description: str = ''
+    group_by: str = ''
+
+    @property
+    def sql(self) -> str:
+        consulta = (f"SELECT {self.columns} FROM {self.table} "
+                    f"WHERE {self.date_column} >= :desde AND {self.date_column} < :hasta")
+        if self.where:
+            consulta += f" AND ({self.where})"
+        if self.group_by:
+            consulta += f" GROUP BY {self.group_by}"
+        return consulta
+
+
+@dataclass
+class QueryStats:
+    """Métricas de una ejecución de consulta."""
+    name: str
+    rows: int
+    duration_seconds: float
+    params: Dict[str, Any] = field(default_factory=dict)
+    plan: Optional[str] = None
+
+
+QUERIES: Dict[str, DateRangeQuery] = {}
+
+
+def register_query(query: DateRangeQuery) -> DateRangeQuery:
+    """Registra (o reemplaza) una consulta con nombre."""
+    QUERIES[query.name] = query
+    return query
+
+
+def get_query(name: str) -> DateRangeQuery:
+    """Consulta registrada por nombre."""
+    try:
+        return QUERIES[name]
+    except KeyError:
+        raise ValueError(f"Consulta '{name}' no registrada en core/queries.py")
+
+
+def date_range_params(desde: Any, hasta: Optional[Any] = None) -> Dict[str, datetime]:
+    """
+    Parámetros :desde/:hasta del rango semiabierto por días: desde el inicio del día
+    `desde` hasta el inicio del día siguiente a `hasta` (por defecto, solo `desde`).
+    """
+    inicio = pd.Timestamp(desde).normalize()
+    fin = pd.Timestamp(hasta).normalize() if hasta is not None else inicio
+    return {
+        'desde': inicio.to_pydatetime(),
+        'hasta': (fin + timedelta(days=1)).to_pydatetime(),
+    }
+
+
+def _log_default(msg: str):
+    print(msg)
+
+
+def explain_sql(connection, sql: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Plan estimado de una consulta (SHOWPLAN_TEXT en SQL Server, EXPLAIN QUERY PLAN en sqlite)."""
+    params = params or {}
+    dialecto = connection.engine.dialect.name
+    if dialecto == 'sqlite':
+        filas = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).fetchall()
+        return '\n'.join(str(fila[-1]) for fila in filas)
+    if dialecto != 'mssql':
+        raise ValueError(f"EXPLAIN no soportado para el dialecto {dialecto}")
+
+    connection.exec_driver_sql("SET SHOWPLAN_TEXT ON")
+    try:
+        resultado = connection.execute(text(sql), params)
+        lineas = []
+        while True:
+            lineas.extend(str(fila[0]) for fila in resultado.fetchall())
+            if not resultado.cursor or not resultado.cursor.nextset():
+                break
+        return '\n'.join(lineas)
+    finally:
+        connection.exec_driver_sql("SET SHOWPLAN_TEXT OFF")
+
+
+class QueryRunner:
+    """Ejecuta consultas registradas, mide su duración y guarda las métricas de la sesión."""
+
+    def __init__(self, explain: bool = QUERY_EXPLAIN, slow_seconds: float = QUERY_SLOW_SECONDS):
+        self.explain = explain
+        self.slow_seconds = slow_seconds
+        self.stats: List[QueryStats] = []
+
+    def read(
+        self,
+        name: str,
+        connection,
+        desde: Any,
+        hasta: Optional[Any] = None,
+        params: Optional[Dict[str, Any]] = None,
+        explain: Optional[bool] = None,
+        log_fn: Optional[Callable[[str], None]] = None
+    ) -> pd.DataFrame:
+        """
+        Lee la consulta `name` para los días [desde, hasta] (ambos incluidos) con
+        parámetros enlazados; `params` agrega parámetros propios de la consulta.
+        """
+        log = log_fn or _log_default
+        query = get_query(name)
+        valores = {**date_range_params(desde, hasta), **(params or {})}
+
+        plan = None
+        if self.explain if explain is None else explain:
+            plan = explain_sql(connection, query.sql, valores)
+            log(f"[QUERY] Plan de {name}:\n{plan}")
+
+        inicio = time.perf_counter()
+        df = pd.read_sql(text(query.sql), connection, params=valores)
+        stats = QueryStats(name=name, rows=len(df), duration_seconds=time.perf_counter() - inicio,
+                           params=valores, plan=plan)
+        self.stats.append(stats)
+
+        nivel = '[WARNING] ' if stats.duration_seconds >= self.slow_seconds else ''
+        log(f"{nivel}[QUERY] {name}: {stats.rows} filas en {stats.duration_seconds:.2f}s "
+            f"({valores['desde']:%Y-%m-%d} a {valores['hasta']:%Y-%m-%d})")
+        return df
+
+    def explain_query(self, name: str, connection, desde: Any, hasta: Optional[Any] = None,
+                      params: Optional[Dict[str, Any]] = None) -> str:
+        """Plan estimado de la consulta `name` para el rango, sin ejecutarla."""
+        valores = {**date_range_params(desde, hasta), **(params or {})}
+        return explain_sql(connection, get_query(name).sql, valores)
+
+
+# Consultas de Ocupación Activaciones (base AMG)
+register_query(DateRangeQuery(
+    name='activaciones_gestiones',
+    table='TblActivacionesBD',
+    columns='nombre_usuario codigo_salesys, asesor, hora_inicio_call_center, hora_fin_call_center',
+    date_column='hora_inicio_call_center',
+    description='Gestiones del call center por hora de inicio',
+))
+register_query(DateRangeQuery(
+    name='estado_agente_intervalos',
+    table='TblEstadoAgenteSaleSysBD',
+    columns='codigo_del_agente codigo_salesys, [FUNCION] funcion, [hora_inicio], [hora_fin]',
+    date_column='[hora_inicio]',
+    description='Estados de agente por hora de inicio',
+))
+# Variantes incrementales: solo filas que siguen abiertas o terminan después de :marca
+register_query(DateRangeQuery(
+    name='activaciones_gestiones_desde_marca',
+    table='TblActivacionesBD',
+    columns='nombre_usuario codigo_salesys, asesor, hora_inicio_call_center, hora_fin_call_center',
+    date_column='hora_inicio_call_center',
+    where='hora_fin_call_center IS NULL OR hora_fin_call_center > :marca',
+    description='Gestiones del call center abiertas o que terminan después de :marca',
+))
+register_query(DateRangeQuery(
+    name='estado_agente_desde_marca',
+    table='TblEstadoAgenteSaleSysBD',
+    columns='codigo_del_agente codigo_salesys, [FUNCION] funcion, [hora_inicio], [hora_fin]',
+    date_column='[hora_inicio]',
+    where='[hora_fin] IS NULL OR [hora_fin] > :marca',
+    description='Estados de agente abiertos o que terminan después de :marca',
+))
+register_query(DateRangeQuery(
+    name='nomina_campana',
+    table='View_TblNomina',
+    columns=('[fecha], [Codigo SaleSys] codigo_salesys, [Nombre Completo] nombre, [condicion], [cargo], '
+             '[CAMPAÑA] campana'),
+    date_column='[fecha]',
+    where='[CAMPAÑA] = :campana',
+    description='Nómina por día y campaña (parámetro :campana)',
+))
+register_query(DateRangeQuery(
+    name='nomina_campana_version',
+    table='View_TblNomina',
+    # Checksum del contenido de las columnas que lee nomina_campana: un cambio de condición,
+    # cargo o nombre cambia la versión aunque no cambie la cantidad de filas (solo SQL Server;
+    # en otros motores ReferenceCache calcula la huella en pandas)
+    columns=('[fecha], COUNT(*) filas, CHECKSUM_AGG(BINARY_CHECKSUM([Codigo SaleSys], [Nombre Completo], '
+             '[condicion], [cargo])) contenido'),
+    date_column='[fecha]',
+    where='[CAMPAÑA] = :campana',
+    group_by='[fecha]',
+    description='Filas y checksum del contenido de la nómina por día y campaña (versión para core/reference_cache.py)',
+))
+
+
+# Instancia global
+query_runner = QueryRunner()
+
+
+def read_query(name: str, connection, desde: Any, hasta: Optional[Any] = None,
+               params: Optional[Dict[str, Any]] = None,
+               log_fn: Optional[Callable[[str], None]] = None) -> pd.DataFrame:
+    """Lee una consulta registrada con el runner global."""
+    return query_runner.read(name, connection, desde, hasta, params=params, log_fn=log_fn)
+
+
+def explain_query(name: str, connection, desde: Any, hasta: Optional[Any] = None,
+                  params: Optional[Dict[str, Any]] = None) -> str:
+    """Plan estimado de una consulta registrada."""
+    return query_runner.explain_query(name, connection, desde, hasta, params=params)
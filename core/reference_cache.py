@@ -0,0 +1,154 @@
+"""
+Caché local de datos de referencia diarios (nómina): una lectura por día y clave, servida desde memoria o parquet
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+from unidecode import unidecode
+
+from core.queries import read_query
+
+# Carpeta de la caché: {dir}/{nombre}/{YYYY-MM-DD}/{clave}.parquet + .json con la versión
+REFERENCE_CACHE_DIR = os.getenv('REFERENCE_CACHE_DIR', 'logs/cache/reference')
+
+
+def _log_default(msg: str):
+    print(msg)
+
+
+class ReferenceCache:
+    """
+    Datos de referencia por (día, clave) leídos con consultas registradas en core/queries.py.
+
+    `query` trae las filas y `version_query` (agrupada por día) una huella barata de cada día;
+    fuera de SQL Server (respaldo local) la huella se calcula en pandas sobre las filas de `query`.
+    Un día guardado se sirve desde memoria o disco mientras se haya leído hoy y su huella no
+    haya cambiado en el origen; si no, se vuelve a leer (todos los días vencidos en una sola
+    consulta de rango).
+    """
+
+    def __init__(self, name: str, query: str, version_query: str, key_param: str,
+                 date_column: str = 'fecha', cache_dir: Optional[str] = None):
+        self.name = name
+        self.query = query
+        self.version_query = version_query
+        self.key_param = key_param
+        self.date_column = date_column
+        self.cache_dir = Path(cache_dir or REFERENCE_CACHE_DIR) / name
+        self._memory: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._disk = True
+
+    def _path(self, dia: pd.Timestamp, clave: str) -> Path:
+        nombre = unidecode(str(clave)).replace(' ', '_').replace('/', '_')
+        return self.cache_dir / f"{dia:%Y-%m-%d}" / f"{nombre}.parquet"
+
+    def _read_disk(self, dia: pd.Timestamp, clave: str) -> Optional[Dict[str, Any]]:
+        ruta = self._path(dia, clave)
+        try:
+            meta = json.loads(ruta.with_suffix('.json').read_text())
+            return {**meta, 'frame': pd.read_parquet(ruta)}
+        except Exception:
+            return None
+
+    def _write_disk(self, dia: pd.Timestamp, clave: str, entrada: Dict[str, Any], log: Callable[[str], None]):
+        if not self._disk:
+            return
+        ruta = self._path(dia, clave)
+        try:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            entrada['frame'].to_parquet(ruta, index=False)
+            ruta.with_suffix('.json').write_text(json.dumps(
+                {'version': entrada['version'], 'fetched_on': entrada['fetched_on']}
+            ))
+        except ImportError as e:
+            # Sin pyarrow la caché queda solo en memoria (por proceso)
+            self._disk = False
+            log(f"[WARNING] Caché {self.name} sin disco (parquet no disponible): {e}")
+        except OSError as e:
+            log(f"[WARNING] No se pudo escribir la caché {ruta}: {e}")
+
+    def versions(self, connection, desde: Any, hasta: Any, clave: str,
+                 log_fn: Optional[Callable[[str], None]] = None) -> Dict[pd.Timestamp, str]:
+        """Huella de cada día del rango en el origen (días sin filas no aparecen)."""
+        if connection.dialect.name != 'mssql':
+            return self._content_versions(connection, desde, hasta, clave, log_fn)
+        df = read_query(self.version_query, connection, desde, hasta, params={self.key_param: clave}, log_fn=log_fn)
+        dias = pd.to_datetime(df[self.date_column]).dt.normalize()
+        resto = df.drop(columns=[self.date_column]).astype(str).agg('|'.join, axis=1)
+        return dict(zip(dias, resto))
+
+    def _content_versions(self, connection, desde: Any, hasta: Any, clave: str,
+                          log_fn: Optional[Callable[[str], None]] = None) -> Dict[pd.Timestamp, str]:
+        """
+        Huella portable (sin CHECKSUM_AGG): filas y suma de hashes del contenido de cada día,
+        independiente del orden como en SQL Server. Lee las filas completas del rango.
+        """
+        df = read_query(self.query, connection, desde, hasta, params={self.key_param: clave}, log_fn=log_fn)
+        dias = pd.to_datetime(df[self.date_column]).dt.normalize()
+        hashes = pd.util.hash_pandas_object(df.drop(columns=[self.date_column]).astype(str), index=False)
+        por_dia = hashes.groupby(dias.to_numpy()).agg(['size', 'sum'])
+        return {pd.Timestamp(dia): f"{fila['size']}|{fila['sum']}" for dia, fila in por_dia.iterrows()}
+
+    def get(self, connection, desde: Any, hasta: Optional[Any], clave: str,
+            log_fn: Optional[Callable[[str], None]] = None) -> pd.DataFrame:
+        """Filas de los días [desde, hasta] (ambos incluidos) para `clave`."""
+        log = log_fn or _log_default
+        inicio = pd.Timestamp(desde).normalize()
+        dias = list(pd.date_range(inicio, pd.Timestamp(hasta).normalize() if hasta is not None else inicio))
+        versiones = self.versions(connection, dias[0], dias[-1], clave, log_fn=log_fn)
+        hoy = pd.Timestamp.today().strftime('%Y-%m-%d')
+
+        frames: Dict[pd.Timestamp, pd.DataFrame] = {}
+        vencidos: List[pd.Timestamp] = []
+        with self._lock:
+            for dia in dias:
+                version = versiones.get(dia, '')
+                entrada = self._memory.get((dia, clave)) or self._read_disk(dia, clave)
+                if entrada and entrada['version'] == version and entrada['fetched_on'] == hoy:
+                    self._memory[(dia, clave)] = entrada
+                    frames[dia] = entrada['frame']
+                else:
+                    vencidos.append(dia)
+
+        if vencidos:
+            df = read_query(self.query, connection, vencidos[0], vencidos[-1],
+                            params={self.key_param: clave}, log_fn=log_fn)
+            df[self.date_column] = pd.to_datetime(df[self.date_column]).dt.normalize()
+            with self._lock:
+                for dia in vencidos:
+                    entrada = {'version': versiones.get(dia, ''), 'fetched_on': hoy,
+                               'frame': df[df[self.date_column] == dia].reset_index(drop=True)}
+                    self._memory[(dia, clave)] = entrada
+                    self._write_disk(dia, clave, entrada, log)
+                    frames[dia] = entrada['frame']
+
+        log(f"[CACHE] {self.name} {clave}: {len(dias) - len(vencidos)} días desde caché, {len(vencidos)} leídos del origen")
+        return pd.concat([frames[dia] for dia in dias], ignore_index=True)
+
+    def invalidate(self, dia: Optional[Any] = None):
+        """Descarta la caché de un día (o toda) en memoria y disco."""
+        with self._lock:
+            if dia is None:
+                self._memory.clear()
+                archivos = self.cache_dir.glob('*/*')
+            else:
+                dia = pd.Timestamp(dia).normalize()
+                self._memory = {k: v for k, v in self._memory.items() if k[0] != dia}
+                archivos = (self.cache_dir / f"{dia:%Y-%m-%d}").glob('*')
+            for archivo in archivos:
+                archivo.unlink(missing_ok=True)
+
+
+# Instancia global: nómina por día y campaña (View_TblNomina)
+nomina_cache = ReferenceCache('nomina', 'nomina_campana', 'nomina_campana_version', key_param='campana')
+
+
+def get_nomina(connection, desde: Any, hasta: Optional[Any] = None, campana: str = 'ACTIVACIONES',
+               log_fn: Optional[Callable[[str], None]] = None) -> pd.DataFrame:
+    """Nómina de una campaña para los días [desde, hasta] desde la caché global."""
+    return nomina_cache.get(connection, desde, hasta, campana, log_fn=log_fn)
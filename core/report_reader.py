@@ -0,0 +1,237 @@
+"""
+Lectura de reportes CSV de SaleSys a partir del registro de esquemas (config/report_schemas.yaml)
+"""
+from typing import Callable, Dict, Any, Iterator, List, Optional
+
+import pandas as pd
+from unidecode import unidecode
+
+from config.report_schemas import REPORT_SCHEMAS
+from core.csv_reader import iter_csv, read_csv
+from core.date_parsing import parse_datetime_column
+from core.report_sidecar import (find_sidecar, iter_sidecar, read_sidecar, save_sidecar, schema_fingerprint,
+                                 sidecar_columns, sidecars_enabled)
+
+
+class SchemaDriftError(ValueError):
+    """El archivo no coincide con el esquema declarado del reporte."""
+
+
+def normalize_column_name(col: str) -> str:
+    """Nombre normalizado de una columna: sin tildes, minúsculas y '_' en vez de espacios."""
+    return unidecode(str(col)).strip().lower().replace(' ', '_')
+
+
+def get_report_schema(report: str) -> Dict[str, Any]:
+    """Devuelve el esquema registrado de un reporte."""
+    try:
+        return REPORT_SCHEMAS[report]
+    except KeyError:
+        raise ValueError(f"Reporte '{report}' no registrado en config/report_schemas.yaml")
+
+
+def _plan(report: str, ruta: str, encabezado: List[str], normalizer: Callable[[str], str],
+          log: Callable[[str], None], columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Arma los parámetros de lectura (usecols, dtype, renombres) a partir del encabezado,
+    validando que las columnas declaradas sigan presentes. Con `columns` (nombres como
+    quedan en el resultado) solo se leen esas columnas.
+    """
+    schema = get_report_schema(report)
+    columnas = schema.get('columns', {})
+    por_nombre = {normalizer(col): col for col in encabezado}
+
+    faltantes = [
+        nombre for nombre, spec in columnas.items()
+        if nombre not in por_nombre and spec.get('required', True)
+    ]
+    if faltantes:
+        raise SchemaDriftError(f"[{report}] {ruta}: faltan columnas {faltantes} (encabezado: {encabezado})")
+
+    declaradas = {nombre: por_nombre[nombre] for nombre in columnas if nombre in por_nombre}
+    conservar_extras = schema.get('extra_columns', 'keep') == 'keep'
+    if not conservar_extras:
+        nuevas = [col for col in encabezado if col not in declaradas.values()]
+        if nuevas:
+            log(f"[SCHEMA] {report}: columnas no declaradas ignoradas {nuevas}")
+
+    dtype, fechas = {}, {}
+    for nombre, original in declaradas.items():
+        spec = columnas[nombre]
+        if spec.get('dtype') == 'datetime':
+            dtype[original] = 'string'
+            fechas[original] = spec.get('format')
+        elif spec.get('dtype'):
+            dtype[original] = spec['dtype']
+
+    renombres = {}
+    if schema.get('normalize_columns', False):
+        renombres = {col: normalizer(col) for col in encabezado}
+
+    usecols = None if conservar_extras else list(declaradas.values())
+    if columns is not None:
+        originales = {renombres.get(col, col): col for col in encabezado}
+        desconocidas = [col for col in columns if col not in originales]
+        if desconocidas:
+            raise ValueError(f"[{report}] {ruta}: columnas pedidas que no están en el archivo {desconocidas}")
+        pedidas = {originales[col] for col in columns}
+        usecols = [col for col in encabezado if col in pedidas]
+        dtype = {col: tipo for col, tipo in dtype.items() if col in pedidas}
+        fechas = {col: fmt for col, fmt in fechas.items() if col in pedidas}
+
+    return {
+        'usecols': usecols,
+        'dtype': dtype,
+        'fechas': fechas,
+        'renombres': renombres,
+    }
+
+
+def _conform(df: pd.DataFrame, plan: Dict[str, Any], fallback: Optional[Callable[[Any], Any]]) -> pd.DataFrame:
+    """Parsea las columnas fecha del bloque y aplica los nombres normalizados."""
+    for original, fmt in plan['fechas'].items():
+        df[original] = parse_datetime_column(df[original], fmt=fmt, fallback=fallback)
+    if plan['renombres']:
+        df = df.rename(columns=plan['renombres'])
+    return df
+
+
+def _read_options(report: str, ruta: str, normalizer: Callable[[str], str],
+                  read_kwargs: Dict[str, Any], log: Callable[[str], None],
+                  columns: Optional[List[str]] = None, encabezado: Optional[List[str]] = None):
+    """
+    Combina los parámetros del esquema con los del llamador y el plan de columnas.
+    Sin `encabezado` se lee solo la primera línea del CSV.
+    """
+    opciones = dict(get_report_schema(report).get('read', {}))
+    opciones.update(read_kwargs)
+    if encabezado is None:
+        encabezado_kwargs = {k: v for k, v in opciones.items() if k in ('sep', 'encoding')}
+        encabezado = list(pd.read_csv(ruta, nrows=0, **encabezado_kwargs).columns)
+    plan = _plan(report, ruta, encabezado, normalizer, log, columns)
+    opciones.update(usecols=plan['usecols'], dtype=plan['dtype'])
+    return opciones, plan
+
+
+def _sidecar_vigente(report: str, ruta: str, read_kwargs: Dict[str, Any]):
+    """Sidecar Parquet utilizable en lugar del CSV (solo sin parámetros de lectura propios del llamador)."""
+    if read_kwargs:
+        return None
+    return find_sidecar(report, ruta, schema_fingerprint(get_report_schema(report)))
+
+
+def _fechas_sidecar(serie: pd.Series, fmt: Optional[str]) -> pd.Series:
+    """
+    La columna ya parseada si todas sus celdas calzan con algún formato conocido; si no,
+    queda como texto para que quien lea el sidecar aplique su propio `datetime_fallback`.
+    """
+    parseada = parse_datetime_column(serie, fmt=fmt, fallback=lambda valor: None)
+    texto = serie.str.strip()
+    if (parseada.isna() & texto.notna() & (texto != '')).any():
+        return serie
+    return parseada
+
+
+def write_sidecar(report: str, ruta: str, log_fn: Optional[Callable[[str], None]] = None):
+    """
+    Convierte un reporte descargado a su sidecar Parquet (encabezado original, tipos del
+    esquema y fechas parseadas). No interrumpe la descarga: ante un error solo se registra
+    y los lectores siguen usando el CSV. Devuelve la ruta del sidecar o None.
+    """
+    log = log_fn or print
+    if not sidecars_enabled():
+        return None
+    try:
+        opciones, plan = _read_options(report, ruta, normalize_column_name, {}, log)
+        df = read_csv(ruta, log_fn=log, **opciones)
+        for original, fmt in plan['fechas'].items():
+            df[original] = _fechas_sidecar(df[original], fmt)
+        sidecar = save_sidecar(df, report, ruta, schema_fingerprint(get_report_schema(report)))
+    except Exception as e:
+        log(f"[WARNING] No se pudo escribir el sidecar Parquet de {ruta}: {e}")
+        return None
+    log(f"[SIDECAR] {report}: {len(df):,} filas -> {sidecar}")
+    return sidecar
+
+
+def _iter_chunks(report: str, ruta: str, chunksize: int, opciones: Dict[str, Any], plan: Dict[str, Any],
+                 fallback: Optional[Callable[[Any], Any]], log: Callable[[str], None]) -> Iterator[pd.DataFrame]:
+    try:
+        for bloque in iter_csv(ruta, chunksize, log_fn=log, **opciones):
+            yield _conform(bloque, plan, fallback)
+    except SchemaDriftError:
+        raise
+    except (ValueError, TypeError) as e:
+        raise SchemaDriftError(f"[{report}] {ruta}: los datos no calzan con los tipos declarados ({e})") from e
+
+
+def iter_report_chunks(
+    report: str,
+    ruta: str,
+    chunksize: int,
+    datetime_fallback: Optional[Callable[[Any], Any]] = None,
+    normalizer: Callable[[str], str] = normalize_column_name,
+    log_fn: Optional[Callable[[str], None]] = None,
+    columns: Optional[List[str]] = None,
+    **read_kwargs
+) -> Iterator[pd.DataFrame]:
+    """
+    Lee el reporte por bloques de `chunksize` filas, cada uno ya tipado según su esquema
+    (desde el sidecar Parquet si está vigente).
+    """
+    log = log_fn or print
+    sidecar = _sidecar_vigente(report, ruta, read_kwargs)
+    if sidecar is not None:
+        _, plan = _read_options(report, ruta, normalizer, read_kwargs, log, columns, sidecar_columns(sidecar))
+        return (_conform(bloque, plan, datetime_fallback) for bloque in iter_sidecar(sidecar, chunksize, plan['usecols']))
+    opciones, plan = _read_options(report, ruta, normalizer, read_kwargs, log, columns)
+    return _iter_chunks(report, ruta, chunksize, opciones, plan, datetime_fallback, log)
+
+
+def read_report(
+    report: str,
+    ruta: str,
+    chunksize: Optional[int] = None,
+    datetime_fallback: Optional[Callable[[Any], Any]] = None,
+    normalizer: Callable[[str], str] = normalize_column_name,
+    log_fn: Optional[Callable[[str], None]] = None,
+    columns: Optional[List[str]] = None,
+    **read_kwargs
+) -> pd.DataFrame:
+    """
+    Lee un reporte completo con las columnas, tipos y formatos de su esquema.
+
+    Si el reporte tiene un sidecar Parquet vigente (write_sidecar) se lee de ahí, solo
+    con las columnas necesarias; si no, del CSV. `columns` limita la lectura a esas
+    columnas (nombres como quedan en el resultado).
+
+    Con `chunksize` se lee por bloques y se concatena: las fechas se parsean
+    bloque a bloque y nunca conviven el texto crudo y el resultado de todo el archivo.
+    """
+    log = log_fn or print
+    sidecar = _sidecar_vigente(report, ruta, read_kwargs)
+    if sidecar is not None:
+        _, plan = _read_options(report, ruta, normalizer, read_kwargs, log, columns, sidecar_columns(sidecar))
+        try:
+            df = read_sidecar(sidecar, plan['usecols'])
+        except Exception as e:
+            log(f"[WARNING] Sidecar {sidecar} ilegible, se lee el CSV: {e}")
+        else:
+            return _conform(df, plan, datetime_fallback)
+
+    opciones, plan = _read_options(report, ruta, normalizer, read_kwargs, log, columns)
+    if not chunksize:
+        try:
+            df = read_csv(ruta, log_fn=log, **opciones)
+        except (ValueError, TypeError) as e:
+            raise SchemaDriftError(f"[{report}] {ruta}: los datos no calzan con los tipos declarados ({e})") from e
+        return _conform(df, plan, datetime_fallback)
+
+    bloques: List[pd.DataFrame] = list(_iter_chunks(report, ruta, chunksize, opciones, plan, datetime_fallback, log))
+    df = pd.concat(bloques, ignore_index=True)
+    # Bloques con categorías distintas se concatenan como object: volver a category
+    for original, tipo in plan['dtype'].items():
+        if tipo == 'category':
+            col = plan['renombres'].get(original, original)
+            df[col] = df[col].astype('category')
+    return df
@@ -0,0 +1,124 @@
+"""
+Copias Parquet (sidecar) de los reportes descargados: tipadas, comprimidas y legibles por columnas
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional: sin él no se escriben ni se leen sidecars
+    pa = None
+    pq = None
+
+# Escribir el sidecar al ubicar cada descarga y preferirlo al CSV al leer
+REPORT_SIDECARS = os.getenv('REPORT_SIDECARS', 'true').lower() == 'true'
+# Carpeta raíz de un árbol espejo de BASE_DOWNLOAD_PATH; vacío = junto al CSV
+REPORT_SIDECAR_DIR = os.getenv('REPORT_SIDECAR_DIR', '')
+REPORT_SIDECAR_COMPRESSION = os.getenv('REPORT_SIDECAR_COMPRESSION', 'zstd')
+
+# Cambia si cambia lo que se guarda en el sidecar (invalida los existentes)
+SIDECAR_VERSION = 1
+_CLAVE_METADATA = b'report_sidecar'
+
+
+def sidecars_enabled() -> bool:
+    return REPORT_SIDECARS and pq is not None
+
+
+def _base_descargas() -> Path:
+    # Import diferido: config.settings exige credenciales y solo hace falta con el árbol espejo
+    from config.settings import BASE_DOWNLOAD_PATH
+    return BASE_DOWNLOAD_PATH
+
+
+def sidecar_path(ruta: Any) -> Path:
+    """Ruta del sidecar: mismo nombre .parquet junto al CSV o en el árbol espejo de REPORT_SIDECAR_DIR."""
+    ruta = Path(ruta)
+    if REPORT_SIDECAR_DIR:
+        try:
+            relativa = ruta.relative_to(_base_descargas())
+            return (Path(REPORT_SIDECAR_DIR) / relativa).with_suffix('.parquet')
+        except ValueError:
+            pass  # Fuera del árbol de descargas: junto al archivo
+    return ruta.with_suffix('.parquet')
+
+
+def schema_fingerprint(schema: Dict[str, Any]) -> str:
+    """Huella del esquema del reporte: un sidecar escrito con otro esquema no se usa."""
+    contenido = json.dumps({'version': SIDECAR_VERSION, 'schema': schema}, sort_keys=True, default=str)
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()
+
+
+def _origen(ruta: Path) -> Dict[str, int]:
+    estado = ruta.stat()
+    return {'size': estado.st_size, 'mtime_ns': estado.st_mtime_ns}
+
+
+def read_metadata(sidecar: Path) -> Optional[Dict[str, Any]]:
+    """Metadatos guardados en el sidecar (None si no existe o no se puede leer)."""
+    try:
+        metadata = pq.read_schema(sidecar).metadata or {}
+        return json.loads(metadata[_CLAVE_METADATA])
+    except Exception:
+        return None
+
+
+def sidecar_columns(sidecar: Path) -> List[str]:
+    """Columnas del sidecar (encabezado original del CSV), sin leer los datos."""
+    return [nombre for nombre in pq.read_schema(sidecar).names if not nombre.startswith('__index_level_')]
+
+
+def find_sidecar(report: str, ruta: Any, fingerprint: str) -> Optional[Path]:
+    """
+    Sidecar vigente del archivo: mismo reporte y esquema, y escrito a partir del CSV tal como
+    está ahora (tamaño y fecha de modificación). Si el CSV ya no existe se usa el sidecar.
+    """
+    if not sidecars_enabled():
+        return None
+    sidecar = sidecar_path(ruta)
+    if not sidecar.exists():
+        return None
+    metadata = read_metadata(sidecar)
+    if not metadata or metadata.get('report') != report or metadata.get('schema') != fingerprint:
+        return None
+    ruta = Path(ruta)
+    if ruta.exists() and _origen(ruta) != metadata.get('source'):
+        return None
+    return sidecar
+
+
+def save_sidecar(df: pd.DataFrame, report: str, ruta: Any, fingerprint: str) -> Path:
+    """Escribe el sidecar (a un temporal y luego os.replace, para no dejar archivos a medias)."""
+    ruta = Path(ruta)
+    sidecar = sidecar_path(ruta)
+    sidecar.parent.mkdir(parents=True, exist_ok=True)
+
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = json.dumps({'report': report, 'schema': fingerprint, 'source': _origen(ruta), 'rows': len(df)})
+    tabla = tabla.replace_schema_metadata({**(tabla.schema.metadata or {}), _CLAVE_METADATA: metadata.encode('utf-8')})
+
+    temporal = sidecar.with_suffix('.parquet.tmp')
+    pq.write_table(tabla, temporal, compression=REPORT_SIDECAR_COMPRESSION)
+    os.replace(temporal, sidecar)
+    return sidecar
+
+
+def read_sidecar(sidecar: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Lee el sidecar completo o solo las columnas indicadas."""
+    return pq.read_table(sidecar, columns=columns).to_pandas()
+
+
+def iter_sidecar(sidecar: Path, chunksize: int, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """Bloques de `chunksize` filas del sidecar (con índice continuo, como pd.read_csv por bloques)."""
+    inicio = 0
+    for lote in pq.ParquetFile(sidecar).iter_batches(batch_size=chunksize, columns=columns):
+        bloque = pa.Table.from_batches([lote]).to_pandas()
+        bloque.index = pd.RangeIndex(inicio, inicio + len(bloque))
+        inicio += len(bloque)
+        yield bloque
@@ -0,0 +1,121 @@
+"""
+Ingesta por bloques de CSV grandes: lectura, transformación y carga solapadas
+"""
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Any, Iterable, Optional
+
+import pandas as pd
+from sqlalchemy.engine import Engine
+
+from core.bulk_loader import (
+    LoadStats, load_dataframe, prepare_shadow_table, resolve_load_mode, swap_shadow_table, truncate_table
+)
+
+STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', 50000))
+# Bloques transformados en espera de escritura (acota la memoria a ~N+2 bloques)
+STREAM_QUEUE_SIZE = int(os.getenv('STREAM_QUEUE_SIZE', 2))
+
+_FIN = object()
+_ABORTAR = object()
+
+
+class _LecturaAbortada(Exception):
+    """El lector falló: el escritor hace rollback de lo cargado."""
+
+
+def stream_chunks_to_table(
+    chunks: Iterable[pd.DataFrame],
+    table: str,
+    engine: Engine,
+    transform: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+    schema: str = 'dbo',
+    mode: Optional[str] = None,
+    log_fn: Optional[Callable[[str], None]] = None
+) -> LoadStats:
+    """
+    Reemplaza `table` con los bloques recibidos, escribiendo cada uno apenas se transforma.
+
+    Un hilo escritor inserta los bloques en una única transacción mientras el
+    hilo principal sigue leyendo/transformando el siguiente. En modo 'swap' se
+    escribe en la tabla sombra y al final se intercambia; en modo 'truncate'
+    se vacía la tabla destino dentro de la misma transacción de carga.
+    """
+    log = log_fn or print
+    mode = resolve_load_mode(engine, mode)
+    destino = prepare_shadow_table(engine, table, schema) if mode == 'swap' else table
+
+    cola: queue.Queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    estado: Dict[str, Any] = {'filas': 0, 'bloques': 0, 'error': None}
+    silencioso = lambda msg: None
+
+    def escritor():
+        try:
+            with engine.begin() as connection:
+                if mode != 'swap':
+                    truncate_table(connection, table, schema)
+                while True:
+                    bloque = cola.get()
+                    if bloque is _FIN:
+                        break
+                    if bloque is _ABORTAR:
+                        raise _LecturaAbortada()
+                    load_dataframe(bloque, destino, connection, schema=schema, log_fn=silencioso)
+                    estado['filas'] += len(bloque)
+                    estado['bloques'] += 1
+        except _LecturaAbortada:
+            pass
+        except Exception as e:
+            estado['error'] = e
+            # Vaciar la cola para no bloquear al lector
+            while True:
+                pendiente = cola.get()
+                if pendiente is _FIN or pendiente is _ABORTAR:
+                    break
+
+    inicio = time.perf_counter()
+    hilo = threading.Thread(target=escritor, name=f"stream-{table}", daemon=True)
+    hilo.start()
+    try:
+        for bloque in chunks:
+            if estado['error'] is not None:
+                break
+            if transform is not None:
+                bloque = transform(bloque)
+            cola.put(bloque)
+    except BaseException:
+        cola.put(_ABORTAR)
+        hilo.join()
+        raise
+    cola.put(_FIN)
+    hilo.join()
+
+    if estado['error'] is not None:
+        raise estado['error']
+
+    metodo = 'stream'
+    if mode == 'swap':
+        metodo = f"stream+{swap_shadow_table(engine, table, schema, log_fn)}"
+    stats = LoadStats(table=table, rows=estado['filas'], duration_seconds=time.perf_counter() - inicio, method=metodo)
+    log(f"[STREAM] {table}: {stats.rows} registros en {estado['bloques']} bloques, "
+        f"{stats.duration_seconds:.2f}s ({stats.rows_per_second:,.0f} filas/s)")
+    return stats
+
+
+def stream_csv_to_table(
+    ruta: str,
+    table: str,
+    engine: Engine,
+    transform: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+    chunksize: int = STREAM_CHUNK_ROWS,
+    read_kwargs: Optional[Dict[str, Any]] = None,
+    schema: str = 'dbo',
+    mode: Optional[str] = None,
+    log_fn: Optional[Callable[[str], None]] = None
+) -> LoadStats:
+    """Lee un CSV por bloques de `chunksize` filas y lo carga en `table` sin materializarlo entero."""
+    with pd.read_csv(ruta, chunksize=chunksize, **(read_kwargs or {})) as lector:
+        return stream_chunks_to_table(lector, table, engine, transform=transform,
+                                      schema=schema, mode=mode, log_fn=log_fn)
@@ -0,0 +1,101 @@
+"""
+Envío de DataFrames a procedimientos almacenados como table-valued parameters (pyodbc)
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy.engine import Engine
+
+from core.connections import get_engine
+from core.local_backend import call_stub_procedure
+
+
+def _split_type_name(type_name: str) -> Tuple[str, str]:
+    """'dbo.TT_Tabla' -> ('TT_Tabla', 'dbo')."""
+    if '.' in type_name:
+        schema, nombre = type_name.split('.', 1)
+        return nombre.strip('[]'), schema.strip('[]')
+    return type_name.strip('[]'), 'dbo'
+
+
+def table_type_columns(cursor, type_name: str) -> List[str]:
+    """Columnas del tipo tabla en el orden en que el servidor las espera."""
+    nombre, schema = _split_type_name(type_name)
+    cursor.execute(
+        "SELECT c.name FROM sys.table_types tt "
+        "JOIN sys.columns c ON c.object_id = tt.type_table_object_id "
+        "WHERE tt.name = ? AND SCHEMA_NAME(tt.schema_id) = ? ORDER BY c.column_id",
+        (nombre, schema)
+    )
+    columnas = [row[0] for row in cursor.fetchall()]
+    if not columnas:
+        raise ValueError(f"Tipo tabla '{type_name}' no existe en el servidor")
+    return columnas
+
+
+def dataframe_to_tvp(df: pd.DataFrame, type_name: str, columns: Optional[List[str]] = None) -> List[Any]:
+    """
+    Convierte un DataFrame en el valor TVP que espera pyodbc: nombre del tipo,
+    esquema y luego una tupla por fila (nulos como None, fechas como datetime).
+    Con `columns` se reordena al orden del tipo tabla; las faltantes van en NULL.
+    """
+    if columns is not None:
+        df = df.reindex(columns=columns)
+    columnas = []
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            valores = [None if pd.isna(v) else v.to_pydatetime() for v in serie]
+        else:
+            valores = serie.astype(object).where(serie.notna(), None).tolist()
+        columnas.append(valores)
+    nombre, schema = _split_type_name(type_name)
+    return [nombre, schema] + list(zip(*columnas))
+
+
+def execute_procedure_tvp(
+    name: str,
+    params: Tuple[Any, ...],
+    tvps: Dict[str, pd.DataFrame],
+    type_names: Dict[str, str],
+    target: str = 'carga_excel',
+    legacy_factory: Optional[Callable[[], Any]] = None,
+    engine: Optional[Engine] = None
+) -> Any:
+    """
+    Ejecuta `name` con los parámetros escalares seguidos de un TVP por cada
+    DataFrame de `tvps` (en ese orden) y devuelve la primera fila del resultado.
+
+    Requiere un destino mssql+pyodbc: el driver pymssql no soporta TVP.
+    """
+    engine = engine or get_engine(target, legacy_factory=legacy_factory)
+    if engine.dialect.name == 'sqlite':
+        # Respaldo local: se simula el SP sin enviar las tablas
+        return call_stub_procedure(engine, name, params)
+    if engine.dialect.driver != 'pyodbc':
+        raise ValueError(f"TVP requiere un destino mssql+pyodbc ('{target}' usa {engine.dialect.driver})")
+
+    conexion = engine.raw_connection()
+    cursor = None
+    try:
+        cursor = conexion.cursor()
+        valores = list(params)
+        for clave, df in tvps.items():
+            columnas = table_type_columns(cursor, type_names[clave])
+            valores.append(dataframe_to_tvp(df, type_names[clave], columnas))
+
+        marcadores = ', '.join('?' for _ in valores)
+        cursor.execute(f"{{CALL {name} ({marcadores})}}", valores)
+        # Saltar los conteos de filas previos al SELECT final del SP
+        while cursor.description is None and cursor.nextset():
+            pass
+        result = cursor.fetchone() if cursor.description else None
+        conexion.commit()
+        return result
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        if cursor:
+            cursor.close()
+        conexion.close()
@@ -234,7 +234,7 @@ class HybridScrapeBot_Dashboard:
         """Obtener estado actual de cada módulo"""
         modules = [
             'rga', 'estado_agente_v2', 'ocupacion_activaciones', 
-            'nomina', 'ea_corte', 'delivery_cortes', 'activaciones_cortes'
+            'nomina', 'cortes'
         ]
         
         # Obtener última sesión exitosa
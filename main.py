@@ -166,9 +166,7 @@ def ejecutar_todos_scripts(session_id):
         'scrapers.salesys.rga',
         'scrapers.salesys.estado_agente_v2',
         'scrapers.salesys.nomina',
-        'scrapers.salesys.ea_corte',
-        'scrapers.salesys.delivery_cortes',
-        'scrapers.salesys.activaciones_cortes',
+        'scrapers.salesys.cortes',  # ea_corte + delivery_cortes + activaciones_cortes, SP solapados
         'scrapers.salesys.ocupacion_activaciones'
     ]
 
@@ -0,0 +1,18 @@
+import sys
+sys.path.append('Z:\AMG Esuarezh\SysAnalistas')
+from core.feeds import run_feeds
+from scrapers.salesys import activaciones_cortes, delivery_cortes, ea_corte
+
+######################################################################################################################
+# Cortes de Estado Agente, Delivery y Activaciones en un solo proceso: el SP de cada feed corre en segundo
+# plano (Sp_EstadoagenteSalesys, Sp_CampañaDelivery, Sp_CampañaActivaciones) mientras se carga el siguiente.
+######################################################################################################################
+MODULOS_CORTE = [ea_corte, delivery_cortes, activaciones_cortes]
+
+
+def cargar_cortes():
+    return run_feeds({modulo.FEED: modulo.OPCIONES_FEED for modulo in MODULOS_CORTE})
+
+
+if __name__ == "__main__":
+    cargar_cortes()
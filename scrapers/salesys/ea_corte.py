@@ -1,56 +1,59 @@
+import os
 import sys
 sys.path.append('Z:\AMG Esuarezh\SysAnalistas')
-import locale
+from pathlib import Path
 import pandas as pd
-import sqlalchemy
-from sqlalchemy import create_engine,text,Table, MetaData
-from funciones.conexion import *
-import pyodbc
-from datetime import datetime, timedelta
-from funciones.funcionEstadoAgente import *
+from core.feeds import run_feed
 import warnings
 warnings.filterwarnings("ignore")
-from datetime import timedelta
-
-locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
-
-fecha = str
-mesNombre = str
-dia = int
-mes = int
-año = int
-
-# Establecer configuración regional en español
-locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
-
-# Leer fecha/hora compartida desde archivo
-with open("shared_timestamp.txt", "r") as f:
-    fecha_hora = f.read().strip()
-
-fecha_hora = pd.to_datetime(fecha_hora)
-# Sumarle 120 segundos
-fecha_hora = fecha_hora + timedelta(seconds=120)
-
-def cargar_datos_estadoagente():
-    mesNombre = fecha_hora.strftime('%B').capitalize()  # Nombre del mes en español
-    dia = fecha_hora.strftime('%d')  # Devuelve '01', '06', etc.
-    mes = fecha_hora.strftime('%m')  # También puedes usar esto si quieres el mes con 2 dígitos
-    año = fecha_hora.year
-
-# Datos de conexión SQLALCHEMY
-
-    # Generar conexión con la BD, para enviar los datos procesados
-
-# Ruta origen de los archivos
-    ruta_origen = f'Z:\\DESCARGA INFORMES\\{año}\\Estado Agente\\{mesNombre}\\EstadoAgente{dia}.csv'
-    
-
-    #df_ea = check_and_concatenate_csv_files(ruta_origen)
-    df = pd.read_csv(ruta_origen,sep=",")
-
-    df['Hora inicio'] = pd.to_datetime(df['Hora inicio'])
-    df['Hora fin'] = pd.to_datetime(df['Hora fin'])
 
+######################################################################################################################
+# Ruta, tabla staging y SP del feed en config/feeds.yaml (sección estado_agente).
+# El corte es el timestamp compartido (shared_timestamp.txt) + 120 segundos.
+######################################################################################################################
+# Cortes horarios: solo se depura y carga lo nuevo desde el corte anterior (estado en EA_STATE_PATH)
+EA_INCREMENTAL = os.getenv('EA_INCREMENTAL', 'false').lower() == 'true'
+EA_STATE_PATH = os.getenv('EA_STATE_PATH', 'logs/cache/estado_agente_estado.pkl')
+# Clave de un estado en la tabla staging (MERGE de los deltas)
+CLAVES_EA = ['Codigo del Agente', 'Hora inicio', 'Funcion']
+# Columnas necesarias para enviar a SQL
+COLUMNAS_SQL = ['Codigo del Agente', 'Agente', 'Funcion', 'Gestion', 'Hora inicio', 'Hora fin', 'Total estimado']
+# Últimos registros de cada asesor que pueden cambiar en el corte siguiente (último estado y SOF final)
+FILAS_COLA = 2
+
+SIGN_OFF = 'SOF - Sign Off'
+# Si el siguiente estado empieza hasta 5 minutos después del SOF, el anterior se extiende hasta él
+TOLERANCIA_SIGN_OFF = pd.Timedelta(minutes=5)
+
+
+def eliminar_sof_consecutivos(df):
+    """
+    De cada racha de SOF - Sign Off consecutivos de un asesor deja solo el último:
+    se descarta todo SOF cuyo siguiente registro (mismo asesor, orden del archivo) también es SOF.
+    """
+    siguiente = df.groupby('Codigo del Agente', sort=False)['Funcion'].shift(-1)
+    return df[~((df['Funcion'] == SIGN_OFF) & (siguiente == SIGN_OFF))]
+
+
+def ajustar_hora_fin(df):
+    """
+    'Hora fin' de cada estado = 'Hora inicio' del siguiente estado del asesor. Si el siguiente
+    es un SOF y el estado posterior empieza dentro de TOLERANCIA_SIGN_OFF, se extiende hasta
+    ese estado (el SOF no corta). El último estado de cada asesor conserva su 'Hora fin'.
+    """
+    grupos = df.groupby('Codigo del Agente', sort=False)
+    inicio_siguiente = grupos['Hora inicio'].shift(-1)
+    inicio_posterior = grupos['Hora inicio'].shift(-2)
+    siguiente_sof = grupos['Funcion'].shift(-1) == SIGN_OFF
+
+    salta_sof = siguiente_sof & ((inicio_posterior - inicio_siguiente) <= TOLERANCIA_SIGN_OFF)
+    tiene_siguiente = grupos.cumcount(ascending=False) > 0
+    df.loc[tiene_siguiente, 'Hora fin'] = inicio_siguiente.where(~salta_sof, inicio_posterior)[tiene_siguiente]
+    return df
+
+
+def _preparar(df, fecha_hora):
+    """Hora fin de los estados abiertos = corte; estados que no terminan el mismo día quedan en cero."""
     # COLOCAMOS HORA FIN CON LA INFO ACTUAL DEL CORTE
     df['Hora fin'] = df['Hora fin'].fillna(fecha_hora)
 
@@ -64,81 +67,115 @@ def cargar_datos_estadoagente():
 
     # Condición: si 'fecha_fin' es distinta de 'fecha_inicio' o si 'fecha_fin' está vacía (NaT)
     df.loc[(df['fecha_fin'] != df['fecha_inicio']) | (df['fecha_fin'].isna()), 'Hora fin'] = df['Hora inicio']
+    return df
 
-    #print(df)
-    # Procesamiento para eliminar SOF - Sign Off consecutivos por cada asesor
-    for agente, grupo in df.groupby('Codigo del Agente'):
-        indices_a_eliminar = []  # Para almacenar los índices de los SOF consecutivos a eliminar
-        ultimo_sign_off = None  # Para almacenar el índice del último SOF consecutivo
-        
-        for i in range(1, len(grupo)):
-            registro_actual = grupo.iloc[i]
-            registro_anterior = grupo.iloc[i - 1]
-            
-            # Si el registro actual y el anterior son 'SOF - Sign Off'
-            if registro_actual['Funcion'] == 'SOF - Sign Off':
-                if registro_anterior['Funcion'] == 'SOF - Sign Off':
-                    # Marcar el anterior para eliminar
-                    indices_a_eliminar.append(grupo.index[i - 1])
-                ultimo_sign_off = grupo.index[i]  # Guardar el índice del último SOF consecutivo
-        
-        # Si encontramos varios consecutivos, eliminar todos menos el último
-        if indices_a_eliminar:
-            # Si el último SOF consecutivo está en la lista de eliminación, no lo eliminamos
-            if ultimo_sign_off in indices_a_eliminar:
-                indices_a_eliminar.remove(ultimo_sign_off)
-        
-        # Eliminar los registros marcados como duplicados
-        df = df.drop(indices_a_eliminar)
-
-    # Reiniciar el índice del DataFrame después de eliminar registros
-    df = df.reset_index(drop=True)
-
-    # Generar una copia independiente del DF
-    df_final = df.copy()
-                        
-    # Procesamiento para ajustar 'Hora fin' por cada asesor
-    for agente, grupo in df_final.groupby('Codigo del Agente'):
-        for i in range(1, len(grupo)):
-            # Registro actual en el grupo
-            registro_actual = grupo.iloc[i]
-
-            if registro_actual['Funcion'] == 'SOF - Sign Off':
-                # Registro anterior
-                registro_anterior = grupo.iloc[i - 1]
-                
-                # Verificar si existe un siguiente registro para aplicar la lógica de los 5 minutos
-                if i < len(grupo) - 1:
-                    registro_siguiente = grupo.iloc[i + 1]
-                    
-                    # Comparar la diferencia entre la Hora inicio del SOF - Sign Off y el siguiente registro
-                    diferencia_tiempo = registro_siguiente['Hora inicio'] - registro_actual['Hora inicio']
-                    
-                    # Si la diferencia de tiempo es menor o igual a 5 minutos
-                    if diferencia_tiempo <= pd.Timedelta(minutes=5):
-                        # Ajustar 'Hora fin' del registro anterior al 'Hora inicio' del registro siguiente
-                        df_final.at[grupo.index[i - 1], 'Hora fin'] = registro_siguiente['Hora inicio']
-                    else:
-                        # Si la diferencia de tiempo es mayor a 5 minutos, ajustar 'Hora fin' del registro anterior con la 'Hora fin' del registro actual
-                        df_final.at[grupo.index[i - 1], 'Hora fin'] = registro_actual['Hora inicio']                
-            
-            # Ajuste en caso de que no haya SOF - Sign Off
-            else:
-                if i > 0:  # Evitar índice fuera de rango
-                    registro_anterior = grupo.iloc[i - 1]
-                    # Ajustar 'Hora fin' del registro anterior al 'Hora inicio' del registro actual
-                    df_final.at[grupo.index[i - 1], 'Hora fin'] = registro_actual['Hora inicio']
-
-        # Caso donde el SOF - Sign Off es el último estado de un asesor
-        if len(grupo) > 1 and grupo.iloc[-1]['Funcion'] == 'SOF - Sign Off':
-            df_final.at[grupo.index[-2], 'Hora fin'] = grupo.iloc[-1]['Hora inicio']
+
+def _depurar(df):
+    """SOF consecutivos, Hora fin por asesor, sin los SOF y con 'Total estimado'."""
+    # Eliminar SOF - Sign Off consecutivos por cada asesor
+    df = eliminar_sof_consecutivos(df).reset_index(drop=True)
+
+    # Ajustar 'Hora fin' por cada asesor (copia independiente del DF)
+    df_final = ajustar_hora_fin(df.copy())
 
     # Filtrar los registros de 'SOF - Sign Off'
-    df_final = df_final[df_final['Funcion'] != 'SOF - Sign Off'].reset_index(drop=True)
+    df_final = df_final[df_final['Funcion'] != SIGN_OFF].reset_index(drop=True)
 
     # Aplicar una operación entre columnas solo a las filas que cumplen la condición
     df_final['Total estimado'] = df_final['Hora fin'] - df_final['Hora inicio']  # Ejemplo de suma entre dos columnas
     df_final['Total estimado'] = df_final['Total estimado'].astype(str).str.split().str[-1]
+    return df_final
+
+
+def _en_orden(df):
+    """True si la 'Hora inicio' de cada asesor no retrocede en el orden del archivo (y no hay vacías)."""
+    if df['Hora inicio'].isna().any():
+        return False
+    return not (df.groupby('Codigo del Agente', sort=False)['Hora inicio'].diff() < pd.Timedelta(0)).any()
+
+
+def _inicio_cola(df):
+    """Hora inicio de la cola abierta de cada asesor: sus últimos FILAS_COLA registros sin SOF consecutivos."""
+    cola = eliminar_sof_consecutivos(df).groupby('Codigo del Agente', sort=False).tail(FILAS_COLA)
+    return cola.groupby('Codigo del Agente', sort=False)['Hora inicio'].min()
+
+
+class EstadoAgenteStore:
+    """
+    Estado del último corte cargado (día del corte, fecha de los datos e inicio de la cola
+    abierta de cada asesor), persistido en un pickle. El estado de un corte queda pendiente
+    hasta que el feed termina bien (`commit`); si la carga falla, el siguiente corte parte
+    del último estado confirmado.
+    """
+
+    def __init__(self, path=EA_STATE_PATH):
+        self.path = Path(path)
+        self.pending = None
+
+    def load(self):
+        try:
+            return pd.read_pickle(self.path)
+        except Exception:
+            return None
+
+    def delta(self, df, contexto):
+        """
+        Registros nuevos del corte ya depurados (None si no hay estado del mismo día): de cada
+        asesor conocido solo los que empiezan desde su cola abierta; de los nuevos, todos.
+        La cola se ubica por 'Hora inicio': si el archivo trae algún asesor fuera de orden
+        (o estados sin hora de inicio) o claves repetidas el corte se procesa completo.
+        """
+        estado = self.load()
+        self.pending = None
+        if estado is None or estado['dia'] != contexto.fecha.normalize():
+            return None
+        if not _en_orden(df):
+            print("[EA] Estados fuera de orden en el archivo: corte completo")
+            return None
+
+        inicio_cola = df['Codigo del Agente'].map(estado['cola'])
+        nuevas = df[inicio_cola.isna() | df['Hora inicio'].isna() | (df['Hora inicio'] >= inicio_cola)]
+
+        df_final = _depurar(nuevas)
+        df_final = df_final[df_final['fecha_inicio'] == estado['fecha']]
+        if df_final.duplicated(subset=CLAVES_EA).any():
+            # El MERGE no admite claves repetidas; el corte completo las carga todas
+            print("[EA] Estados con clave repetida en el archivo: corte completo")
+            return None
+        cola = pd.concat([estado['cola'], _inicio_cola(nuevas)])
+        self.pending = {**estado, 'cola': cola[~cola.index.duplicated(keep='last')], 'corte': contexto.fecha}
+        print(f"[EA] Corte incremental: {len(nuevas)} de {len(df)} registros desde el corte {estado['corte']}")
+
+        df_to_sql = df_final[COLUMNAS_SQL]
+        df_to_sql.attrs['upsert_keys'] = CLAVES_EA
+        return df_to_sql
+
+    def stage(self, df, contexto, fecha):
+        """Deja pendiente el estado de un corte completo."""
+        self.pending = {'dia': contexto.fecha.normalize(), 'fecha': fecha,
+                        'cola': _inicio_cola(df), 'corte': contexto.fecha}
+
+    def commit(self):
+        """Persiste el estado pendiente (llamar solo cuando la carga y el SP terminaron bien)."""
+        if self.pending is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        pd.to_pickle(self.pending, self.path)
+        self.pending = None
+
+
+def procesar_estado_agente(df, contexto):
+    """
+    Depura los estados del día (SOF consecutivos, Hora fin por asesor) y deja las columnas que van a SQL.
+    Con EA_INCREMENTAL, desde el segundo corte del día solo devuelve el delta (se carga con MERGE).
+    """
+    df = _preparar(df, contexto.fecha)
+    if EA_INCREMENTAL:
+        df_delta = estado_agente_store.delta(df, contexto)
+        if df_delta is not None:
+            return df_delta
+
+    df_final = _depurar(df)
 
     # Paso 1: Contar la frecuencia de cada fecha en 'fecha_inicio'
     fecha_frecuencia = df_final['fecha_inicio'].value_counts(normalize=True)
@@ -150,77 +187,35 @@ def cargar_datos_estadoagente():
     if porcentaje_mas_frecuente >= 0.9:
         # Paso 3: Si cumple con el 90%, filtrar los registros con esa fecha
         df_final = df_final[df_final['fecha_inicio'] == fecha_mas_frecuente]
+        if EA_INCREMENTAL:
+            estado_agente_store.stage(df, contexto, fecha_mas_frecuente)
     else:
         # Paso 4: Si no cumple, eliminar todos los registros
         df_final = pd.DataFrame()  # O eliminar las filas que no cumplen
         print("No hay una fecha válida con al menos el 90% de coincidencia. Se eliminaron los registros.")
 
-    # Columnas necesarias para enviar a SQL
-    columnas = ['Codigo del Agente','Agente', 'Funcion', 'Gestion',	'Hora inicio',	'Hora fin',	'Total estimado']
-    df_to_sql = df_final[columnas]
+    df_to_sql = df_final[COLUMNAS_SQL]
+
+    df_to_sql.to_csv('data_rev.csv', index=False)
 
-    # Obtener la fecha actual como un objeto datetime
-    fecha_actual = datetime.now()
+    return df_to_sql
 
-    fechacompleta = str(fecha_hora)
 
-    df_to_sql.to_csv('data_rev.csv', index=False)
+# Estado entre cortes (modo incremental)
+estado_agente_store = EstadoAgenteStore()
+
+
+FEED = 'estado_agente'
+OPCIONES_FEED = {
+    'functions': {'procesar_estado_agente': procesar_estado_agente},
+    # El estado del corte se persiste solo si la carga y el SP terminaron bien (también vía cortes.py)
+    'on_success': lambda resultado: estado_agente_store.commit(),
+}
+
+
+def cargar_datos_estadoagente():
+    return run_feed(FEED, **OPCIONES_FEED)
+
 
-    engine = conectar_bdCargaExcel()
-        # Ejecutar la eliminación en la base de datos
-    with engine.connect() as connection:
-        connection.execute(text(f"DELETE FROM TblEstadoAgenteExcel"))
-        connection.execute(text("COMMIT"))
-
-    #print(f"Registros eliminados en la tabla TblEstadoAgentePre con 'Hora inicio' igual a {Fechacompleta.split('= ')[1]}.")
-
-    # Cargar los datos combinados a la base de datos
-    with engine.connect() as connection:
-        df_to_sql.to_sql('TblEstadoAgenteExcel', con=connection, if_exists='append', index=False)
-        connection.execute(text("COMMIT"))
-        
-    VAR = 'EA'
-    # Mover archivos de la carpeta de seguimiento
-    # mover_archivos_ea(ruta_origen, ruta_destino, VAR)
-        
-    # print(f"Datos cargados en la tabla TblEstadoAgentePre fecha: {fecha_mas_frecuente}.")
-    #######################################################################################
-    conexion = conectar_bdStores()
-    try:
-        
-        cursor = conexion.cursor()
-        parametros = (fechacompleta, mes,año,)   # Tupla de tres valores
-
-        # Llamar al procedimiento almacenado
-        cursor.callproc('Sp_EstadoagenteSalesys', parametros)
-
-        # Obtener el resultado
-        result = cursor.fetchone()
-        conexion.commit() 
-        print(f"Resultado obtenido: {result}")  # Depuración, muestra el resultado antes de procesar
-
-        if result:  # Si hay resultados
-            return result['Total']  # Accede a la clave 'Total' del diccionario
-        else:
-            return "No Data"  # Si no hay resultados
-
-    except pymssql.DatabaseError as e:
-        # Manejo de errores específicos de la base de datos
-        print(f"Error en la base de datos: {e}")
-        return f"Error en la base de datos: {e}"
-
-    except Exception as e:
-        # Captura de la traza completa del error
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"Error ocurrió: {error_details}")  # Imprime el error completo
-        return f"Error en la obtención de datos: {error_details}"
-
-    finally:
-        # Asegurarse de cerrar tanto el cursor como la conexión
-        if cursor:
-            cursor.close()
-        if conexion:
-            conexion.close()             
-            
-cargar_datos_estadoagente()
+if __name__ == "__main__":
+    cargar_datos_estadoagente()
@@ -11,6 +11,7 @@ from selenium.common.exceptions import TimeoutException, NoAlertPresentException
 from config.form_routes import FORM_ROUTES
 from config.settings import SALESYS_USERNAME, SALESYS_PASSWORD, MESES_ES, MAX_LOGIN_ATTEMPTS, LOGIN_URL
 from core.utils import limpiar_temp, esperar_archivo, renombrar_archivo
+from core.report_reader import write_sidecar
 from core.login import salesys_login
 
 TEMP_FOLDER = r"Z:\AMG Esuarezh\scraping\temp"
@@ -184,6 +185,9 @@ def descargar_estado_agente(
                                     dest.parent.mkdir(parents=True, exist_ok=True)
                                     os.replace(new_path, dest)
                                     log(f"[ESTADO AGENTE] Archivo movido a: {dest}")
+                                    # Copia Parquet tipada para las relecturas (loaders, análisis)
+                                    if form_config.get("reporte"):
+                                        write_sidecar(form_config["reporte"], str(dest), log_fn=log)
                                 res['status'] = "descargado"
                                 res['mensaje'] = f"Movido a {tpl_list}"
                             else:
@@ -1,3 +1,4 @@
+import os
 import sys
 sys.path.append('Z:\AMG Esuarezh\SysAnalistas')
 from functools import partial  # Importamos partial
@@ -24,10 +25,109 @@ from ejecutable_nomina.Campañas.SoporteVentaFibraFija import *
 from funciones.Nomina import *
 from funciones.Nomina.ConsultasBD import *
 ########################################################################################################################
+from core.connections import connection_manager
+from core.database import process_db
+from core import feeds
+from core.reference_cache import nomina_cache
+########################################################################################################################
 import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# true: las campañas se cargan una vez al día y las ejecuciones horarias siguientes solo revisan la caché.
+# Desactivado por defecto: no se detectan cambios en los orígenes de CargaNomina* durante el día
+NOMINA_CARGA_DIARIA = os.getenv('NOMINA_LOAD_ONCE_PER_DAY', 'false').lower() == 'true'
+# Campañas que se mantienen en la caché de referencia (core/reference_cache.py) y su base
+NOMINA_CACHE_CAMPANAS = [c.strip() for c in os.getenv('NOMINA_CACHE_CAMPAIGNS', 'ACTIVACIONES').split(',') if c.strip()]
+NOMINA_CACHE_TARGET = os.getenv('NOMINA_CACHE_TARGET', 'amg')
+# Campañas cargadas a la vez y intentos por campaña. Por defecto una a la vez y sin reintentos:
+# las funciones CargaNomina* (ejecutable_nomina/funciones) son externas y no está verificado que
+# no compartan conexiones de funciones.conexion ni que un reintento sea idempotente
+NOMINA_MAX_WORKERS = int(os.getenv('NOMINA_MAX_WORKERS', 1))
+NOMINA_MAX_RETRIES = int(os.getenv('NOMINA_MAX_RETRIES', 1))
+# Segundos de espera entre intentos
+NOMINA_RETRY_DELAY = int(os.getenv('NOMINA_RETRY_DELAY', 30))
+MODULO = 'nomina'
+
+# Campañas de nómina (tareas independientes, en el orden original)
+CAMPANAS = {
+    'Validaciones': CargaNominaValidaciones,
+    'Activaciones': CargaNominaActivaciones,
+    'DeliveryBioMensajeriaSoporte': CargaNominaDeliveryBioMensajeriaSoporte,
+    'DeliverySeguimiento': CargaNominaDeliverySeguimiento,
+    'FotosAlambrico': CargaNominaFotosAlambrico,
+    'FotosCorporativo': CargaNominaFotosCorporativo,
+    'MesaDeAyuda': CargaNominaMesaDeAyuda,
+    'MesaDeSoporte': CargaNominaMesaDeSoporte,
+    'PlantaExternaMultiskill': CargaNominaPlantaExternaMultiskill,
+    'SeguimientoFija': CargaNominaSeguimientoFija,
+    'ProgramacionFija': CargaNominaProgramacionFija,
+    'Aghaso': CargaNominaAghaso,
+    'SoporteVentaFibraFija': CargaNominaSoporteVentaFibraFija,
+}
+
+
+def refrescar_cache_nomina(fecha):
+    """Revisa la huella de la nómina del día en el origen y relee solo las campañas que cambiaron."""
+    try:
+        with connection_manager.connection(NOMINA_CACHE_TARGET) as connection:
+            for campana in NOMINA_CACHE_CAMPANAS:
+                nomina_cache.get(connection, fecha, fecha, campana)
+    except Exception as e:
+        print(f"[WARNING] No se pudo refrescar la caché de nómina: {e}")
+
+
+def inicio_ejecucion():
+    """
+    Fecha/hora de la ejecución programada (shared_timestamp.txt): main.py la escribe una vez
+    por ejecución y sus reintentos del módulo la comparten. None si no existe (ejecución manual).
+    """
+    try:
+        return datetime.datetime.fromisoformat(feeds.SHARED_TIMESTAMP_FILE.read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def campanas_cargadas(fecha_value):
+    """
+    Campañas con carga exitosa que un reintento no debe repetir: las del día con
+    NOMINA_LOAD_ONCE_PER_DAY; si no, las cargadas desde el inicio de la ejecución programada.
+    """
+    exitosas = [r for r in process_db.get_campaign_results(MODULO, fecha_value) if r['status'] == 'success']
+    if NOMINA_CARGA_DIARIA:
+        return {r['campaign'] for r in exitosas}
+    inicio = inicio_ejecucion()
+    if inicio is None:
+        return set()
+    return {r['campaign'] for r in exitosas
+            if datetime.datetime.fromisoformat(str(r['started_at'])) >= inicio}
+
+
+def cargar_campana(nombre, funcion, fecha_value, fecha_año_value, mes_value):
+    """Carga una campaña con reintentos y registra su resultado en ProcessDatabase; devuelve (nombre, ok)."""
+    inicio = datetime.datetime.now()
+    t0 = time.perf_counter()
+    error = None
+    for intento in range(1, NOMINA_MAX_RETRIES + 1):
+        try:
+            funcion(fecha_value, fecha_año_value, mes_value)
+            duracion = time.perf_counter() - t0
+            process_db.record_campaign(MODULO, nombre, fecha_value, inicio, 'success', intento, duracion)
+            print(f"[SUCCESS] Nómina {nombre}: {duracion:.1f}s (intento {intento})")
+            return nombre, True
+        except Exception as e:
+            error = str(e)
+            print(f"[ERROR] Nómina {nombre} (intento {intento}/{NOMINA_MAX_RETRIES}): {error}")
+            if intento < NOMINA_MAX_RETRIES:
+                time.sleep(NOMINA_RETRY_DELAY)
+
+    process_db.record_campaign(MODULO, nombre, fecha_value, inicio, 'failed', NOMINA_MAX_RETRIES,
+                               time.perf_counter() - t0, error)
+    return nombre, False
 
 
 def cargar_Nomina_actual():
+    """Carga las campañas del día (en paralelo con NOMINA_MAX_WORKERS > 1); devuelve False si alguna quedó sin cargar."""
     try:
         # Obtener fecha actual
         hoy = datetime.date.today()
@@ -44,26 +144,50 @@ def cargar_Nomina_actual():
         }
         fecha_mes_value = meses_es[mes_value]
 
-        print(f"[LAUNCH] Iniciando carga de nómina para: {fecha_value} ({fecha_mes_value})")
-
-        # Lógica de carga
-        CargaNominaValidaciones(fecha_value, fecha_año_value, mes_value)
-        CargaNominaActivaciones(fecha_value, fecha_año_value, mes_value)
-        CargaNominaDeliveryBioMensajeriaSoporte(fecha_value, fecha_año_value, mes_value)
-        CargaNominaDeliverySeguimiento(fecha_value, fecha_año_value, mes_value)
-        CargaNominaFotosAlambrico(fecha_value, fecha_año_value, mes_value)
-        CargaNominaFotosCorporativo(fecha_value, fecha_año_value, mes_value)
-        CargaNominaMesaDeAyuda(fecha_value, fecha_año_value, mes_value)
-        CargaNominaMesaDeSoporte(fecha_value, fecha_año_value, mes_value)
-        CargaNominaPlantaExternaMultiskill(fecha_value, fecha_año_value, mes_value)
-        CargaNominaSeguimientoFija(fecha_value, fecha_año_value, mes_value)
-        CargaNominaProgramacionFija(fecha_value, fecha_año_value, mes_value)
-        CargaNominaAghaso(fecha_value, fecha_año_value, mes_value)
-        CargaNominaSoporteVentaFibraFija(fecha_value, fecha_año_value, mes_value)
+        if NOMINA_CARGA_DIARIA and process_db.get_watermark('nomina_cargada') == fecha_value:
+            print(f"[SKIP] Nómina ya cargada hoy ({fecha_value}), solo se verifica la caché de referencia")
+            refrescar_cache_nomina(hoy)
+            return True
+
+        # Reintento del módulo (main.py): solo las campañas que aún no cargaron en esta ejecución programada
+        # (o en el día, con NOMINA_LOAD_ONCE_PER_DAY); una CargaNomina* exitosa no se vuelve a ejecutar
+        cargadas = campanas_cargadas(fecha_value)
+        if cargadas:
+            print(f"[SKIP] Campañas ya cargadas: {', '.join(sorted(cargadas))}")
+        pendientes = {nombre: funcion for nombre, funcion in CAMPANAS.items() if nombre not in cargadas}
+
+        max_workers = max(1, min(NOMINA_MAX_WORKERS, len(pendientes)))
+        print(f"[LAUNCH] Iniciando carga de nómina para: {fecha_value} ({fecha_mes_value}), "
+              f"{len(pendientes)} campañas, {max_workers} en paralelo")
+
+        # Lógica de carga: cada campaña es independiente, una con error no detiene a las demás
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='nomina') as pool:
+            futuros = [
+                pool.submit(cargar_campana, nombre, funcion, fecha_value, fecha_año_value, mes_value)
+                for nombre, funcion in pendientes.items()
+            ]
+            resultados = [futuro.result() for futuro in futuros]
+
+        fallidas = [nombre for nombre, ok in resultados if not ok]
+        print(f"[NOMINA] {len(resultados) - len(fallidas)}/{len(resultados)} campañas en {time.perf_counter() - inicio:.1f}s")
+        if fallidas:
+            print(f"[ERROR] Campañas sin cargar: {', '.join(fallidas)}")
+            return False
 
         print(f"[SUCCESS] Carga de nómina finalizada para: {fecha_value}")
+        process_db.set_watermark('nomina_cargada', fecha_value)
+
+        # La nómina del día se recargó: la caché se vuelve a leer del origen
+        nomina_cache.invalidate(hoy)
+        refrescar_cache_nomina(hoy)
+        return True
 
     except Exception as e:
         print(f"[ERROR] Error al ejecutar la carga de nómina: {str(e)}")
+        return False
+
 
-cargar_Nomina_actual()
\ No newline at end of file
+if __name__ == "__main__":
+    # Código de salida distinto de cero para que main.py reintente (solo las campañas pendientes)
+    sys.exit(0 if cargar_Nomina_actual() else 1)
@@ -1,37 +1,473 @@
+import os
 import pandas as pd
 import sys
 import sqlalchemy
-from sqlalchemy import create_engine,text,Table, MetaData
+from sqlalchemy import create_engine,text,Table, MetaData, bindparam, inspect
 import locale
-import pyodbc
 from datetime import datetime, timedelta
 from unidecode import unidecode
 import warnings
+from core.bulk_loader import delete_scope, load_dataframe, upsert_dataframe
+from core.connections import connection_manager
+from core.database import process_db
+from core.franjas import get_franja_calendar, split_intervals
+from core.queries import read_query
+from core.reference_cache import get_nomina
 warnings.filterwarnings('ignore')
 
+# merge: MERGE incremental por (fecha, codigo_salesys, franja); replace: DELETE de la fecha + INSERT
+MODO_ESCRITURA = os.getenv('OCUPACION_WRITE_MODE', 'merge').lower()
+CLAVES_OCUPACION = ['fecha', 'codigo_salesys', 'franja']
+COLUMNAS_OCUPACION = ['fecha', 'codigo_salesys', 'nombre', 'condicion', 'cargo', 'campana', 'franja',
+                      'segundos_disponible', 'segundos_gestionados', 'rango_15min']
+# pandas: lee las tablas y cruza en Python; sql: calcula en el servidor con INSERT ... SELECT
+MOTOR_OCUPACION = os.getenv('OCUPACION_ENGINE', 'pandas').lower()
+# Calendario de franjas en el servidor (lo mantiene el motor sql a partir del CSV)
+TABLA_FRANJAS = os.getenv('FRANJAS_TABLE', 'Tbl_Franjas_Horarias')
+# Días por lote en reprocesos de varias fechas (una lectura por fuente y una escritura por lote)
+DIAS_POR_LOTE = int(os.getenv('OCUPACION_BATCH_DAYS', 31))
+# Ejecuciones horarias del día: recalcular solo las franjas desde el corte anterior (marca de agua)
+INCREMENTAL = os.getenv('OCUPACION_INCREMENTAL', 'false').lower() == 'true'
+# Minutos que se retrocede desde la marca para cubrir registros que llegan con retraso
+MARGEN_INCREMENTAL = int(os.getenv('OCUPACION_INCREMENTAL_MARGIN_MINUTES', 15))
+RUTA_FRANJAS = os.getenv('FRANJAS_HORARIAS_PATH', 'Z:\\AMG Esuarezh\\scraping\\scrapers\\salesys\\franjas_horarias.csv')
+
+def _cruzar_franjas(df, col_inicio, col_fin, df_franjas, same_day=False):
+    """Un registro por (intervalo, franja) con intersección: fecha del inicio, codigo_salesys, franja y segundos."""
+    franjas_ordenadas = df_franjas.sort_values('fecha_hora_inicio', ignore_index=True)
+    intervalo, franja, segundos = split_intervals(
+        df[col_inicio], df[col_fin],
+        franjas_ordenadas['fecha_hora_inicio'], franjas_ordenadas['fecha_hora_fin'],
+        same_day=same_day
+    )
+    return pd.DataFrame({
+        'fecha': pd.to_datetime(df[col_inicio].iloc[intervalo].to_numpy()).normalize(),
+        'codigo_salesys': df['codigo_salesys'].array.take(intervalo),
+        'franja': franjas_ordenadas['etiqueta_franja'].array.take(franja),
+        'tiempo_segundos': segundos,
+    })
+
+def generar_tiempos_por_franja(df_agentes, df_franjas):
+    """
+    Segundos de cada intervalo de estado (hora_inicio, hora_fin) que caen en cada franja
+    del mismo día, sumados por (fecha, codigo_salesys, franja).
+    """
+    cruces = _cruzar_franjas(df_agentes, 'hora_inicio', 'hora_fin', df_franjas, same_day=True)
+    resultado = cruces.groupby(['fecha', 'codigo_salesys', 'franja']).agg({'tiempo_segundos': 'sum'}).reset_index()
+    resultado['tiempo_segundos'] = resultado['tiempo_segundos'].astype('Int64')
+    return resultado
+
+def mapear_segundos_por_franja(df_gestiones, df_franjas):
+    """
+    Divide cada gestión (hora_inicio_call_center, hora_fin_call_center) en las franjas
+    que abarca y suma segundos_gestionados por (fecha, codigo_salesys, franja).
+    Los segundos de cada tramo se truncan a entero antes de sumar, como antes.
+    """
+    cruces = _cruzar_franjas(df_gestiones, 'hora_inicio_call_center', 'hora_fin_call_center', df_franjas)
+    cruces['tiempo_segundos'] = cruces['tiempo_segundos'].astype('int64')
+    resultado = cruces.groupby(['fecha', 'codigo_salesys', 'franja']).agg({'tiempo_segundos': 'sum'}).reset_index()
+    resultado = resultado.rename(columns={'tiempo_segundos': 'segundos_gestionados'})
+    resultado['codigo_salesys'] = resultado['codigo_salesys'].astype('Int64')
+    return resultado
+
+def _cortes(fechas_completas):
+    """Día -> corte para las gestiones sin hora fin (fecha/hora de la ejecución + 60 segundos)."""
+    return {
+        pd.Timestamp(fechacompleta).normalize(): pd.Timestamp(fechacompleta) + timedelta(seconds=60)
+        for fechacompleta in fechas_completas
+    }
+
+def _rango(cortes):
+    """Rango semiabierto [primer día, día siguiente al último) que cubre las fechas."""
+    dias = sorted(cortes)
+    return dias[0], dias[-1] + timedelta(days=1)
+
+def calcular_ocupacion(fechas_completas, franjas, target='amg', log_fn=None, marca=None):
+    """
+    Motor pandas: lee activaciones, estado agente y nómina de todas las fechas con una
+    consulta por fuente (rango de fechas) y arma en una pasada las filas de
+    Tbl_Ocupacion_Activaciones (segundos disponibles y gestionados por agente, fecha y franja).
+    `franjas` debe cubrir desde el primer día hasta el día siguiente al último.
+
+    Con `marca` (modo incremental) solo se leen gestiones y estados abiertos o que terminan
+    después de ella; `franjas` debe empezar en la franja que contiene la marca, así cada
+    franja calculada recibe todos los intervalos que la tocan.
+    """
+    cortes = _cortes(fechas_completas)
+    dias = sorted(cortes)
+    desde, ultimo_dia = dias[0], dias[-1]
+
+    # Leer datos desde la base de datos a un DataFrame (las tres lecturas en una sola conexión,
+    # consultas con rango de fechas sargable de core/queries.py)
+    consulta_gestiones, consulta_estados, params_marca = 'activaciones_gestiones', 'estado_agente_intervalos', None
+    if marca is not None:
+        consulta_gestiones, consulta_estados = 'activaciones_gestiones_desde_marca', 'estado_agente_desde_marca'
+        params_marca = {'marca': pd.Timestamp(marca).to_pydatetime()}
+    with connection_manager.connection(target) as connection:
+        df = read_query(consulta_gestiones, connection, desde, ultimo_dia, params=params_marca, log_fn=log_fn)
+        df_2 = read_query(consulta_estados, connection, desde, ultimo_dia, params=params_marca, log_fn=log_fn)
+        # Nómina: diaria, servida por la caché de referencia (se relee solo si cambió en el origen)
+        df_3 = get_nomina(connection, desde, ultimo_dia, campana='ACTIVACIONES', log_fn=log_fn)
+
+    # Solo los días pedidos (el rango puede incluir días intermedios no solicitados)
+    df['hora_inicio_call_center'] = pd.to_datetime(df['hora_inicio_call_center'])
+    df['hora_fin_call_center'] = pd.to_datetime(df['hora_fin_call_center'])
+    dia_gestion = df['hora_inicio_call_center'].dt.normalize()
+    df = df[dia_gestion.isin(dias)]
+    df_2['hora_inicio'] = pd.to_datetime(df_2['hora_inicio'])
+    df_2['hora_fin'] = pd.to_datetime(df_2['hora_fin'])
+    df_2['fecha'] = df_2['hora_inicio'].dt.normalize()
+    df_2 = df_2[df_2['fecha'].isin(dias)]
+    df_3['codigo_salesys'] = df_3['codigo_salesys'].astype('Int64')
+    df_3['fecha'] = pd.to_datetime(df_3['fecha']).dt.normalize()
+    df_3 = df_3[df_3['fecha'].isin(dias)]
+
+    ###############
+    # Gestiones sin hora fin: se cierran en el corte de su fecha
+    df_filt_con_inicio_call = df[(df['hora_inicio_call_center'].notna())].copy()
+    df_filt_con_inicio_call['hora_fin_call_center'] = df_filt_con_inicio_call['hora_fin_call_center'].fillna(
+        dia_gestion[df_filt_con_inicio_call.index].map(cortes)
+    )
+    ###############
+
+    ###############
+    df_activaciones = df_filt_con_inicio_call.copy()
+    df_estado_agente = df_2.copy()
+    df_nomina = df_3.copy()
+
+    # Filtrar del estado-agente los "SIGN ON" y RES RESUME"
+    df_estado_agente_sig_on = df_estado_agente[df_estado_agente['funcion'] == 'SON - Sign On'].copy()
+    df_estado_agente_res_resume = df_estado_agente[df_estado_agente['funcion'] == 'RES - RESUME'].copy()
+
+    # Crear la columna total_sec calculando la diferencia en segundos
+    df_estado_agente_res_resume['total_sec'] = (df_estado_agente_res_resume['hora_fin'] - df_estado_agente_res_resume['hora_inicio']).dt.total_seconds().astype('Int64')
+    df_estado_agente_sig_on['total_sec'] = (df_estado_agente_sig_on['hora_fin'] - df_estado_agente_sig_on['hora_inicio']).dt.total_seconds().astype('Int64')
+
+    # Filtrar solo los estado agente 'RES RESUME' que tengan más o igual a 30 segundos
+    filtro_res_resume = df_estado_agente_res_resume[(df_estado_agente_res_resume['total_sec'] >= 30)]
+    filtro_sig_on = df_estado_agente_sig_on[(df_estado_agente_sig_on['total_sec'] >= 30)]
+
+    df_estado_agente_res_resume_filtro = filtro_res_resume.drop('total_sec', axis=1)
+    df_estado_agente_sig_on_filtro = filtro_sig_on.drop('total_sec', axis=1)
+
+    # Hacemos un merge de df1 con df2 basado en las columnas 'asesor' y 'fecha'
+    filtro_res_resume_por_nomina = df_estado_agente_res_resume_filtro.merge(df_nomina, on=['codigo_salesys', 'fecha'])
+    filtro_sig_on_por_nomina = df_estado_agente_sig_on_filtro.merge(df_nomina, on=['codigo_salesys', 'fecha'])
+
+    # Tiempo disponible (SIGN ON + RES RESUME) por agente, fecha y franja
+    df_consolidado_final = generar_tiempos_por_franja(
+        pd.concat([filtro_sig_on_por_nomina, filtro_res_resume_por_nomina], ignore_index=True), franjas
+    )
+
+    df_activaciones['codigo_salesys'] = df_activaciones['codigo_salesys'].astype('Int64')
+
+    # Realizar el merge y seleccionar solo las columnas deseadas del DataFrame secundario
+    es_agente_nomina = pd.merge(
+        df_consolidado_final,
+        df_nomina[['fecha', 'codigo_salesys', 'nombre', 'condicion', 'cargo', 'campana']],  # Seleccionar columnas deseadas
+        on=['fecha', 'codigo_salesys'],
+        how='left')
+
+    # Ordenar columnas de la tabla generada del merge
+    columnas_agen_nom = ['fecha', 'codigo_salesys', 'nombre', 'condicion', 'cargo', 'campana', 'franja', 'tiempo_segundos']
+    es_agente_nomina_select = es_agente_nomina[columnas_agen_nom]
+    es_agente_nomina_select['codigo_salesys'] = es_agente_nomina_select['codigo_salesys'].astype('Int64')
+
+    # Ordenar columnas de la tabla validaciones
+    columnas_validaciones = ['asesor', 'codigo_salesys', 'hora_inicio_call_center', 'hora_fin_call_center']
+    df_activaciones_select2 = df_activaciones[columnas_validaciones]
+
+    # Segundos gestionados por agente y franja (cada gestión repartida en las franjas que abarca)
+    df_agrupado_2 = mapear_segundos_por_franja(df_activaciones_select2, franjas)
+
+    # Realizar el merge y seleccionar solo las columnas deseadas del DataFrame secundario
+    df_agrupado_final = pd.merge(
+        df_agrupado_2,
+        df_nomina[['fecha', 'codigo_salesys', 'nombre']],  # Seleccionar columnas deseadas
+        on=['fecha', 'codigo_salesys'],
+        how='left')
+
+    # Renombrar columna, para diferenciar a que tiempo se refiere
+    es_agente_nomina_select = es_agente_nomina_select.rename(columns={'tiempo_segundos': 'segundos_disponible'})
+
+    # Realizar el merge y seleccionar solo las columnas deseadas del DataFrame secundario
+    ocupacion_final = pd.merge(
+        es_agente_nomina_select,
+        df_agrupado_final[['fecha', 'codigo_salesys', 'franja', 'segundos_gestionados']],  # Seleccionar columnas deseadas
+        on=['fecha', 'codigo_salesys', 'franja'],
+        how='left')
+
+    # Hora de inicio de cada franja (columnas ya derivadas en el calendario)
+    franjas_dia = franjas.rename(columns={'etiqueta_franja': 'franja'})
+
+    # Realizar el merge y seleccionar solo las columnas deseadas del DataFrame secundario
+    df_agrupado_final_franjas = pd.merge(
+        ocupacion_final,
+        franjas_dia[['fecha', 'franja', 'hora_inicio']],  # Seleccionar columnas deseadas
+        on=['fecha','franja'],
+        how='left')
+
+    return df_agrupado_final_franjas.rename(columns={'hora_inicio': 'rango_15min'})
+
+# Motor sql: mismas reglas que calcular_ocupacion, resueltas en el servidor. Intersección
+# intervalo/franja = MIN(fines) - MAX(inicios); los tramos de cada gestión se truncan a segundos
+# antes de sumar. Los LEFT JOIN a nómina replican las filas del motor pandas si la vista repite agente.
+# {cortes}: una fila (fecha, corte) por día pedido; el rango :desde/:hasta permite index seeks.
+SQL_OCUPACION = """
+WITH cortes AS (
+    SELECT fecha, corte FROM (VALUES {cortes}) c(fecha, corte)
+),
+nomina AS (
+    SELECT CAST(v.[fecha] AS DATE) fecha, v.[Codigo SaleSys] codigo_salesys, v.[Nombre Completo] nombre,
+           v.[condicion], v.[cargo], v.[CAMPAÑA] campana
+    FROM View_TblNomina v
+    JOIN cortes c ON c.fecha = CAST(v.[fecha] AS DATE)
+    WHERE v.[fecha] >= :desde AND v.[fecha] < :hasta AND v.[CAMPAÑA] = 'ACTIVACIONES'
+),
+franjas AS (
+    SELECT fecha_hora_inicio, fecha_hora_fin, etiqueta_franja franja,
+           CAST(fecha_hora_inicio AS DATE) fecha, CAST(fecha_hora_inicio AS TIME(0)) hora_inicio
+    FROM {tabla_franjas}
+    WHERE fecha_hora_inicio >= :desde AND fecha_hora_inicio < :hasta_franjas
+),
+estados AS (
+    SELECT CAST(e.hora_inicio AS DATE) fecha, e.codigo_del_agente codigo_salesys, e.hora_inicio, e.hora_fin
+    FROM TblEstadoAgenteSaleSysBD e
+    JOIN cortes c ON c.fecha = CAST(e.hora_inicio AS DATE)
+    WHERE e.hora_inicio >= :desde AND e.hora_inicio < :hasta
+      AND e.[FUNCION] IN ('SON - Sign On', 'RES - RESUME')
+      AND DATEDIFF_BIG(MILLISECOND, e.hora_inicio, e.hora_fin) >= 30000
+),
+disponible AS (
+    SELECT s.fecha, s.codigo_salesys, f.franja,
+           SUM(DATEDIFF_BIG(MILLISECOND,
+                            IIF(s.hora_inicio > f.fecha_hora_inicio, s.hora_inicio, f.fecha_hora_inicio),
+                            IIF(s.hora_fin < f.fecha_hora_fin, s.hora_fin, f.fecha_hora_fin))) / 1000 segundos_disponible
+    FROM estados s
+    JOIN nomina n ON n.fecha = s.fecha AND n.codigo_salesys = s.codigo_salesys
+    JOIN franjas f ON f.fecha = s.fecha AND f.fecha_hora_inicio < s.hora_fin AND f.fecha_hora_fin > s.hora_inicio
+    GROUP BY s.fecha, s.codigo_salesys, f.franja
+),
+gestiones AS (
+    SELECT c.fecha, TRY_CAST(a.nombre_usuario AS BIGINT) codigo_salesys,
+           a.hora_inicio_call_center hora_inicio, ISNULL(a.hora_fin_call_center, c.corte) hora_fin
+    FROM TblActivacionesBD a
+    JOIN cortes c ON c.fecha = CAST(a.hora_inicio_call_center AS DATE)
+    WHERE a.hora_inicio_call_center >= :desde AND a.hora_inicio_call_center < :hasta
+),
+gestionados AS (
+    SELECT g.fecha, g.codigo_salesys, f.franja,
+           SUM(DATEDIFF_BIG(MILLISECOND,
+                            IIF(g.hora_inicio > f.fecha_hora_inicio, g.hora_inicio, f.fecha_hora_inicio),
+                            IIF(g.hora_fin < f.fecha_hora_fin, g.hora_fin, f.fecha_hora_fin)) / 1000) segundos_gestionados
+    FROM gestiones g
+    JOIN franjas f ON f.fecha_hora_inicio < g.hora_fin AND f.fecha_hora_fin > g.hora_inicio
+    WHERE g.codigo_salesys IS NOT NULL
+    GROUP BY g.fecha, g.codigo_salesys, f.franja
+),
+gestionados_nomina AS (
+    SELECT g.* FROM gestionados g
+    LEFT JOIN nomina n ON n.fecha = g.fecha AND n.codigo_salesys = g.codigo_salesys
+)
+SELECT d.fecha, d.codigo_salesys, n.nombre, n.condicion, n.cargo, n.campana, d.franja,
+       d.segundos_disponible, g.segundos_gestionados, f.hora_inicio rango_15min
+FROM disponible d
+LEFT JOIN nomina n ON n.fecha = d.fecha AND n.codigo_salesys = d.codigo_salesys
+LEFT JOIN gestionados_nomina g ON g.fecha = d.fecha AND g.codigo_salesys = d.codigo_salesys AND g.franja = d.franja
+LEFT JOIN franjas f ON f.fecha = d.fecha AND f.franja = d.franja
+"""
+
+
+def _consulta_sql(fechas_completas):
+    """Texto y parámetros del motor sql para las fechas (rango + una fila de corte por día)."""
+    cortes = _cortes(fechas_completas)
+    desde, hasta = _rango(cortes)
+    params = {
+        'desde': desde.to_pydatetime(),
+        'hasta': hasta.to_pydatetime(),
+        'hasta_franjas': (hasta + timedelta(days=1)).to_pydatetime(),
+    }
+    valores = []
+    for i, (dia, corte) in enumerate(sorted(cortes.items())):
+        params[f"f{i}"], params[f"c{i}"] = dia.date(), corte.to_pydatetime()
+        valores.append(f"(CAST(:f{i} AS DATE), CAST(:c{i} AS DATETIME2))")
+    return SQL_OCUPACION.format(cortes=', '.join(valores), tabla_franjas=TABLA_FRANJAS), params
+
+
+def sincronizar_franjas(connection, calendario, fechas_completas):
+    """Deja en TABLA_FRANJAS las franjas de las fechas y del día siguiente según el calendario (CSV)."""
+    desde, hasta = _rango(_cortes(fechas_completas))
+    hasta = hasta + timedelta(days=1)
+    franjas = calendario.between(desde, hasta)
+    columnas = ['fecha_hora_inicio', 'fecha_hora_fin', 'etiqueta_franja']
+    if inspect(connection).has_table(TABLA_FRANJAS):
+        connection.execute(
+            text(f"DELETE FROM {TABLA_FRANJAS} WHERE fecha_hora_inicio >= :desde AND fecha_hora_inicio < :hasta"),
+            {'desde': desde.to_pydatetime(), 'hasta': hasta.to_pydatetime()}
+        )
+    load_dataframe(franjas[columnas], TABLA_FRANJAS, connection, log_fn=lambda msg: None)
+
+
+def calcular_ocupacion_sql(fechas_completas, connection):
+    """Motor sql en modo lectura: devuelve las filas que insertaría cargar_ocupacion_sql (para paridad)."""
+    consulta, params = _consulta_sql(fechas_completas)
+    return pd.read_sql(text(consulta), connection, params=params)
+
+
+def _borrar_fechas(connection, fechas_completas):
+    """DELETE de las fechas pedidas en Tbl_Ocupacion_Activaciones."""
+    dias = [dia.date() for dia in sorted(_cortes(fechas_completas))]
+    connection.execute(
+        text("DELETE FROM Tbl_Ocupacion_Activaciones WHERE fecha IN :dias").bindparams(bindparam('dias', expanding=True)),
+        {'dias': dias}
+    )
+    return dias
+
+
+def cargar_ocupacion_sql(fechas_completas, connection):
+    """Reemplaza las fechas en Tbl_Ocupacion_Activaciones con un DELETE y un único INSERT ... SELECT."""
+    _borrar_fechas(connection, fechas_completas)
+    consulta, params = _consulta_sql(fechas_completas)
+    columnas = ', '.join(COLUMNAS_OCUPACION)
+    resultado = connection.execute(text(f"INSERT INTO Tbl_Ocupacion_Activaciones ({columnas}) {consulta}"), params)
+    return resultado.rowcount
+
+
+def _comparable(df):
+    """Orden y tipos comunes para comparar la salida de ambos motores."""
+    df = df[COLUMNAS_OCUPACION].copy()
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    for col in ['codigo_salesys', 'segundos_disponible', 'segundos_gestionados']:
+        df[col] = pd.to_numeric(df[col]).astype('Int64')
+    for col in ['nombre', 'condicion', 'cargo', 'campana', 'franja', 'rango_15min']:
+        df[col] = df[col].astype('string')
+    return df.sort_values(['fecha', 'codigo_salesys', 'franja', 'segundos_gestionados'], ignore_index=True)
+
+
+def _fecha_completa(fecha_input):
+    """'YYYY-MM-DD' o datetime -> datetime (la hora, si viene, es el corte de la ejecución)."""
+    if isinstance(fecha_input, str):
+        return pd.Timestamp(fecha_input).to_pydatetime()
+    return fecha_input
+
+
+def comparar_motores(fechas, target='amg', log_fn=None):
+    """
+    Calcula cada fecha con ambos motores (sin escribir Tbl_Ocupacion_Activaciones) y
+    devuelve {fecha: None si coinciden o el detalle de la diferencia}.
+    """
+    log = log_fn or print
+    calendario = get_franja_calendar(RUTA_FRANJAS)
+    calendario.load(log_fn=log)
+    diferencias = {}
+    for fecha_input in fechas:
+        fechacompleta = _fecha_completa(fecha_input)
+        fecha = fechacompleta.date()
+        df_pandas = calcular_ocupacion([fechacompleta], calendario.for_date(fecha, days=2), target, log_fn=log)
+        with connection_manager.transaction(target) as connection:
+            sincronizar_franjas(connection, calendario, [fechacompleta])
+            df_sql = calcular_ocupacion_sql([fechacompleta], connection)
+        try:
+            pd.testing.assert_frame_equal(_comparable(df_sql), _comparable(df_pandas), check_exact=True)
+            diferencias[fecha] = None
+            log(f"[PARIDAD] {fecha}: OK ({len(df_pandas)} filas)")
+        except AssertionError as e:
+            diferencias[fecha] = str(e)
+            log(f"[PARIDAD] {fecha}: diferencias pandas={len(df_pandas)} sql={len(df_sql)} filas\n{e}")
+    return diferencias
+
+
+def _lotes(fechas_completas, dias_por_lote):
+    """Agrupa las fechas (ordenadas) en lotes que abarcan como máximo `dias_por_lote` días."""
+    lotes = []
+    for fechacompleta in sorted(fechas_completas):
+        if lotes and (fechacompleta.date() - lotes[-1][0].date()).days < dias_por_lote:
+            lotes[-1].append(fechacompleta)
+        else:
+            lotes.append([fechacompleta])
+    return lotes
+
+
+def _escribir_merge(df_to_sql, connection, scope, log):
+    """
+    Escritura del modo merge. Si la nómina repite un asesor en la fecha hay filas con la misma
+    clave (fecha, codigo_salesys, franja): como en el modo replace y en el motor sql se cargan
+    todas, reemplazando el ámbito completo en lugar del MERGE.
+    """
+    repetidas = df_to_sql.duplicated(subset=CLAVES_OCUPACION, keep=False)
+    if repetidas.any():
+        log(f"[WARNING] {int(repetidas.sum())} filas con clave repetida (asesor duplicado en la nómina): "
+            f"se reemplaza el ámbito completo en lugar del MERGE")
+        eliminadas = delete_scope(connection, 'Tbl_Ocupacion_Activaciones', scope)
+        log(f"Registros eliminados de la base de datos: {eliminadas}.")
+        load_dataframe(df_to_sql, 'Tbl_Ocupacion_Activaciones', connection, log_fn=log)
+        return
+    upsert_dataframe(df_to_sql, 'Tbl_Ocupacion_Activaciones', CLAVES_OCUPACION, connection, scope=scope, log_fn=log)
+
+
+def _clave_marca(target):
+    return f"ocupacion_activaciones:{target}"
+
+
+def _inicio_incremental(calendario, fechacompleta, marca_previa, margen_minutos):
+    """
+    Inicio de la primera franja a recalcular: la que contiene el corte anterior menos el
+    margen. None si no aplica (sin marca, marca de otro día o no anterior al corte actual).
+    """
+    if marca_previa is None:
+        return None
+    marca_previa = pd.Timestamp(marca_previa)
+    corte = pd.Timestamp(fechacompleta)
+    if marca_previa.normalize() != corte.normalize() or marca_previa >= corte:
+        return None
+    desde = max(marca_previa - timedelta(minutes=margen_minutos), corte.normalize())
+    inicios = calendario.for_date(corte)['fecha_hora_inicio']
+    anteriores = inicios[inicios <= desde]
+    return anteriores.iloc[-1] if len(anteriores) else None
+
+
+def _registrar_marca(target, fechacompleta):
+    """Avanza la marca de agua al corte escrito (nunca la retrocede con reprocesos de días anteriores)."""
+    clave = _clave_marca(target)
+    actual = process_db.get_watermark(clave)
+    if actual is None or pd.Timestamp(fechacompleta) > pd.Timestamp(actual):
+        process_db.set_watermark(clave, pd.Timestamp(fechacompleta).isoformat())
+
+
 def procesar_ocupacion_activaciones(
     fechas, 
-    log_fn=None
+    log_fn=None,
+    target='amg',
+    motor=None,
+    dias_por_lote=None,
+    incremental=None
 ):
+    """
+    Calcula y escribe Tbl_Ocupacion_Activaciones para `fechas`. Las fechas se procesan
+    por lotes de hasta `dias_por_lote` días (OCUPACION_BATCH_DAYS): una lectura por fuente,
+    un cálculo y una escritura por lote; con 1 se procesa fecha por fecha.
+
+    Con `incremental` (OCUPACION_INCREMENTAL, motor pandas) una fecha del mismo día que
+    la marca de agua solo recalcula y sincroniza las franjas desde el corte anterior.
+    """
     def log(msg):
         if log_fn:
             log_fn(msg)
         else:
             print(msg)
 
-    def conectar_bd(servidor, nombre_base_datos, usuario, contraseña):
-        connection_string = f'mssql+pyodbc://{usuario}:{contraseña}@{servidor}/{nombre_base_datos}?driver=ODBC+Driver+17+for+SQL+Server'
-        engine = create_engine(connection_string)
-        log('Conexión exitosa')
-        return engine
+    # Grilla de franjas tipada, leída una vez (caché binaria en logs/cache)
+    calendario = get_franja_calendar(RUTA_FRANJAS)
+    calendario.load(log_fn=log)
 
-    franjas = pd.read_csv('Z:\\AMG Esuarezh\\scraping\\scrapers\\salesys\\franjas_horarias.csv', sep=',')
+    # Engine compartido con pool; credenciales en DB_AMG_* (.env) o DB_BACKEND=local
+    engine = connection_manager.get_engine(target)
+    log('Conexión exitosa')
 
-    servidor = '192.168.16.103'
-    nombre_base_datos = 'BD_AMG'
-    usuario = 'sqladmin'
-    contraseña = 'Rf1pGIw7C42m'
-    engine = conectar_bd(servidor, nombre_base_datos, usuario, contraseña)
+    motor = (motor or MOTOR_OCUPACION).lower()
+    if motor == 'sql' and engine.dialect.name != 'mssql':
+        log(f"[WARNING] Motor sql requiere SQL Server ({engine.dialect.name}), usando motor pandas")
+        motor = 'pandas'
 
     # Establecer configuración regional en español
     try:
@@ -40,246 +476,79 @@ def procesar_ocupacion_activaciones(
         log("[WARNING] No se pudo establecer locale es_ES.UTF-8, usando default")
         locale.setlocale(locale.LC_TIME, 'C')
 
-    for fecha_input in fechas:
-        # Procesar cada fecha
-        if isinstance(fecha_input, str):
-            fechacompleta = datetime.strptime(fecha_input, "%Y-%m-%d")
-        else:
-            fechacompleta = fecha_input
-            
-        fecha = fechacompleta.date()
-        log(f"\\n[PROCESANDO] Fecha: {fecha}")
-        
+    incremental = INCREMENTAL if incremental is None else incremental
+    if incremental and motor != 'pandas':
+        log("[WARNING] El modo incremental solo aplica al motor pandas, se recalcula el día completo")
+        incremental = False
+
+    lotes = _lotes([_fecha_completa(f) for f in fechas], max(1, dias_por_lote or DIAS_POR_LOTE))
+    for lote in lotes:
+        desde, hasta = lote[0].date(), lote[-1].date()
+        etiqueta = f"{desde}" if desde == hasta else f"{desde} a {hasta} ({len(lote)} fechas)"
+        log(f"\n[PROCESANDO] Fecha: {etiqueta}")
+
         try:
-            mesNombre = fechacompleta.strftime('%B').capitalize()
-            dia = fechacompleta.strftime('%d')
-            mes = fechacompleta.strftime('%m')
-            año = fechacompleta.year
-
-            # Leer datos desde la base de datos a un DataFrame
-            with engine.connect() as connection:
-                df = pd.read_sql(f"""SELECT nombre_usuario codigo_salesys, asesor, hora_inicio_call_center,
-                                        hora_fin_call_center FROM TblActivacionesBD 
-                                            WHERE CONVERT(DATE, hora_inicio_call_center ) = '{fecha}'
-                                            AND NOT hora_inicio_call_center IS NULL""", con=connection)
-
-            with engine.connect() as connection:
-                df_2 = pd.read_sql(f"SELECT CONVERT(DATE, hora_inicio) fecha, codigo_del_agente codigo_salesys, [FUNCION] funcion, [hora_inicio], [hora_fin] FROM TblEstadoAgenteSaleSysBD WHERE CONVERT(DATE,[hora_inicio]) = '{fecha}'", con=connection)
-            df_2['fecha'] = pd.to_datetime(df_2['fecha'])
-
-            with engine.connect() as connection:
-                df_3 = pd.read_sql(f"SELECT [fecha], [Codigo SaleSys] codigo_salesys, [Nombre Completo] nombre, [condicion], [cargo], [CAMPAÑA] campana FROM View_TblNomina WHERE CONVERT(DATE, [fecha]) = '{fecha}' AND campaña = 'ACTIVACIONES'", con=connection)
-            df_3['codigo_salesys'] = df_3['codigo_salesys'].astype('Int64')
-            df_3['fecha'] = pd.to_datetime(df_3['fecha'])
-
-            ###############
-            fecha_hora = pd.to_datetime(fechacompleta)
-            fechacompleta_adj = fecha_hora + timedelta(seconds=60)
-            df_filt_con_inicio_call = df[(df['hora_inicio_call_center'].notna())]
-            df_filt_con_inicio_call['hora_fin_call_center'] = df_filt_con_inicio_call['hora_fin_call_center'].fillna(fechacompleta_adj)
-            ###############
-
-            ###############
-            df_activaciones = df_filt_con_inicio_call.copy()
-            df_estado_agente = df_2.copy()
-            df_nomina = df_3.copy()
-
-            # Normalización de los nombres de columnas
-            def normalize_column_name(col):
-                col = unidecode(col)  
-                col = col.strip().lower().replace(' ', '_')  
-                return col
-
-            franjas['Fecha_Hora_Inicio'] = pd.to_datetime(franjas['Fecha_Hora_Inicio'], format='%d-%m-%Y %H:%M:%S')
-            franjas['Fecha_Hora_Fin'] = pd.to_datetime(franjas['Fecha_Hora_Fin'], format='%d-%m-%Y %H:%M:%S')
-            franjas.columns = [normalize_column_name(col) for col in franjas.columns]
-
-            # Filtrar del estado-agente los "SIGN ON" y RES RESUME"
-            df_estado_agente_sig_on = df_estado_agente[df_estado_agente['funcion'] == 'SON - Sign On'].copy()
-            df_estado_agente_res_resume = df_estado_agente[df_estado_agente['funcion'] == 'RES - RESUME'].copy()
-
-            # Crear la columna total_sec calculando la diferencia en segundos
-            df_estado_agente_res_resume['total_sec'] = (df_estado_agente_res_resume['hora_fin'] - df_estado_agente_res_resume['hora_inicio']).dt.total_seconds().astype('Int64')
-            df_estado_agente_sig_on['total_sec'] = (df_estado_agente_sig_on['hora_fin'] - df_estado_agente_sig_on['hora_inicio']).dt.total_seconds().astype('Int64')
-
-            # Filtrar solo los estado agente 'RES RESUME' que tengan más o igual a 30 segundos
-            filtro_res_resume = df_estado_agente_res_resume[(df_estado_agente_res_resume['total_sec'] >= 30)]
-            filtro_sig_on = df_estado_agente_sig_on[(df_estado_agente_sig_on['total_sec'] >= 30)]
-
-            df_estado_agente_res_resume_filtro = filtro_res_resume.drop('total_sec', axis=1)
-            df_estado_agente_sig_on_filtro = filtro_sig_on.drop('total_sec', axis=1)
-
-            # Hacemos un merge de df1 con df2 basado en las columnas 'asesor' y 'fecha'
-            filtro_res_resume_por_nomina = df_estado_agente_res_resume_filtro.merge(df_nomina, on=['codigo_salesys', 'fecha'])
-            filtro_sig_on_por_nomina = df_estado_agente_sig_on_filtro.merge(df_nomina, on=['codigo_salesys', 'fecha'])
-
-            def generar_tiempos_por_franja(df_agentes, df_franjas):
-                resultados = []
-                
-                for _, agente_row in df_agentes.iterrows():
-                    agente_inicio = agente_row['hora_inicio']
-                    agente_fin = agente_row['hora_fin']
-                    agente_fecha = agente_inicio.date()  # Extraer solo la fecha
-                    codigo_salesys = agente_row['codigo_salesys']
-                    agente_funcion = agente_row['funcion']
-
-                    # Filtrar franjas por la fecha del agente
-                    franjas_fecha = df_franjas[(df_franjas['fecha_hora_inicio'].dt.date == agente_fecha)]
-                    
-                    for _, franja_row in franjas_fecha.iterrows():
-                        franja_inicio = franja_row['fecha_hora_inicio']
-                        franja_fin = franja_row['fecha_hora_fin']
-                        etiqueta_franja = franja_row['etiqueta_franja']
-                        
-                        # Encontrar la intersección entre el intervalo del agente y la franja
-                        interseccion_inicio = max(agente_inicio, franja_inicio)
-                        interseccion_fin = min(agente_fin, franja_fin)
-                        
-                        if interseccion_inicio < interseccion_fin:
-                            # Calcular la duración en segundos
-                            duracion_segundos = (interseccion_fin - interseccion_inicio).total_seconds()
-                            
-                            resultados.append({
-                                'codigo_salesys': codigo_salesys,
-                                'funcion': agente_funcion,
-                                'fecha': agente_fecha,
-                                'franja': etiqueta_franja,
-                                'tiempo_segundos': duracion_segundos
-                           })
-
-                return pd.DataFrame(resultados)
-
-            # Generar tiempos por franjas para cada registro 'SIG ON' y 'RES RESUME'
-            df_resultado_sig_on = generar_tiempos_por_franja(filtro_sig_on_por_nomina, franjas)
-            df_resultado_res_resume = generar_tiempos_por_franja(filtro_res_resume_por_nomina, franjas)
-
-            # Concatenar ambos DFs que tienen solo el estado agente 'SIG ON' y 'RES RESUME'
-            df_consolidado = pd.concat([df_resultado_sig_on, df_resultado_res_resume])
-            df_consolidado['fecha'] = pd.to_datetime(df_consolidado['fecha'])
-
-            df_activaciones['codigo_salesys'] = df_activaciones['codigo_salesys'].astype('Int64')
-
-            # Agrupamos por 'codigo_salesys', 'funcion', 'fecha', y 'franja', y sumamos el tiempo en segundos
-            df_consolidado_agrupado = df_consolidado.groupby(['codigo_salesys', 'funcion', 'fecha', 'franja']).agg({'tiempo_segundos': 'sum'}).reset_index()
-
-            # Cambiar los registros de la columna función por 'DISPONIBLE'
-            df_consolidado_agrupado['funcion'] = 'DISPONIBLE'  # Puedes usar cualquier etiqueta común
-
-            # Agrupar por agente, fecha, franja y sumar los tiempos
-            df_consolidado_final = df_consolidado_agrupado.groupby(['fecha', 'codigo_salesys', 'franja']).agg({'tiempo_segundos': 'sum'}).reset_index()
-            df_consolidado_final['tiempo_segundos'] = df_consolidado_final['tiempo_segundos'].astype('Int64')
-
-            # Realizar el merge y seleccionar solo las columnas deseadas del DataFrame secundario
-            es_agente_nomina = pd.merge(
-                df_consolidado_final,
-                df_nomina[['fecha', 'codigo_salesys', 'nombre', 'condicion', 'cargo', 'campana']],  # Seleccionar columnas deseadas
-                on=['fecha', 'codigo_salesys'],
-                how='left')
-
-            # Ordenar columnas de la tabla generada del merge
-            columnas_agen_nom = ['fecha', 'codigo_salesys', 'nombre', 'condicion', 'cargo', 'campana', 'franja', 'tiempo_segundos']
-            es_agente_nomina_select = es_agente_nomina[columnas_agen_nom]
-            es_agente_nomina_select['codigo_salesys'] = es_agente_nomina_select['codigo_salesys'].astype('Int64')
-
-            # Ordenar columnas de la tabla validaciones
-            columnas_validaciones = ['asesor', 'codigo_salesys', 'hora_inicio_call_center', 'hora_fin_call_center']
-            df_activaciones_select2 = df_activaciones[columnas_validaciones]
-
-            # Función para dividir gestiones por franjas y calcular tiempo en cada una
-            def mapear_segundos_por_franja(df_gestiones, df_franjas):
-                registros = []
-
-                for index, row in df_gestiones.iterrows():
-                    hora_inicio = row['hora_inicio_call_center']
-                    hora_fin = row['hora_fin_call_center']
-
-                    # Filtrar franjas que intersectan con la gestión
-                    franjas_intersectadas = df_franjas[(df_franjas['fecha_hora_inicio'] < hora_fin) & (df_franjas['fecha_hora_fin'] > hora_inicio)]
-
-                    for _, franja in franjas_intersectadas.iterrows():
-                        inicio_franja = max(hora_inicio, franja['fecha_hora_inicio'])
-                        fin_franja = min(hora_fin, franja['fecha_hora_fin'])
-                        tiempo_segundos = (fin_franja - inicio_franja).total_seconds()
-
-                        registros.append({
-                            'codigo_salesys': row['codigo_salesys'],
-                            'fecha': hora_inicio.date(),
-                            'franja': franja['etiqueta_franja'],
-                            'tiempo_segundos': tiempo_segundos
-                        })
-
-                return pd.DataFrame(registros)
-
-            # Asignar tiempos por cada franja que le corresponde según la hora
-            df_resultado = mapear_segundos_por_franja(df_activaciones_select2, franjas)
-
-            # Confirmar el tipo de dato de la columna fecha a 'datetime'
-            df_resultado['fecha'] = pd.to_datetime(df_resultado['fecha'])
-
-            # Convertir la columna 'tiempo_segundos' a entero
-            df_resultado['tiempo_segundos'] = df_resultado['tiempo_segundos'].astype('int64')
-
-            # Agrupar por franja y sumar los tiempos
-            df_agrupado = df_resultado.groupby(['fecha', 'codigo_salesys', 'franja']).agg({'tiempo_segundos': 'sum'}).reset_index()
-
-            df_agrupado_2 = df_agrupado.rename(columns={'tiempo_segundos': 'segundos_gestionados'})
-            df_agrupado_2['codigo_salesys'] = df_agrupado_2['codigo_salesys'].astype('Int64')
-
-            # Realizar el merge y seleccionar solo las columnas deseadas del DataFrame secundario
-            df_agrupado_final = pd.merge(
-                df_agrupado_2,
-                df_nomina[['fecha', 'codigo_salesys', 'nombre']],  # Seleccionar columnas deseadas
-                on=['fecha', 'codigo_salesys'],
-                how='left')
-
-            # Renombrar columna, para diferenciar a que tiempo se refiere
-            es_agente_nomina_select = es_agente_nomina_select.rename(columns={'tiempo_segundos': 'segundos_disponible'})
-
-            # Realizar el merge y seleccionar solo las columnas deseadas del DataFrame secundario
-            ocupacion_final = pd.merge(
-                es_agente_nomina_select,
-                df_agrupado_final[['fecha', 'codigo_salesys', 'franja', 'segundos_gestionados']],  # Seleccionar columnas deseadas
-                on=['fecha', 'codigo_salesys', 'franja'],
-                how='left')
-
-            franjas['fecha_hora_inicio'] = pd.to_datetime(franjas['fecha_hora_inicio'], format='%d-%m-%Y %H:%M:%S')
-            franjas['fecha'] = franjas['fecha_hora_inicio'].dt.date
-            franjas['hora_inicio'] = franjas['fecha_hora_inicio'].dt.time
-            franjas['fecha'] = pd.to_datetime(franjas['fecha'])
-            franjas = franjas.rename(columns={'etiqueta_franja': 'franja'})
-
-            # Realizar el merge y seleccionar solo las columnas deseadas del DataFrame secundario
-            df_agrupado_final_franjas = pd.merge(
-                ocupacion_final,
-                franjas[['fecha', 'franja', 'hora_inicio']],  # Seleccionar columnas deseadas
-                on=['fecha','franja'],
-                how='left')
-
-            df_to_sql = df_agrupado_final_franjas.rename(columns={'hora_inicio': 'rango_15min'})
-
-            # Eliminar registros existentes de la misma fecha en la base de datos
-            with engine.connect() as connection:
-                delete_query = text(f"DELETE FROM Tbl_Ocupacion_Activaciones WHERE fecha = '{fecha}'")
-                connection.execute(delete_query)
-                connection.execute(text("COMMIT"))
-                log(f"Registros eliminados de la base de datos fecha: {fecha}.")
-                
-            #Cargar los datos combinados a la base de datos
-            with engine.connect() as connection:
-                df_to_sql.to_sql('Tbl_Ocupacion_Activaciones', con=connection, if_exists='append',index=False)
-                connection.execute(text("COMMIT"))
+            if motor == 'sql':
+                # Todo en el servidor: calendario de las fechas + DELETE + INSERT ... SELECT
+                with connection_manager.transaction(target) as connection:
+                    sincronizar_franjas(connection, calendario, lote)
+                    filas = cargar_ocupacion_sql(lote, connection)
+                log(f"Datos cargados exitosamente en la base de datos ({filas} registros, motor sql).")
+                continue
+
+            inicio_parcial = None
+            if incremental and len(lote) == 1:
+                inicio_parcial = _inicio_incremental(calendario, lote[0], process_db.get_watermark(_clave_marca(target)),
+                                                     MARGEN_INCREMENTAL)
+
+            if inicio_parcial is not None:
+                # Solo las franjas del día desde la marca: las anteriores ya quedaron cerradas en cortes previos
+                franjas = calendario.between(inicio_parcial, pd.Timestamp(desde) + timedelta(days=1))
+                log(f"[INCREMENTAL] Recalculando {len(franjas)} franjas desde {inicio_parcial:%H:%M}")
+                df_to_sql = calcular_ocupacion(lote, franjas, target, log_fn=log, marca=inicio_parcial)
+                with connection_manager.transaction(target) as connection:
+                    _escribir_merge(
+                        df_to_sql, connection,
+                        {'fecha': [desde], 'franja': franjas['etiqueta_franja'].unique().tolist()}, log
+                    )
+                _registrar_marca(target, lote[-1])
+                log(f"Datos cargados exitosamente en la base de datos ({len(df_to_sql)} registros, incremental).")
+                continue
+
+            # Franjas desde la primera fecha hasta el día siguiente a la última (gestiones que cruzan medianoche)
+            franjas = calendario.between(pd.Timestamp(desde), pd.Timestamp(hasta) + timedelta(days=2))
+            df_to_sql = calcular_ocupacion(lote, franjas, target, log_fn=log)
+
+            if MODO_ESCRITURA == 'merge':
+                # Solo se escriben las franjas que cambiaron desde el último corte
+                with connection_manager.transaction(target) as connection:
+                    _escribir_merge(df_to_sql, connection, {'fecha': [f.date() for f in lote]}, log)
+            else:
+                # Eliminar registros de las fechas y cargar los nuevos en una sola transacción
+                with connection_manager.transaction(target) as connection:
+                    dias = _borrar_fechas(connection, lote)
+                    log(f"Registros eliminados de la base de datos fecha(s): {', '.join(str(d) for d in dias)}.")
+
+                    #Cargar los datos combinados a la base de datos
+                    load_dataframe(df_to_sql, 'Tbl_Ocupacion_Activaciones', connection, log_fn=log)
+            if incremental:
+                _registrar_marca(target, lote[-1])
             log(f"Datos cargados exitosamente en la base de datos ({len(df_to_sql)} registros).")
             
         except Exception as e:
-            log(f"[ERROR] Error procesando fecha {fecha}: {e}")
+            log(f"[ERROR] Error procesando fecha {etiqueta}: {e}")
             continue
 
+def fechas_programadas(ruta="shared_timestamp.txt"):
+    """
+    Fecha de la ejecución programada con su hora (fecha/hora compartida del corte): la hora
+    cierra las gestiones sin fin y queda como marca de agua del modo incremental.
+    """
+    with open(ruta, "r") as f:
+        fecha_hora = f.read().strip()
+    return [pd.to_datetime(fecha_hora).to_pydatetime()]
+
+
 if __name__ == "__main__":
     # Leer fecha/hora compartida desde archivo
-    with open("shared_timestamp.txt", "r") as f:
-        fecha_hora = f.read().strip()
-    
-    fechacompleta = pd.to_datetime(fecha_hora)
-    fechas = [fechacompleta.strftime("%Y-%m-%d")]
-    
-    procesar_ocupacion_activaciones(fechas)
\ No newline at end of file
+    procesar_ocupacion_activaciones(fechas_programadas())
\ No newline at end of file
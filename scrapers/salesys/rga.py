@@ -11,6 +11,7 @@ from selenium.common.exceptions import TimeoutException, NoAlertPresentException
 from config.form_routes import FORM_ROUTES
 from config.settings import SALESYS_USERNAME, SALESYS_PASSWORD, MESES_ES, MAX_LOGIN_ATTEMPTS, LOGIN_URL, PRODUCTOS_DEFAULT
 from core.utils import limpiar_temp, esperar_archivo, renombrar_archivo
+from core.report_reader import write_sidecar
 from core.login import salesys_login
 
 TEMP_FOLDER = r"Z:\AMG Esuarezh\scraping\emp"
@@ -197,6 +198,10 @@ def descargar_informes_rga(
                                         dest.parent.mkdir(parents=True, exist_ok=True)
                                         os.replace(new_path, dest)
                                         log(f"[{producto}] Archivo movido a: {dest}")
+                                        # Copia Parquet tipada para las relecturas (loaders, análisis)
+                                        reporte = form_config.get("reportes", {}).get(producto)
+                                        if reporte:
+                                            write_sidecar(reporte, str(dest), log_fn=log)
                                     res['status'] = "descargado"
                                     res['mensaje'] = f"Movido a {tpl_list}"
                                 else:
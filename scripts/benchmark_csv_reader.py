@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark de lectura de reportes CSV: motor pandas contra arrow (multihilo, memory-map)
+con tipos numpy o pyarrow, verificando que el resultado sea el mismo
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Añadir el directorio padre al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+os.environ.setdefault('SALESYS_USERNAME', 'benchmark')
+os.environ.setdefault('SALESYS_PASSWORD', 'benchmark')
+
+from benchmark_loaders import generar_activaciones, generar_delivery, generar_estado_agente
+from core import csv_reader
+from core.report_reader import read_report
+
+
+def con_columnas_no_declaradas(generador):
+    """
+    Agrega al CSV columnas que el esquema no declara (se cargan tal cual con extra_columns: keep):
+    texto con forma de fecha y de hora (arrow las inferiría como tales, pandas las deja como
+    texto), enteros con vacíos, booleanos y una columna vacía.
+    """
+    def generar(ruta: Path, n_filas: int, seed: int):
+        generador(ruta, n_filas, seed)
+        rng = np.random.default_rng(seed)
+        segundos = rng.integers(0, 86_400, n_filas)
+        registro = pd.Timestamp('2025-10-15') + pd.to_timedelta(segundos, unit='s')
+        enteros = pd.Series(rng.integers(0, 500, n_filas)).astype(str)
+        enteros[rng.random(n_filas) < 0.1] = ''
+        extras = pd.DataFrame({
+            'Fecha Registro': registro.strftime('%Y-%m-%d %H:%M:%S'),
+            'Hora Registro': registro.strftime('%H:%M:%S'),
+            'Intentos': enteros,
+            'Reprogramado': rng.choice(['True', 'False'], n_filas),
+            'Observacion': '',
+        })
+        lineas = ruta.read_bytes().decode('latin1').splitlines()
+        cola = [','.join(extras.columns)] + extras.astype(str).agg(','.join, axis=1).tolist()
+        texto = '\n'.join(f"{linea},{extra}" for linea, extra in zip(lineas, cola)) + '\n'
+        ruta.write_bytes(texto.encode('latin1'))
+    return generar
+
+
+GENERADORES = {
+    'activaciones': con_columnas_no_declaradas(generar_activaciones),
+    'delivery': con_columnas_no_declaradas(generar_delivery),
+    'estado_agente': con_columnas_no_declaradas(generar_estado_agente),
+}
+# (etiqueta, motor, dtype_backend)
+VARIANTES = [
+    ('pandas', 'pandas', 'numpy'),
+    ('arrow/numpy', 'arrow', 'numpy'),
+    ('arrow/pyarrow', 'arrow', 'pyarrow'),
+]
+
+
+def leer(report: str, ruta: Path, motor: str, backend: str, chunk_filas: int, repeticiones: int):
+    """Lee el reporte con el motor indicado y devuelve (DataFrame, mejor tiempo en segundos)."""
+    csv_reader.CSV_READER_ENGINE = motor
+    csv_reader.CSV_DTYPE_BACKEND = backend
+    mejor, df = None, None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        df = read_report(report, str(ruta), chunksize=chunk_filas or None, log_fn=lambda m: None)
+        segundos = time.perf_counter() - inicio
+        mejor = segundos if mejor is None else min(mejor, segundos)
+    return df, mejor
+
+
+def mismo_resultado(df: pd.DataFrame, base: pd.DataFrame) -> bool:
+    """Mismos valores y columnas (los tipos pyarrow se comparan contra su equivalente numpy)."""
+    try:
+        pd.testing.assert_frame_equal(df, base, check_dtype=False, check_categorical=False)
+        return True
+    except AssertionError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de lectura CSV: pandas vs arrow')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000], help='Filas por archivo')
+    parser.add_argument('--reports', nargs='+', default=list(GENERADORES), help='Reportes a medir')
+    parser.add_argument('--chunk-rows', type=int, default=0, help='Filas por bloque (0 = archivo completo)')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones por variante (se informa la mejor)')
+    parser.add_argument('--threads', type=int, default=0, help='Hilos del motor arrow (0 = todos los núcleos)')
+    args = parser.parse_args()
+
+    if csv_reader.pa is None:
+        print("pyarrow no está instalado: solo se puede medir el motor pandas")
+        return
+    csv_reader.CSV_READER_THREADS = args.threads
+
+    carpeta = Path(tempfile.mkdtemp(prefix='benchmark_csv_'))
+    try:
+        for n_filas in args.rows:
+            print(f"\n=== {n_filas:,} filas por archivo ===")
+            for seed, report in enumerate(args.reports):
+                ruta = carpeta / f"{report}_{n_filas}.csv"
+                GENERADORES[report](ruta, n_filas, seed)
+                tamano = ruta.stat().st_size / 1024 ** 2
+                base, t_base = None, None
+                for etiqueta, motor, backend in VARIANTES:
+                    df, segundos = leer(report, ruta, motor, backend, args.chunk_rows, args.repeat)
+                    if base is None:
+                        base, t_base = df, segundos
+                    paridad = 'OK' if mismo_resultado(df, base) else 'DISTINTO'
+                    print(f"{report:<14} {tamano:7.1f}MB {etiqueta:<14} {segundos:7.2f}s "
+                          f"(x{t_base / segundos:4.1f}) {df.memory_usage(deep=True).sum() / 1024 ** 2:8.1f}MB  {paridad}")
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
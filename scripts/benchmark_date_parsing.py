@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark y verificación de paridad: parse_datetime_column vs apply(parse_fecha)
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Añadir el directorio padre al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.append(r'Z:\AMG Esuarezh\SysAnalistas')
+
+from core.date_parsing import parse_datetime_column
+
+COLUMNAS_FECHA = ['hora_inicio_contrata', 'hora_inicio_call_center', 'hora_fin_call_center']
+
+
+def generar_columna(n_filas: int, seed: int) -> pd.Series:
+    """Genera timestamps con la forma de un reporte de Activaciones del día."""
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp.now().normalize() + pd.Timedelta(hours=8)
+    segundos = rng.integers(0, 11 * 3600, n_filas)
+    fechas = base + pd.to_timedelta(segundos, unit='s')
+    valores = pd.Series(fechas.strftime('%d/%m/%Y %H:%M:%S'), dtype=object)
+    # Celdas vacías (gestiones sin inicio/fin) y algunas con otro formato
+    valores[rng.random(n_filas) < 0.08] = np.nan
+    otro_formato = rng.random(n_filas) < 0.01
+    valores[otro_formato] = fechas[otro_formato].strftime('%Y-%m-%d %H:%M:%S')
+    return valores
+
+
+def comparar(n_filas: int, parse_fecha) -> bool:
+    """Mide ambas rutas sobre 5 productos x 3 columnas y verifica que coincidan."""
+    columnas = [generar_columna(n_filas, seed) for seed in range(5 * len(COLUMNAS_FECHA))]
+
+    inicio = time.perf_counter()
+    esperado = [pd.to_datetime(col.apply(parse_fecha), errors='coerce') for col in columnas]
+    t_apply = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    obtenido = [parse_datetime_column(col, fallback=parse_fecha) for col in columnas]
+    t_vector = time.perf_counter() - inicio
+
+    diferencias = sum(
+        int((~((a == b) | (a.isna() & b.isna()))).sum())
+        for a, b in zip(esperado, obtenido)
+    )
+    print(f"{n_filas:>9,} filas x {len(columnas)} columnas | apply: {t_apply:8.2f}s | "
+          f"vectorizado: {t_vector:6.2f}s | x{t_apply / max(t_vector, 1e-9):6.1f} | diferencias: {diferencias}")
+    return diferencias == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de parseo de fechas de Activaciones')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Filas por columna a generar')
+    args = parser.parse_args()
+
+    # La paridad solo vale contra el parse_fecha real: sin funciones.funcion no se compara contra una copia
+    try:
+        from funciones.funcion import parse_fecha
+    except ImportError as e:
+        print(f"❌ No se pudo importar funciones.funcion.parse_fecha ({e}): no se puede verificar la paridad")
+        sys.exit(2)
+
+    print("Referencia: funciones.funcion.parse_fecha")
+    paridad = all([comparar(n, parse_fecha) for n in args.rows])
+    print("✅ Paridad verificada" if paridad else "❌ Se encontraron diferencias")
+    sys.exit(0 if paridad else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los loaders contra el respaldo SQL local: lectura, transformación,
+carga y SP por fuente, con tiempo y pico de memoria por etapa
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Añadir el directorio padre al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Todo contra sqlite: sin SQL Server ni unidad Z:
+os.environ['DB_BACKEND'] = 'local'
+os.environ.setdefault('SALESYS_USERNAME', 'benchmark')
+os.environ.setdefault('SALESYS_PASSWORD', 'benchmark')
+
+from core.bulk_loader import replace_table
+from core.connections import get_engine
+from core.feeds import FeedRunner
+from core.local_backend import use_local_backend
+from core.procedures import call_procedure
+from core.report_reader import normalize_column_name, read_report
+from scrapers.salesys import activaciones_cortes, delivery_cortes, ea_corte
+
+MODULOS = {modulo.FEED: modulo for modulo in (activaciones_cortes, delivery_cortes, ea_corte)}
+FECHA_CORTE = pd.Timestamp('2025-10-15 15:50:00')
+FUNCIONES_EA = ['SON - Sign On', 'RES - RESUME', 'AUX - Break', 'AUX - Baño', 'SOF - Sign Off']
+
+
+def _horas(rng, n_filas: int, base: pd.Timestamp) -> pd.DatetimeIndex:
+    """Horas aleatorias dentro de una jornada de 9 horas desde `base`."""
+    return base + pd.to_timedelta(rng.integers(0, 9 * 3600, n_filas), unit='s')
+
+
+def generar_activaciones(ruta: Path, n_filas: int, seed: int, encoding: str = 'latin1'):
+    """CSV con la forma del reporte de Activaciones (fechas día-primero, latin1)."""
+    rng = np.random.default_rng(seed)
+    base = FECHA_CORTE.normalize() + pd.Timedelta(hours=8)
+    inicio = _horas(rng, n_filas, base)
+    fin = inicio + pd.to_timedelta(rng.integers(60, 1800, n_filas), unit='s')
+    fin_texto = pd.Series(fin.strftime('%d/%m/%Y %H:%M:%S'))
+    fin_texto[rng.random(n_filas) < 0.05] = ''
+    df = pd.DataFrame({
+        'Nombre Usuario': [f"A{c}" for c in rng.integers(1000, 1400, n_filas)],
+        'Asesor': [f"Asesor {c}" for c in rng.integers(0, 400, n_filas)],
+        'Producto': rng.choice(['HFC', 'FTTH', 'LTE', 'EMPRESA', 'OTROS'], n_filas),
+        'Estado': rng.choice(['Activado', 'Pendiente', 'Rechazado'], n_filas),
+        'Número SOT': rng.integers(10_000_000, 99_999_999, n_filas),
+        'Distrito': rng.choice(['Lima', 'Surco', 'Miraflores', 'Comas', 'Ate'], n_filas),
+        'Hora Inicio Contrata': (inicio - pd.Timedelta(minutes=30)).strftime('%d/%m/%Y %H:%M:%S'),
+        'Hora Inicio Call Center': inicio.strftime('%d/%m/%Y %H:%M:%S'),
+        'Hora Fin Call Center': fin_texto,
+    })
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(ruta, index=False, encoding=encoding)
+
+
+def generar_delivery(ruta: Path, n_filas: int, seed: int):
+    """CSV con la forma del reporte general de Delivery (misma estructura, en UTF-8)."""
+    generar_activaciones(ruta, n_filas, seed, encoding='utf-8')
+
+
+def generar_ivr(ruta: Path, n_filas: int, seed: int):
+    """Excel de IVR Base (fecha dd/mm/aaaa como texto)."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Fecha': FECHA_CORTE.strftime('%d/%m/%Y'),
+        'Teléfono': rng.integers(900_000_000, 999_999_999, n_filas),
+        'Agente': [f"Asesor {c}" for c in rng.integers(0, 400, n_filas)],
+        'Pregunta 1': rng.integers(1, 6, n_filas),
+        'Pregunta 2': rng.integers(1, 6, n_filas),
+    })
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    df.to_excel(ruta, index=False)
+
+
+def generar_estado_agente(ruta: Path, n_filas: int, seed: int):
+    """CSV de Estado Agente: estados consecutivos por agente dentro del día del corte."""
+    rng = np.random.default_rng(seed)
+    n_agentes = max(1, n_filas // 60)
+    agentes = np.sort(rng.integers(0, n_agentes, n_filas))
+    base = FECHA_CORTE.normalize() + pd.Timedelta(hours=8)
+    segundos = rng.integers(0, 9 * 3600, n_filas)
+    orden = np.lexsort((segundos, agentes))
+    agentes, segundos = agentes[orden], segundos[orden]
+    inicio = base + pd.to_timedelta(segundos, unit='s')
+    fin = pd.Series((inicio + pd.to_timedelta(rng.integers(30, 900, n_filas), unit='s')).strftime('%Y-%m-%d %H:%M:%S'))
+    fin[rng.random(n_filas) < 0.02] = ''
+    df = pd.DataFrame({
+        'Codigo del Agente': 1000 + agentes,
+        'Agente': [f"Asesor {c}" for c in agentes],
+        'Funcion': rng.choice(FUNCIONES_EA, n_filas, p=[0.15, 0.5, 0.15, 0.1, 0.1]),
+        'Gestion': rng.choice(['Venta', 'Consulta', ''], n_filas),
+        'Hora inicio': inicio.strftime('%Y-%m-%d %H:%M:%S'),
+        'Hora fin': fin,
+        'Total estimado': '',
+    })
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(ruta, index=False)
+
+
+GENERADORES = {
+    ('activaciones', None): generar_activaciones,
+    ('delivery', 'DELIVERY'): generar_delivery,
+    ('delivery', 'IVR_BASE'): generar_ivr,
+    ('estado_agente', 'EA'): generar_estado_agente,
+}
+
+
+def medir(fn, medir_memoria: bool):
+    """Ejecuta `fn` y devuelve (resultado, segundos, pico MB)."""
+    if medir_memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = fn()
+    segundos = time.perf_counter() - inicio
+    pico = 0.0
+    if medir_memoria:
+        pico = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+    return resultado, segundos, pico
+
+
+def ejecutar(runner: FeedRunner, feed: str, n_filas: int, max_filas_excel: int, chunk_filas: int,
+             medir_memoria: bool):
+    """Genera los archivos del feed y mide cada etapa por fuente."""
+    config = runner.get_config(feed)
+    opciones = MODULOS[feed].OPCIONES_FEED
+    funciones = opciones.get('functions', {})
+    contexto = runner.build_context(config, FECHA_CORTE)
+    engine = get_engine(config.get('target', 'carga_excel'))
+
+    for seed, (nombre, source) in enumerate(config['sources'].items()):
+        ruta = runner.source_path(source, contexto)
+        generador = GENERADORES.get((feed, nombre)) or GENERADORES[(feed, None)]
+        filas = min(n_filas, max_filas_excel) if source.get('reader') == 'excel' else n_filas
+        generador(ruta, filas, seed)
+
+        transform = runner._resolve(source, 'transform', funciones, nombre)
+        fallback = runner._resolve(source, 'datetime_fallback', funciones, nombre)
+        if source.get('reader') == 'excel':
+            lectura = lambda: pd.read_excel(ruta)
+        else:
+            lectura = lambda: read_report(source['report'], str(ruta), chunksize=chunk_filas,
+                                          datetime_fallback=fallback,
+                                          normalizer=opciones.get('normalizer', normalize_column_name), log_fn=lambda m: None)
+        df, t_lectura, m_lectura = medir(lectura, medir_memoria)
+        t_transf, m_transf = 0.0, 0.0
+        if transform is not None:
+            df, t_transf, m_transf = medir(lambda: transform(df, contexto), medir_memoria)
+        _, t_carga, m_carga = medir(lambda: replace_table(df, source['table'], engine, log_fn=lambda m: None),
+                                    medir_memoria)
+        print(f"{feed + '/' + nombre:<24} {len(df):>9,} | lectura {t_lectura:7.2f}s {m_lectura:7.1f}MB | "
+              f"transf. {t_transf:7.2f}s {m_transf:7.1f}MB | carga {t_carga:7.2f}s {m_carga:7.1f}MB")
+
+    procedure = config.get('procedure')
+    if procedure:
+        params = (str(contexto.fecha), contexto.mes, contexto.year)
+        resultado, t_sp, _ = medir(lambda: call_procedure(procedure['name'], params,
+                                                                procedure.get('target', 'stores')), False)
+        print(f"{feed + '/SP':<24} {'':>9} | {procedure['name']} {t_sp:.2f}s -> {resultado}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de loaders sobre el respaldo SQL local (sqlite)')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='Filas por archivo generado')
+    parser.add_argument('--feeds', nargs='+', default=list(MODULOS), help='Feeds a medir')
+    parser.add_argument('--max-excel-rows', type=int, default=100_000,
+                        help='Tope de filas del Excel de IVR (escribir xlsx grandes toma minutos)')
+    parser.add_argument('--chunk-rows', type=int, default=50_000, help='Filas por bloque en la lectura CSV')
+    parser.add_argument('--sin-memoria', action='store_true',
+                        help='No medir memoria (tracemalloc agrega sobrecosto a los tiempos)')
+    parser.add_argument('--dir', default=None, help='Carpeta de trabajo (por defecto una temporal que se borra)')
+    args = parser.parse_args()
+
+    carpeta = Path(args.dir) if args.dir else Path(tempfile.mkdtemp(prefix='benchmark_loaders_'))
+    try:
+        use_local_backend(str(carpeta / 'local.db'))
+        runner = FeedRunner(base_path=carpeta / 'DESCARGA INFORMES')
+        for n_filas in args.rows:
+            print(f"\n=== {n_filas:,} filas por archivo ===")
+            for feed in args.feeds:
+                ejecutar(runner, feed, n_filas, args.max_excel_rows, args.chunk_rows, not args.sin_memoria)
+    finally:
+        if not args.dir:
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
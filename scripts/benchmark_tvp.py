@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark por feed: tabla staging + SP vs. SP con table-valued parameters
+
+Escribe las tablas staging y ejecuta los SP en el destino indicado con --target (una base
+de pruebas con las mismas tablas, SP y tipos tabla), nunca en los destinos de los feeds:
+
+    DB_PRUEBAS_URL=mssql+pyodbc://... python scripts/benchmark_tvp.py --target pruebas --confirmar \
+        --feeds delivery --tvp-procedure Sp_CampañaDeliveryTVP \
+        --tvp-types DELIVERY=dbo.TT_DeliveryExcel IVR_BASE=dbo.TT_IvrCalidadExcel
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Añadir el directorio padre al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.append(r'Z:\AMG Esuarezh\SysAnalistas')
+
+from core.bulk_loader import replace_table
+from core.connections import get_engine
+from core.feeds import feed_runner
+from core.procedures import call_procedure
+from core.report_reader import normalize_column_name
+from core.tvp import execute_procedure_tvp
+from scrapers.salesys import activaciones_cortes, delivery_cortes, ea_corte
+
+MODULOS = {modulo.FEED: modulo for modulo in (ea_corte, delivery_cortes, activaciones_cortes)}
+
+
+def _tipos(valores) -> dict:
+    """FUENTE=dbo.TipoTabla -> {'FUENTE': 'dbo.TipoTabla'}"""
+    tipos = {}
+    for valor in valores or []:
+        fuente, separador, tipo = valor.partition('=')
+        if not separador:
+            raise SystemExit(f"--tvp-types espera FUENTE=dbo.TipoTabla (recibido: {valor})")
+        tipos[fuente] = tipo
+    return tipos
+
+
+def medir_feed(feed: str, fecha, repeticiones: int, target: str, tvp_override: dict) -> bool:
+    """
+    Lee las fuentes una vez y mide ambas rutas de escritura + SP sobre los mismos DataFrames,
+    todo en `target`. Devuelve False si el feed no tiene SP con TVP (ni en --tvp-procedure ni en feeds.yaml).
+    """
+    config = feed_runner.get_config(feed)
+    procedure = config.get('procedure', {})
+    tvp = tvp_override or procedure.get('tvp')
+    if not procedure.get('name') or not tvp:
+        print(f"{feed:<15} sin SP con TVP (usar --tvp-procedure/--tvp-types o procedure.tvp en config/feeds.yaml), se omite")
+        return False
+
+    opciones = MODULOS[feed].OPCIONES_FEED
+    contexto = feed_runner.build_context(config, fecha)
+    dataframes = {
+        nombre: feed_runner._read_source(nombre, source, contexto, opciones.get('functions', {}),
+                                         opciones.get('normalizer', normalize_column_name), lambda msg: None)
+        for nombre, source in config['sources'].items()
+    }
+    filas = sum(len(df) for df in dataframes.values())
+    params = (str(contexto.fecha), contexto.mes, contexto.year)
+    # Sin legacy_factory: el destino tiene que estar definido en DB_{TARGET}_URL, no se cae a funciones.conexion
+    engine = get_engine(target)
+    silencioso = lambda msg: None
+
+    tiempos_staging, tiempos_tvp = [], []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for nombre, df in dataframes.items():
+            replace_table(df, config['sources'][nombre]['table'], engine, log_fn=silencioso)
+        call_procedure(procedure['name'], params, target)
+        tiempos_staging.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        execute_procedure_tvp(tvp['name'], params, {n: dataframes[n] for n in tvp['types']}, tvp['types'], target)
+        tiempos_tvp.append(time.perf_counter() - inicio)
+
+    t_staging, t_tvp = min(tiempos_staging), min(tiempos_tvp)
+    print(f"{feed:<15} {filas:>9,} filas | staging+SP: {t_staging:7.2f}s | TVP: {t_tvp:7.2f}s | "
+          f"x{t_staging / max(t_tvp, 1e-9):5.2f}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark tabla staging vs TVP por feed (escribe y ejecuta SP en --target)')
+    parser.add_argument('--target', required=True,
+                        help='Destino de pruebas (DB_{TARGET}_URL) donde se escriben las staging y se ejecutan los SP')
+    parser.add_argument('--confirmar', action='store_true',
+                        help='Confirma que --target puede recibir las cargas y ejecuciones de SP del benchmark')
+    parser.add_argument('--feeds', nargs='+', default=list(MODULOS), help='Feeds a medir')
+    parser.add_argument('--fecha', default=None, help='Fecha del corte (por defecto la del feed)')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Se informa el mejor tiempo')
+    parser.add_argument('--tvp-procedure', default=None, help='SP con TVP a medir (en lugar de procedure.tvp del feed)')
+    parser.add_argument('--tvp-types', nargs='+', default=None, help='FUENTE=dbo.TipoTabla por cada fuente del SP con TVP')
+    args = parser.parse_args()
+
+    if not args.confirmar:
+        parser.error(f"el benchmark reemplaza las tablas staging y ejecuta los SP en '{args.target}': agregar --confirmar")
+    tvp_override = None
+    if args.tvp_procedure:
+        if len(args.feeds) != 1 or not args.tvp_types:
+            parser.error("--tvp-procedure requiere un único feed en --feeds y sus --tvp-types")
+        tvp_override = {'name': args.tvp_procedure, 'types': _tipos(args.tvp_types)}
+
+    medidos = [medir_feed(feed, args.fecha, args.repeticiones, args.target, tvp_override) for feed in args.feeds]
+    if not any(medidos):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Convierte los reportes CSV ya descargados (histórico en BASE_DOWNLOAD_PATH) a sus sidecars
+Parquet, día por día, para las fuentes de config/feeds.yaml que tienen esquema de reporte
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Añadir el directorio padre al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core import report_sidecar
+from core.feeds import FeedContext, FeedRunner
+from core.report_reader import get_report_schema, write_sidecar
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera los sidecars Parquet de los reportes descargados')
+    parser.add_argument('--desde', required=True, help='Primer día (YYYY-MM-DD)')
+    parser.add_argument('--hasta', default=None, help='Último día (YYYY-MM-DD, por defecto hoy)')
+    parser.add_argument('--feeds', nargs='+', default=None, help='Feeds a convertir (por defecto todos)')
+    parser.add_argument('--base', default=None, help='Carpeta de descargas (por defecto BASE_DOWNLOAD_PATH)')
+    parser.add_argument('--forzar', action='store_true', help='Reescribir también los sidecars vigentes')
+    args = parser.parse_args()
+
+    if not report_sidecar.sidecars_enabled():
+        print("Sidecars deshabilitados (REPORT_SIDECARS=false o pyarrow no instalado)")
+        return
+
+    runner = FeedRunner(base_path=args.base)
+    feeds = args.feeds or list(runner.feeds)
+    dias = pd.date_range(args.desde, args.hasta or pd.Timestamp.today().normalize())
+    convertidos, vigentes, faltantes = 0, 0, 0
+    bytes_csv, bytes_parquet = 0, 0
+
+    for feed in feeds:
+        for nombre, source in runner.get_config(feed)['sources'].items():
+            report = source.get('report')
+            if not report:
+                continue
+            fingerprint = report_sidecar.schema_fingerprint(get_report_schema(report))
+            for dia in dias:
+                ruta = runner.source_path(source, FeedContext(fecha=dia))
+                if not ruta.exists():
+                    faltantes += 1
+                    continue
+                sidecar = None if args.forzar else report_sidecar.find_sidecar(report, ruta, fingerprint)
+                if sidecar is not None:
+                    vigentes += 1
+                else:
+                    sidecar = write_sidecar(report, str(ruta))
+                    if sidecar is None:
+                        continue
+                    convertidos += 1
+                bytes_csv += ruta.stat().st_size
+                bytes_parquet += sidecar.stat().st_size
+
+    print(f"\n{convertidos} convertidos, {vigentes} ya vigentes, {faltantes} días sin archivo")
+    if bytes_csv:
+        print(f"CSV {bytes_csv / 1024 ** 2:,.1f}MB -> Parquet {bytes_parquet / 1024 ** 2:,.1f}MB "
+              f"({bytes_parquet / bytes_csv:.0%})")
+
+
+if __name__ == "__main__":
+    main()
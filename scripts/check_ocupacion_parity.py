@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Verificación de paridad de Ocupación Activaciones: motor pandas vs motor sql (INSERT ... SELECT)
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Añadir el directorio padre al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scrapers.salesys.ocupacion_activaciones import comparar_motores
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara ambos motores de ocupación sin escribir la tabla destino')
+    parser.add_argument('fechas', nargs='*', help='Fechas YYYY-MM-DD (por defecto hoy)')
+    parser.add_argument('--target', default='amg', help='Destino de la conexión')
+    args = parser.parse_args()
+
+    fechas = args.fechas or [pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')]
+    inicio = time.perf_counter()
+    diferencias = comparar_motores(fechas, target=args.target)
+    fallidas = [fecha for fecha, detalle in diferencias.items() if detalle]
+    print(f"\n{len(diferencias) - len(fallidas)}/{len(diferencias)} fechas con paridad "
+          f"({time.perf_counter() - inicio:.1f}s)")
+    sys.exit(1 if fallidas else 0)
+
+
+if __name__ == "__main__":
+    main()
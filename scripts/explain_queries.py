@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Plan estimado y tiempo de las consultas registradas en core/queries.py
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Añadir el directorio padre al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.connections import connection_manager
+from core.queries import QUERIES, QueryRunner
+
+# Parámetros propios de cada consulta (además de :desde/:hasta)
+MARCA = pd.Timestamp.now().floor('h').to_pydatetime()
+PARAMS_EXTRA = {
+    'nomina_campana': {'campana': 'ACTIVACIONES'},
+    'nomina_campana_version': {'campana': 'ACTIVACIONES'},
+    'activaciones_gestiones_desde_marca': {'marca': MARCA},
+    'estado_agente_desde_marca': {'marca': MARCA},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN y medición de las consultas con nombre')
+    parser.add_argument('--queries', nargs='+', default=list(QUERIES), help='Consultas a revisar')
+    parser.add_argument('--desde', default=pd.Timestamp.now().strftime('%Y-%m-%d'), help='Primer día (YYYY-MM-DD)')
+    parser.add_argument('--hasta', default=None, help='Último día incluido (por defecto --desde)')
+    parser.add_argument('--target', default='amg', help='Destino de la conexión')
+    parser.add_argument('--solo-plan', action='store_true', help='Mostrar el plan sin ejecutar la consulta')
+    args = parser.parse_args()
+
+    runner = QueryRunner(explain=True)
+    with connection_manager.connection(args.target) as connection:
+        for nombre in args.queries:
+            print(f"\n=== {nombre}: {QUERIES[nombre].description} ===")
+            if args.solo_plan:
+                print(runner.explain_query(nombre, connection, args.desde, args.hasta,
+                                           params=PARAMS_EXTRA.get(nombre)))
+            else:
+                runner.read(nombre, connection, args.desde, args.hasta, params=PARAMS_EXTRA.get(nombre))
+
+
+if __name__ == "__main__":
+    main()
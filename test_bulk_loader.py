@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Claves repetidas en la escritura por MERGE (core/bulk_loader.upsert_dataframe): se rechazan,
+y el modo merge de Ocupación Activaciones deja las mismas filas que el modo replace
+
+Ejecutar: python -m pytest -q test_bulk_loader.py
+"""
+import os
+from datetime import date
+
+import pandas as pd
+import pytest
+
+os.environ.setdefault('SALESYS_USERNAME', 'test')
+os.environ.setdefault('SALESYS_PASSWORD', 'test')
+
+from core.bulk_loader import DuplicateKeyError, load_dataframe, upsert_dataframe
+from core.connections import connection_manager
+from core.local_backend import use_local_backend
+from scrapers.salesys.ocupacion_activaciones import CLAVES_OCUPACION, _escribir_merge
+
+
+def ocupacion(codigos):
+    """Filas de Tbl_Ocupacion_Activaciones de un día y una franja por asesor."""
+    return pd.DataFrame({
+        'fecha': date(2025, 10, 15),
+        'codigo_salesys': codigos,
+        'franja': '08:00 - 08:15',
+        'segundos': range(len(codigos)),
+    })
+
+
+def test_upsert_rechaza_claves_repetidas(tmp_path):
+    use_local_backend(str(tmp_path / 'local.db'), targets=['amg'])
+    with connection_manager.transaction('amg') as connection:
+        with pytest.raises(DuplicateKeyError):
+            upsert_dataframe(ocupacion(['A1', 'A2', 'A2']), 'Tbl_Ocupacion_Activaciones', CLAVES_OCUPACION,
+                             connection, scope={'fecha': [date(2025, 10, 15)]}, log_fn=lambda m: None)
+
+
+def test_merge_con_repetidas_igual_a_replace(tmp_path):
+    use_local_backend(str(tmp_path / 'local.db'), targets=['amg'])
+    scope = {'fecha': [date(2025, 10, 15)]}
+    with connection_manager.transaction('amg') as connection:
+        load_dataframe(ocupacion(['A1', 'A9']), 'Tbl_Ocupacion_Activaciones', connection, log_fn=lambda m: None)
+        _escribir_merge(ocupacion(['A1', 'A2', 'A2']), connection, scope, lambda m: None)
+        cargado = pd.read_sql('SELECT codigo_salesys, segundos FROM Tbl_Ocupacion_Activaciones '
+                              'ORDER BY codigo_salesys, segundos', connection)
+    assert cargado['codigo_salesys'].tolist() == ['A1', 'A2', 'A2']
+    assert cargado['segundos'].tolist() == [0, 1, 2]
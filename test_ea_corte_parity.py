@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Paridad de la depuración vectorizada de Estado Agente (ea_corte.py) contra los
+bucles anteriores por asesor (SOF consecutivos y ajuste de 'Hora fin'), y del
+modo incremental entre cortes contra el procesamiento completo del día
+
+Ejecutar: python -m pytest -q test_ea_corte_parity.py  (o python test_ea_corte_parity.py)
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+os.environ.setdefault('SALESYS_USERNAME', 'test')
+os.environ.setdefault('SALESYS_PASSWORD', 'test')
+
+from core.database import ProcessDatabase
+from core.feeds import FeedContext
+from scrapers.salesys import ea_corte
+from scrapers.salesys.ea_corte import CLAVES_EA, EstadoAgenteStore, ajustar_hora_fin, eliminar_sof_consecutivos
+
+FUNCIONES = ['SON - Sign On', 'RES - RESUME', 'AUX - Break', 'SOF - Sign Off']
+
+
+def estados_de_prueba(n=600, seed=5):
+    """
+    Estados como los entrega read_report('estado_agente'): asesores intercalados (algunos sin
+    código), rachas de SOF, saltos alrededor de los 5 minutos (incluido exactamente 5) y
+    algunas horas de inicio vacías.
+    """
+    rng = np.random.default_rng(seed)
+    agente = pd.array([f"A{c}" for c in rng.integers(0, 25, n)], dtype='string')
+    agente[rng.random(n) < 0.02] = pd.NA
+    funcion = rng.choice(FUNCIONES, n, p=[0.25, 0.25, 0.2, 0.3])
+    saltos = rng.choice([60, 240, 299, 300, 301, 600, 1800], n)
+    inicio = pd.Series(pd.Timestamp('2025-10-15 08:00') + pd.to_timedelta(np.cumsum(saltos), unit='s'))
+    inicio[rng.random(n) < 0.02] = pd.NaT
+    df = pd.DataFrame({
+        'Codigo del Agente': agente,
+        'Agente': pd.Categorical([f"Agente {a}" for a in agente]),
+        'Funcion': pd.Categorical(funcion),
+        'Gestion': pd.Categorical(rng.choice(['X', 'Y'], n)),
+        'Hora inicio': inicio,
+        'Hora fin': inicio + pd.to_timedelta(rng.integers(10, 900, n), unit='s'),
+    })
+    # Algunos asesores con el archivo fuera de orden (se respeta el orden de llegada)
+    desorden = rng.random(n) < 0.05
+    df.loc[desorden, 'Hora inicio'] = df.loc[desorden, 'Hora inicio'] - pd.Timedelta(hours=2)
+    return df
+
+
+def eliminar_sof_consecutivos_bucle(df):
+    """Implementación anterior: iloc por asesor y df.drop dentro del bucle."""
+    for agente, grupo in df.groupby('Codigo del Agente'):
+        indices_a_eliminar = []
+        ultimo_sign_off = None
+        for i in range(1, len(grupo)):
+            registro_actual = grupo.iloc[i]
+            registro_anterior = grupo.iloc[i - 1]
+            if registro_actual['Funcion'] == 'SOF - Sign Off':
+                if registro_anterior['Funcion'] == 'SOF - Sign Off':
+                    indices_a_eliminar.append(grupo.index[i - 1])
+                ultimo_sign_off = grupo.index[i]
+        if indices_a_eliminar:
+            if ultimo_sign_off in indices_a_eliminar:
+                indices_a_eliminar.remove(ultimo_sign_off)
+        df = df.drop(indices_a_eliminar)
+    return df
+
+
+def ajustar_hora_fin_bucle(df):
+    """Implementación anterior: escrituras df.at por registro con la regla de los 5 minutos."""
+    df_final = df.copy()
+    for agente, grupo in df_final.groupby('Codigo del Agente'):
+        for i in range(1, len(grupo)):
+            registro_actual = grupo.iloc[i]
+            if registro_actual['Funcion'] == 'SOF - Sign Off':
+                if i < len(grupo) - 1:
+                    registro_siguiente = grupo.iloc[i + 1]
+                    diferencia_tiempo = registro_siguiente['Hora inicio'] - registro_actual['Hora inicio']
+                    if diferencia_tiempo <= pd.Timedelta(minutes=5):
+                        df_final.at[grupo.index[i - 1], 'Hora fin'] = registro_siguiente['Hora inicio']
+                    else:
+                        df_final.at[grupo.index[i - 1], 'Hora fin'] = registro_actual['Hora inicio']
+            else:
+                df_final.at[grupo.index[i - 1], 'Hora fin'] = registro_actual['Hora inicio']
+        if len(grupo) > 1 and grupo.iloc[-1]['Funcion'] == 'SOF - Sign Off':
+            df_final.at[grupo.index[-2], 'Hora fin'] = grupo.iloc[-1]['Hora inicio']
+    return df_final
+
+
+def test_sof_consecutivos_paridad():
+    estados = estados_de_prueba()
+    esperado = eliminar_sof_consecutivos_bucle(estados)
+    obtenido = eliminar_sof_consecutivos(estados)
+    pd.testing.assert_frame_equal(obtenido, esperado)
+
+
+def test_hora_fin_paridad():
+    estados = eliminar_sof_consecutivos(estados_de_prueba(seed=9)).reset_index(drop=True)
+    esperado = ajustar_hora_fin_bucle(estados)
+    obtenido = ajustar_hora_fin(estados.copy())
+    pd.testing.assert_frame_equal(obtenido, esperado)
+
+
+def test_hora_fin_con_sof_repetidos_paridad():
+    # Sin depurar antes: SOF seguidos y SOF al final de cada asesor
+    estados = estados_de_prueba(n=300, seed=2)
+    esperado = ajustar_hora_fin_bucle(estados)
+    obtenido = ajustar_hora_fin(estados.copy())
+    pd.testing.assert_frame_equal(obtenido, esperado)
+
+
+def test_regla_cinco_minutos():
+    inicio = pd.to_datetime(['2025-10-15 08:00', '2025-10-15 09:00', '2025-10-15 09:05',
+                             '2025-10-15 10:00', '2025-10-15 10:06', '2025-10-15 11:00'])
+    estados = pd.DataFrame({
+        'Codigo del Agente': pd.array(['A1'] * 6, dtype='string'),
+        'Funcion': pd.Categorical(['SON - Sign On', 'SOF - Sign Off', 'RES - RESUME',
+                                   'SOF - Sign Off', 'SON - Sign On', 'SOF - Sign Off']),
+        'Hora inicio': inicio,
+        'Hora fin': inicio + pd.Timedelta(minutes=1),
+    })
+    obtenido = ajustar_hora_fin(estados.copy())['Hora fin']
+    # SOF seguido a los 5 minutos: el estado anterior llega al siguiente; a los 6: se corta en el SOF
+    assert obtenido[0] == inicio[2]
+    assert obtenido[2] == inicio[3]
+    assert obtenido[4] == inicio[5]
+    assert obtenido[5] == estados['Hora fin'][5]
+
+
+def dia_ordenado(n=800, seed=13):
+    """Día completo como lo exporta SaleSys: por asesor y hora de inicio, cada estado termina donde empieza el siguiente."""
+    rng = np.random.default_rng(seed)
+    agente = rng.integers(0, 15, n)
+    inicio = pd.Timestamp('2025-10-15 08:00') + pd.to_timedelta(np.sort(rng.integers(0, 11 * 3600, n)), unit='s')
+    df = pd.DataFrame({
+        'Codigo del Agente': pd.array([f"A{c}" for c in agente], dtype='string'),
+        'Agente': pd.Categorical([f"Agente {c}" for c in agente]),
+        'Funcion': pd.Categorical(rng.choice(FUNCIONES, n, p=[0.25, 0.25, 0.2, 0.3])),
+        'Gestion': pd.Categorical(rng.choice(['X', 'Y'], n)),
+        'Hora inicio': inicio,
+    }).sort_values(['Codigo del Agente', 'Hora inicio'], kind='stable', ignore_index=True)
+    df['Hora fin'] = df.groupby('Codigo del Agente')['Hora inicio'].shift(-1)
+    return df
+
+
+def archivo_al_corte(dia, corte):
+    """Lo que trae el archivo en un corte: estados ya iniciados; los que siguen abiertos sin Hora fin."""
+    df = dia[dia['Hora inicio'] <= corte].reset_index(drop=True)
+    df.loc[df['Hora fin'] > corte, 'Hora fin'] = pd.NaT
+    return df
+
+
+def desordenar(dia, n=40, seed=21):
+    """Intercambia ~n pares de registros contiguos del mismo asesor (archivo fuera de orden)."""
+    rng = np.random.default_rng(seed)
+    mismo = np.flatnonzero(dia['Codigo del Agente'].to_numpy()[:-1] == dia['Codigo del Agente'].to_numpy()[1:])
+    orden = np.arange(len(dia))
+    for i in rng.choice(mismo, n, replace=False):
+        orden[[i, i + 1]] = orden[[i + 1, i]]
+    return dia.iloc[orden].reset_index(drop=True)
+
+
+@pytest.mark.parametrize('fuera_de_orden', [False, True])
+def test_incremental_igual_a_completo(tmp_path, monkeypatch, fuera_de_orden):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ea_corte, 'EA_INCREMENTAL', True)
+    monkeypatch.setattr(ea_corte, 'estado_agente_store', EstadoAgenteStore(tmp_path / 'estado.pkl'))
+    dia = desordenar(dia_ordenado()) if fuera_de_orden else dia_ordenado()
+
+    staging = None
+    for corte in pd.date_range('2025-10-15 10:00', '2025-10-15 19:00', freq='h'):
+        cargado = ea_corte.procesar_estado_agente(archivo_al_corte(dia, corte), FeedContext(fecha=corte))
+        if cargado.attrs.get('upsert_keys'):
+            assert len(cargado) < len(staging)
+            staging = pd.concat([staging, cargado]).drop_duplicates(CLAVES_EA, keep='last')
+        else:
+            staging = cargado
+        ea_corte.estado_agente_store.commit()
+
+    completo = ea_corte._depurar(ea_corte._preparar(archivo_al_corte(dia, corte), corte))
+    completo = completo[ea_corte.COLUMNAS_SQL]
+    orden = ['Codigo del Agente', 'Hora inicio']
+    pd.testing.assert_frame_equal(staging.sort_values(orden, ignore_index=True),
+                                  completo.sort_values(orden, ignore_index=True))
+
+
+def test_cortes_persisten_estado(tmp_path, monkeypatch):
+    """El corte programado (cortes.cargar_cortes -> run_feeds) confirma el estado tras el SP."""
+    from core import feeds
+    from core.local_backend import use_local_backend
+    from scrapers.salesys import cortes
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ea_corte, 'EA_INCREMENTAL', True)
+    monkeypatch.setattr(ea_corte, 'estado_agente_store', EstadoAgenteStore(tmp_path / 'estado.pkl'))
+    monkeypatch.setattr(cortes, 'MODULOS_CORTE', [ea_corte])
+    monkeypatch.setattr(feeds.feed_runner, 'base_path', tmp_path)
+    monkeypatch.setattr(feeds, 'SHARED_TIMESTAMP_FILE', tmp_path / 'shared_timestamp.txt')
+    monkeypatch.setattr(feeds, 'process_db', ProcessDatabase(str(tmp_path / 'procesos.db')))
+    use_local_backend(str(tmp_path / 'local.db'))
+
+    dia = dia_ordenado()
+    config = feeds.feed_runner.get_config(ea_corte.FEED)
+    metodos = []
+    for corte in pd.to_datetime(['2025-10-15 12:00', '2025-10-15 13:00']):
+        feeds.SHARED_TIMESTAMP_FILE.write_text(str(corte))
+        contexto = feeds.feed_runner.build_context(config)
+        ruta = feeds.feed_runner.source_path(config['sources']['EA'], contexto)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        archivo_al_corte(dia, contexto.fecha).to_csv(ruta, index=False, date_format='%Y-%m-%d %H:%M:%S')
+
+        resultado, = cortes.cargar_cortes()
+        metodos.append(resultado.loads['EA'].method)
+        assert ea_corte.estado_agente_store.load()['corte'] == contexto.fecha
+
+    # El segundo corte ya parte del estado confirmado por el primero
+    assert metodos[1] == 'merge'
+
+
+def test_reintento_de_cortes_salta_feeds_cargados(tmp_path, monkeypatch):
+    """Un reintento del módulo (mismo timestamp compartido) no repite los feeds que ya terminaron bien."""
+    from core import feeds
+    from core.local_backend import use_local_backend
+    from scrapers.salesys import cortes, delivery_cortes
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ea_corte, 'estado_agente_store', EstadoAgenteStore(tmp_path / 'estado.pkl'))
+    monkeypatch.setattr(cortes, 'MODULOS_CORTE', [ea_corte, delivery_cortes])
+    monkeypatch.setattr(feeds.feed_runner, 'base_path', tmp_path)
+    monkeypatch.setattr(feeds, 'SHARED_TIMESTAMP_FILE', tmp_path / 'shared_timestamp.txt')
+    monkeypatch.setattr(feeds, 'process_db', ProcessDatabase(str(tmp_path / 'procesos.db')))
+    use_local_backend(str(tmp_path / 'local.db'))
+
+    # Estado Agente tiene su archivo; Delivery no (falla la carga)
+    feeds.SHARED_TIMESTAMP_FILE.write_text('2025-10-15 12:00:00')
+    config = feeds.feed_runner.get_config(ea_corte.FEED)
+    contexto = feeds.feed_runner.build_context(config)
+    ruta = feeds.feed_runner.source_path(config['sources']['EA'], contexto)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    archivo_al_corte(dia_ordenado(), contexto.fecha).to_csv(ruta, index=False, date_format='%Y-%m-%d %H:%M:%S')
+
+    cargados = []
+    cargar = feeds.feed_runner._load_feed
+    def espia(feed, *args, **kwargs):
+        cargados.append(feed)
+        return cargar(feed, *args, **kwargs)
+    monkeypatch.setattr(feeds.feed_runner, '_load_feed', espia)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match=delivery_cortes.FEED):
+            cortes.cargar_cortes()
+    assert cargados == [ea_corte.FEED, delivery_cortes.FEED, delivery_cortes.FEED]
+
+    # Otra ejecución programada vuelve a cargar todos los feeds
+    feeds.SHARED_TIMESTAMP_FILE.write_text('2025-10-15 13:00:00')
+    with pytest.raises(RuntimeError):
+        cortes.cargar_cortes()
+    assert cargados[3:] == [ea_corte.FEED, delivery_cortes.FEED]
+
+
+if __name__ == "__main__":
+    test_sof_consecutivos_paridad()
+    test_hora_fin_paridad()
+    test_hora_fin_con_sof_repetidos_paridad()
+    test_regla_cinco_minutos()
+    print("Paridad OK")
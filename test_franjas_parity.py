@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Paridad del reparto vectorizado por franjas (core/franjas.py) contra la
+implementación anterior con iterrows de ocupacion_activaciones.py
+
+Ejecutar: python -m pytest -q test_franjas_parity.py  (o python test_franjas_parity.py)
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault('SALESYS_USERNAME', 'test')
+os.environ.setdefault('SALESYS_PASSWORD', 'test')
+
+from config.report_schemas import REPORT_SCHEMAS
+from core.franjas import FranjaCalendar
+from scrapers.salesys.ocupacion_activaciones import generar_tiempos_por_franja, mapear_segundos_por_franja
+
+
+def franjas_de_prueba(dias=('2025-10-14', '2025-10-15', '2025-10-16')):
+    """Grilla de 15 minutos como franjas_horarias.csv, ya parseada."""
+    inicios = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(dia, periods=96, freq='15min') for dia in dias
+    ]))
+    return pd.DataFrame({
+        'fecha_hora_inicio': inicios,
+        'fecha_hora_fin': inicios + pd.Timedelta(minutes=15),
+        'etiqueta_franja': inicios.strftime('%H:%M') + ' - ' + (inicios + pd.Timedelta(minutes=15)).strftime('%H:%M'),
+    })
+
+
+def estados_de_prueba(n=400, seed=7):
+    """Intervalos SON/RES con segundos enteros, algunos cruzando medianoche y algunos sin fin."""
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp('2025-10-15')
+    inicio = base + pd.to_timedelta(rng.integers(-3600, 86_400 + 3600, n), unit='s')
+    fin = pd.Series(inicio + pd.to_timedelta(rng.integers(30, 4 * 3600, n), unit='s'))
+    fin[rng.random(n) < 0.03] = pd.NaT
+    return pd.DataFrame({
+        'codigo_salesys': pd.array(rng.integers(1000, 1020, n), dtype='Int64'),
+        'funcion': rng.choice(['SON - Sign On', 'RES - RESUME'], n),
+        'hora_inicio': inicio,
+        'hora_fin': fin,
+    })
+
+
+def gestiones_de_prueba(n=400, seed=11):
+    """Gestiones con milisegundos (el tramo por franja se trunca a entero) y algunas que cruzan medianoche."""
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp('2025-10-15')
+    inicio = base + pd.to_timedelta(rng.integers(-1800_000, 86_400_000 + 1800_000, n), unit='ms')
+    fin = inicio + pd.to_timedelta(rng.integers(5_000, 3 * 3600_000, n), unit='ms')
+    return pd.DataFrame({
+        'asesor': [f"Asesor {c}" for c in rng.integers(0, 20, n)],
+        'codigo_salesys': pd.array(rng.integers(1000, 1020, n), dtype='Int64'),
+        'hora_inicio_call_center': inicio,
+        'hora_fin_call_center': fin,
+    })
+
+
+def generar_tiempos_por_franja_iterrows(df_agentes, df_franjas):
+    """Implementación anterior (referencia)."""
+    resultados = []
+    for _, agente_row in df_agentes.iterrows():
+        agente_inicio = agente_row['hora_inicio']
+        agente_fin = agente_row['hora_fin']
+        agente_fecha = agente_inicio.date()
+        franjas_fecha = df_franjas[(df_franjas['fecha_hora_inicio'].dt.date == agente_fecha)]
+        for _, franja_row in franjas_fecha.iterrows():
+            interseccion_inicio = max(agente_inicio, franja_row['fecha_hora_inicio'])
+            interseccion_fin = min(agente_fin, franja_row['fecha_hora_fin'])
+            if interseccion_inicio < interseccion_fin:
+                resultados.append({
+                    'codigo_salesys': agente_row['codigo_salesys'],
+                    'funcion': agente_row['funcion'],
+                    'fecha': agente_fecha,
+                    'franja': franja_row['etiqueta_franja'],
+                    'tiempo_segundos': (interseccion_fin - interseccion_inicio).total_seconds()
+                })
+    df = pd.DataFrame(resultados)
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    agrupado = df.groupby(['codigo_salesys', 'funcion', 'fecha', 'franja']).agg({'tiempo_segundos': 'sum'}).reset_index()
+    final = agrupado.groupby(['fecha', 'codigo_salesys', 'franja']).agg({'tiempo_segundos': 'sum'}).reset_index()
+    final['tiempo_segundos'] = final['tiempo_segundos'].astype('Int64')
+    return final
+
+
+def mapear_segundos_por_franja_iterrows(df_gestiones, df_franjas):
+    """Implementación anterior (referencia)."""
+    registros = []
+    for _, row in df_gestiones.iterrows():
+        hora_inicio = row['hora_inicio_call_center']
+        hora_fin = row['hora_fin_call_center']
+        franjas_intersectadas = df_franjas[(df_franjas['fecha_hora_inicio'] < hora_fin) & (df_franjas['fecha_hora_fin'] > hora_inicio)]
+        for _, franja in franjas_intersectadas.iterrows():
+            inicio_franja = max(hora_inicio, franja['fecha_hora_inicio'])
+            fin_franja = min(hora_fin, franja['fecha_hora_fin'])
+            registros.append({
+                'codigo_salesys': row['codigo_salesys'],
+                'fecha': hora_inicio.date(),
+                'franja': franja['etiqueta_franja'],
+                'tiempo_segundos': (fin_franja - inicio_franja).total_seconds()
+            })
+    df = pd.DataFrame(registros)
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    df['tiempo_segundos'] = df['tiempo_segundos'].astype('int64')
+    agrupado = df.groupby(['fecha', 'codigo_salesys', 'franja']).agg({'tiempo_segundos': 'sum'}).reset_index()
+    agrupado = agrupado.rename(columns={'tiempo_segundos': 'segundos_gestionados'})
+    agrupado['codigo_salesys'] = agrupado['codigo_salesys'].astype('Int64')
+    return agrupado
+
+
+def _comparable(df):
+    df = df.sort_values(['fecha', 'codigo_salesys', 'franja'], ignore_index=True)
+    df['fecha'] = df['fecha'].astype('datetime64[ns]')
+    df['codigo_salesys'] = df['codigo_salesys'].astype('Int64')
+    df['franja'] = df['franja'].astype(str)
+    return df
+
+
+def test_tiempos_por_franja_paridad():
+    franjas = franjas_de_prueba()
+    estados = estados_de_prueba()
+    esperado = _comparable(generar_tiempos_por_franja_iterrows(estados, franjas))
+    obtenido = _comparable(generar_tiempos_por_franja(estados, franjas))
+    pd.testing.assert_frame_equal(obtenido, esperado)
+
+
+def test_tiempos_por_franja_franjas_desordenadas():
+    franjas = franjas_de_prueba()
+    estados = estados_de_prueba(n=100, seed=3)
+    esperado = _comparable(generar_tiempos_por_franja(estados, franjas))
+    obtenido = _comparable(generar_tiempos_por_franja(estados, franjas.sample(frac=1, random_state=1)))
+    pd.testing.assert_frame_equal(obtenido, esperado)
+
+
+def test_segundos_gestionados_paridad():
+    franjas = franjas_de_prueba()
+    gestiones = gestiones_de_prueba()
+    esperado = _comparable(mapear_segundos_por_franja_iterrows(gestiones, franjas))
+    obtenido = _comparable(mapear_segundos_por_franja(gestiones, franjas))
+    pd.testing.assert_frame_equal(obtenido, esperado)
+
+
+def test_cache_franjas_se_invalida_con_el_esquema(tmp_path, monkeypatch):
+    ruta = tmp_path / 'franjas_horarias.csv'
+    franjas = franjas_de_prueba()
+    franjas.assign(
+        fecha_hora_inicio=franjas['fecha_hora_inicio'].dt.strftime('%d-%m-%Y %H:%M:%S'),
+        fecha_hora_fin=franjas['fecha_hora_fin'].dt.strftime('%d-%m-%Y %H:%M:%S'),
+    ).to_csv(ruta, index=False)
+    cache = tmp_path / 'franjas.pkl'
+
+    assert FranjaCalendar(str(ruta), cache).load(log_fn=lambda m: None)['etiqueta_franja'].dtype == 'string'
+
+    # Mismo CSV (mismo mtime), otro esquema: la caché no se usa
+    esquema = {**REPORT_SCHEMAS['franjas_horarias']}
+    esquema['columns'] = {**esquema['columns'], 'etiqueta_franja': {'dtype': 'category'}}
+    monkeypatch.setitem(REPORT_SCHEMAS, 'franjas_horarias', esquema)
+    assert FranjaCalendar(str(ruta), cache).load(log_fn=lambda m: None)['etiqueta_franja'].dtype == 'category'
+
+
+if __name__ == "__main__":
+    test_tiempos_por_franja_paridad()
+    test_tiempos_por_franja_franjas_desordenadas()
+    test_segundos_gestionados_paridad()
+    print("Paridad OK")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Modo incremental de Ocupación Activaciones por el camino programado (shared_timestamp.txt):
+dos cortes del mismo día sobre el respaldo local, el segundo recalcula solo las franjas
+desde la marca del primero
+
+Ejecutar: python -m pytest -q test_ocupacion_incremental.py
+"""
+import os
+
+import pandas as pd
+
+os.environ.setdefault('SALESYS_USERNAME', 'test')
+os.environ.setdefault('SALESYS_PASSWORD', 'test')
+
+from core import franjas as franjas_mod
+from core import reference_cache
+from core.bulk_loader import replace_table
+from core.connections import connection_manager
+from core.database import ProcessDatabase
+from core.local_backend import use_local_backend
+from scrapers.salesys import ocupacion_activaciones as ocupacion
+
+DIA = pd.Timestamp('2025-10-15')
+
+
+def cargar_origenes(engine):
+    """Gestiones, estados y nómina de dos asesores entre las 08:00 y las 12:00."""
+    h = lambda hora: DIA + pd.Timedelta(hora)
+    replace_table(pd.DataFrame({
+        'nombre_usuario': [1001, 1001, 1002, 1002],
+        'asesor': ['Uno', 'Uno', 'Dos', 'Dos'],
+        'hora_inicio_call_center': [h('08:10:00'), h('10:40:00'), h('09:05:00'), h('11:20:00')],
+        'hora_fin_call_center': [h('08:25:00'), h('11:05:00'), h('09:50:00'), pd.NaT],
+    }), 'TblActivacionesBD', engine, log_fn=lambda m: None)
+    replace_table(pd.DataFrame({
+        'codigo_del_agente': [1001, 1002],
+        'FUNCION': ['SON - Sign On', 'SON - Sign On'],
+        'hora_inicio': [h('08:00:00'), h('09:00:00')],
+        'hora_fin': [h('11:55:00'), h('11:50:00')],
+    }), 'TblEstadoAgenteSaleSysBD', engine, log_fn=lambda m: None)
+    replace_table(pd.DataFrame({
+        'fecha': [DIA, DIA],
+        'Codigo SaleSys': [1001, 1002],
+        'Nombre Completo': ['Uno', 'Dos'],
+        'condicion': 'ACTIVO',
+        'cargo': 'ASESOR',
+        'CAMPAÑA': 'ACTIVACIONES',
+    }), 'View_TblNomina', engine, log_fn=lambda m: None)
+
+
+def franjas_csv(ruta):
+    inicios = pd.date_range(DIA, periods=2 * 96, freq='15min')
+    fines = inicios + pd.Timedelta(minutes=15)
+    pd.DataFrame({
+        'fecha_hora_inicio': inicios.strftime('%d-%m-%Y %H:%M:%S'),
+        'fecha_hora_fin': fines.strftime('%d-%m-%Y %H:%M:%S'),
+        'etiqueta_franja': inicios.strftime('%H:%M') + ' - ' + fines.strftime('%H:%M'),
+    }).to_csv(ruta, index=False)
+
+
+def test_segundo_corte_solo_recalcula_desde_la_marca(tmp_path, monkeypatch):
+    engines = use_local_backend(str(tmp_path / 'local.db'), targets=['amg'])
+    cargar_origenes(engines['amg'])
+    franjas_csv(tmp_path / 'franjas_horarias.csv')
+    monkeypatch.setattr(ocupacion, 'RUTA_FRANJAS', str(tmp_path / 'franjas_horarias.csv'))
+    monkeypatch.setattr(franjas_mod, 'FRANJAS_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(ocupacion, 'process_db', ProcessDatabase(str(tmp_path / 'procesos.db')))
+    monkeypatch.setattr(reference_cache, 'nomina_cache', reference_cache.ReferenceCache(
+        'nomina', 'nomina_campana', 'nomina_campana_version', key_param='campana', cache_dir=str(tmp_path / 'ref')))
+
+    calculos = []
+    calcular = ocupacion.calcular_ocupacion
+
+    def espia(fechas, franjas, *args, **kwargs):
+        calculos.append((franjas['fecha_hora_inicio'].min(), kwargs.get('marca')))
+        return calcular(fechas, franjas, *args, **kwargs)
+    monkeypatch.setattr(ocupacion, 'calcular_ocupacion', espia)
+
+    def corte(hora):
+        timestamp = tmp_path / 'shared_timestamp.txt'
+        timestamp.write_text(f"{DIA:%Y-%m-%d} {hora}")
+        ocupacion.procesar_ocupacion_activaciones(ocupacion.fechas_programadas(str(timestamp)),
+                                                  log_fn=lambda m: None, incremental=True)
+        with connection_manager.connection('amg') as connection:
+            return pd.read_sql('SELECT * FROM Tbl_Ocupacion_Activaciones', connection)
+
+    primero = corte('10:00:00')
+    assert calculos[-1] == (DIA, None)
+    assert ocupacion.process_db.get_watermark(ocupacion._clave_marca('amg')) == '2025-10-15T10:00:00'
+
+    segundo = corte('12:00:00')
+    # Marca 10:00 menos 15 minutos de margen: desde la franja de las 09:45
+    assert calculos[-1] == (DIA + pd.Timedelta('09:45:00'), DIA + pd.Timedelta('09:45:00'))
+    assert ocupacion.process_db.get_watermark(ocupacion._clave_marca('amg')) == '2025-10-15T12:00:00'
+
+    # Las franjas anteriores a la marca quedan como las escribió el primer corte
+    anteriores = lambda df: df[df['franja'] < '09:45'].sort_values(['codigo_salesys', 'franja'], ignore_index=True)
+    pd.testing.assert_frame_equal(anteriores(segundo), anteriores(primero))
+    assert len(segundo) > len(primero)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Caché de nómina (core/reference_cache.py) sobre el respaldo local sqlite: la huella de
+versión no usa CHECKSUM_AGG y un cambio de contenido con las mismas filas relee el día
+
+Ejecutar: python -m pytest -q test_reference_cache.py
+"""
+import os
+
+import pandas as pd
+
+os.environ.setdefault('SALESYS_USERNAME', 'test')
+os.environ.setdefault('SALESYS_PASSWORD', 'test')
+
+from core import reference_cache
+from core.bulk_loader import replace_table
+from core.connections import connection_manager
+from core.local_backend import use_local_backend
+
+
+def nomina(cargo_a2='ASESOR'):
+    return pd.DataFrame({
+        'fecha': pd.to_datetime(['2025-10-15', '2025-10-15', '2025-10-16', '2025-10-15']),
+        'Codigo SaleSys': [1001, 1002, 1001, 2001],
+        'Nombre Completo': ['Asesor Uno', 'Asesor Dos', 'Asesor Uno', 'Otro'],
+        'condicion': 'ACTIVO',
+        'cargo': ['ASESOR', cargo_a2, 'ASESOR', 'ASESOR'],
+        'CAMPAÑA': ['ACTIVACIONES', 'ACTIVACIONES', 'ACTIVACIONES', 'DELIVERY'],
+    })
+
+
+def test_get_nomina_en_respaldo_local(tmp_path, monkeypatch):
+    engines = use_local_backend(str(tmp_path / 'local.db'), targets=['amg'])
+    cache = reference_cache.ReferenceCache('nomina', 'nomina_campana', 'nomina_campana_version',
+                                           key_param='campana', cache_dir=str(tmp_path / 'cache'))
+    monkeypatch.setattr(reference_cache, 'nomina_cache', cache)
+    mensajes = []
+
+    replace_table(nomina(), 'View_TblNomina', engines['amg'], log_fn=lambda m: None)
+    with connection_manager.connection('amg') as connection:
+        primera = reference_cache.get_nomina(connection, '2025-10-15', '2025-10-16', log_fn=mensajes.append)
+        segunda = reference_cache.get_nomina(connection, '2025-10-15', '2025-10-16', log_fn=mensajes.append)
+    assert primera['codigo_salesys'].tolist() == [1001, 1002, 1001]
+    pd.testing.assert_frame_equal(segunda, primera)
+    assert '2 días desde caché, 0 leídos del origen' in mensajes[-1]
+
+    # Mismas filas, otro cargo: solo se relee el día que cambió
+    replace_table(nomina(cargo_a2='SUPERVISOR'), 'View_TblNomina', engines['amg'], log_fn=lambda m: None)
+    with connection_manager.connection('amg') as connection:
+        tercera = reference_cache.get_nomina(connection, '2025-10-15', '2025-10-16', log_fn=mensajes.append)
+    assert '1 días desde caché, 1 leídos del origen' in mensajes[-1]
+    assert tercera['cargo'].tolist() == ['ASESOR', 'SUPERVISOR', 'ASESOR']
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Paridad de la lectura desde el sidecar Parquet (core/report_sidecar.py) contra la lectura
+del CSV: mismo resultado completo, por bloques y con proyección de columnas, y vuelta al
+CSV cuando el archivo cambió
+
+Ejecutar: python -m pytest -q test_report_sidecar.py
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault('SALESYS_USERNAME', 'test')
+os.environ.setdefault('SALESYS_PASSWORD', 'test')
+
+from core import report_sidecar
+from core.report_reader import read_report, write_sidecar
+
+
+def activaciones_csv(ruta, n=300, seed=3):
+    """CSV latin1 como el de Activaciones, con celdas de fecha fuera de los formatos conocidos."""
+    rng = np.random.default_rng(seed)
+    inicio = pd.Timestamp('2025-10-15 08:00') + pd.to_timedelta(rng.integers(0, 9 * 3600, n), unit='s')
+    fin = pd.Series(inicio.strftime('%d/%m/%Y %H:%M:%S'))
+    fin[rng.random(n) < 0.1] = ''
+    fin[:3] = ['15 oct 2025 9h', 'sin fecha', '15 oct 2025 10h']
+    pd.DataFrame({
+        'Nombre Usuario': [f"A{c}" for c in rng.integers(0, 50, n)],
+        'Asesor': [f"Asesor ñ{c}" for c in rng.integers(0, 20, n)],
+        'Número SOT': rng.integers(1_000, 9_999, n),
+        'Hora Inicio Contrata': inicio.strftime('%d/%m/%Y %H:%M:%S'),
+        'Hora Inicio Call Center': inicio.strftime('%d/%m/%Y %H:%M:%S'),
+        'Hora Fin Call Center': fin,
+    }).to_csv(ruta, index=False, encoding='latin1')
+
+
+def fallback_prueba(valor):
+    """Fallback por celda como parse_fecha: resuelve el formato propio de la prueba."""
+    try:
+        return pd.to_datetime(valor.replace('h', ':00'), format='%d %b %Y %H:%M')
+    except (ValueError, AttributeError):
+        return None
+
+
+def leer(ruta, **kwargs):
+    return read_report('activaciones', str(ruta), datetime_fallback=fallback_prueba, log_fn=lambda m: None, **kwargs)
+
+
+def test_sidecar_igual_a_csv(tmp_path):
+    ruta = tmp_path / 'hfc15.csv'
+    activaciones_csv(ruta)
+    esperado = leer(ruta)
+
+    sidecar = write_sidecar('activaciones', str(ruta), log_fn=lambda m: None)
+    assert sidecar == ruta.with_suffix('.parquet')
+    assert report_sidecar.read_metadata(sidecar)['rows'] == len(esperado)
+
+    pd.testing.assert_frame_equal(leer(ruta), esperado)
+    pd.testing.assert_frame_equal(leer(ruta, chunksize=70), esperado)
+    # Las celdas que solo resuelve el fallback siguen pasando por él
+    assert esperado['hora_fin_call_center'][0] == pd.Timestamp('2025-10-15 09:00')
+
+    columnas = ['asesor', 'hora_inicio_call_center']
+    pd.testing.assert_frame_equal(leer(ruta, columns=columnas), esperado[columnas])
+
+
+def test_csv_modificado_invalida_sidecar(tmp_path):
+    ruta = tmp_path / 'hfc15.csv'
+    activaciones_csv(ruta)
+    write_sidecar('activaciones', str(ruta), log_fn=lambda m: None)
+
+    activaciones_csv(ruta, n=120, seed=8)
+    assert len(leer(ruta)) == 120
+
+    # Sin el CSV (histórico archivado) se lee el sidecar
+    write_sidecar('activaciones', str(ruta), log_fn=lambda m: None)
+    esperado = leer(ruta)
+    ruta.unlink()
+    pd.testing.assert_frame_equal(leer(ruta), esperado)
+
+
+def test_arbol_espejo(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_sidecar, 'REPORT_SIDECAR_DIR', str(tmp_path / 'parquet'))
+    monkeypatch.setattr(report_sidecar, '_base_descargas', lambda: tmp_path / 'descargas')
+    ruta = tmp_path / 'descargas' / '2025' / 'Activaciones' / 'hfc15.csv'
+    ruta.parent.mkdir(parents=True)
+    activaciones_csv(ruta)
+    esperado = leer(ruta)
+
+    sidecar = write_sidecar('activaciones', str(ruta), log_fn=lambda m: None)
+    assert sidecar == tmp_path / 'parquet' / '2025' / 'Activaciones' / 'hfc15.parquet'
+    ruta.unlink()
+    pd.testing.assert_frame_equal(leer(ruta), esperado)